@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from dgpinata.sinks import ParquetSink, SQLiteSink, ThreadedSink
+from scenarios import count_events, make_lemonade_simulation, scenarios
+
+@pytest.mark.parametrize("scenario_name", list(scenarios))
+def bench_run(benchmark, record_metrics, peak_rss, scenario_name):
+    scenario = scenarios[scenario_name]
+    rounds = 1 if scenario_name == "poisson_100k" else 3
+
+    report = benchmark.pedantic(
+        lambda sim: sim.run(scenario.steps),
+        setup=lambda: ((scenario.make_simulation(),), {}),
+        rounds=rounds,
+    )
+
+    record_metrics(
+        events_per_sec=count_events(report.simulation) / benchmark.stats["mean"],
+        peak_rss_mb=peak_rss(scenario_name),
+    )
+
+@pytest.mark.parametrize("exporter", ["sqlite", "parquet"])
+def bench_export(benchmark, record_metrics, tmp_path, exporter):
+    if exporter == "parquet":
+        pytest.importorskip("pyarrow")
+
+    sim = make_lemonade_simulation()
+    sim.run(24)
+
+    if exporter == "sqlite":
+        path = str(tmp_path / "lemonade.db")
+        benchmark.pedantic(lambda: sim.export(path, overwrite=True), rounds=3)
+        size = os.path.getsize(path)
+    else:
+        path = str(tmp_path / "lemonade")
+        benchmark.pedantic(lambda: sim.export_parquet(path), rounds=3, warmup_rounds=1)
+        size = sum(
+            os.path.getsize(os.path.join(directory, filename))
+            for directory, _, filenames in os.walk(path)
+            for filename in filenames
+        )
+
+    record_metrics(
+        events_per_sec=count_events(sim) / benchmark.stats["mean"],
+        export_mb_per_sec=size / 1e6 / benchmark.stats["mean"],
+    )
+
+@pytest.mark.parametrize("threaded", [False, True], ids=["direct", "threaded"])
+@pytest.mark.parametrize("exporter", ["sqlite", "parquet"])
+def bench_stream(benchmark, record_metrics, tmp_path, exporter, threaded):
+    """Run while streaming to a sink, written from the simulation's thread or from a ThreadedSink."""
+    if exporter == "parquet":
+        pytest.importorskip("pyarrow")
+
+    def make_sink():
+        if exporter == "sqlite":
+            sink = SQLiteSink(str(tmp_path / "lemonade.db"), overwrite=True)
+        else:
+            sink = ParquetSink(str(tmp_path / "lemonade"))
+        return ThreadedSink(sink) if threaded else sink
+
+    report = benchmark.pedantic(
+        lambda sim, sink: sim.run(24, sink=sink),
+        setup=lambda: ((make_lemonade_simulation(), make_sink()), {}),
+        rounds=3,
+        warmup_rounds=1,
+    )
+
+    record_metrics(events_per_sec=count_events(report.simulation) / benchmark.stats["mean"])
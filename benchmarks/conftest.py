@@ -0,0 +1,48 @@
+"""Benchmarks for the simulation engine, run with pytest-benchmark (pip install dgpinata[benchmark]).
+
+Run from the repository root. Save a baseline, then compare later runs against it; a run fails if any benchmark's
+mean time regresses by more than 20%:
+
+    python -m pytest benchmarks --benchmark-save=baseline
+    python -m pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:20%
+
+Besides timings, each benchmark reports events/sec, peak RSS (measured in a fresh process) or export MB/s, which are
+summarized at the end of the run and saved with the baseline.
+"""
+import multiprocessing
+from typing import Dict, List, Tuple
+
+import pytest
+
+from scenarios import measure_peak_rss
+
+_metrics: List[Tuple[str, Dict[str, float]]] = []
+
+@pytest.fixture
+def record_metrics(request, benchmark):
+    """Record throughput metrics for a benchmark, as `record_metrics(events_per_sec=..., ...)`."""
+    def record(**metrics: float):
+        benchmark.extra_info.update(metrics)
+        _metrics.append((request.node.name, metrics))
+
+    return record
+
+@pytest.fixture(scope="session")
+def peak_rss():
+    """Return a function that measures the peak RSS (in MB) of running a scenario in a fresh process."""
+    context = multiprocessing.get_context("spawn")
+
+    def measure(scenario_name: str) -> float:
+        with context.Pool(1) as pool:
+            return pool.apply(measure_peak_rss, (scenario_name,))
+
+    return measure
+
+def pytest_terminal_summary(terminalreporter):
+    if not _metrics:
+        return
+
+    terminalreporter.section("throughput")
+    for name, metrics in _metrics:
+        metric_str = ", ".join(f"{metric_name}={value:,.1f}" for metric_name, value in metrics.items())
+        terminalreporter.write_line(f"{name}: {metric_str}")
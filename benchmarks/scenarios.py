@@ -0,0 +1,179 @@
+"""Representative simulations for the benchmarks. Set DGPINATA_BENCH_SCALE to scale the number of entities."""
+import os
+import resource
+from typing import Callable, Dict, NamedTuple
+
+import numpy as np
+
+import dgpinata as dgp
+
+SCALE = float(os.environ.get("DGPINATA_BENCH_SCALE", "1"))
+
+def scaled(n: int) -> int:
+    return max(1, int(n * SCALE))
+
+
+class Sale(dgp.Event):
+    table_name = "sales"
+    amount: int
+    timestamp: int
+
+class Stand(dgp.Entity):
+    emitters: Dict = {
+        "new_sale": dgp.IntervalEmitter.from_params(
+            event_type_name="Sale",
+            interval=60,
+            amount=1,
+            timestamp="timestamp",
+        ),
+    }
+
+def make_lemonade_simulation() -> dgp.Simulation:
+    """The hello-lemonade tutorial, with many stands selling every minute."""
+    class ScaledStand(Stand):
+        default_values = [{} for _ in range(scaled(200))]
+
+    return dgp.Simulation(event_types=[Sale], entity_types=[ScaledStand], rand_seed=1)
+
+
+class Visit(dgp.Event):
+    table_name = "visits"
+    customer_id: int
+    timestamp: int
+
+class Customer(dgp.Entity):
+    customer_id: int
+    emitters: Dict = {
+        "visit": dgp.PoissonEmitter.from_params(
+            event_type_name="Visit",
+            rate=0.5,
+            time_interval=3600,
+            customer_id="parent.customer_id",
+            timestamp="timestamp",
+        ),
+    }
+
+    default_values = []
+
+def make_poisson_simulation() -> dgp.Simulation:
+    """100k customers, each visiting at random about once every two hours."""
+    sim = dgp.Simulation(event_types=[Visit], entity_types=[Customer], rand_seed=1)
+    n = scaled(100_000)
+    sim.spawn_entities(Customer, n, {"customer_id": np.arange(n)})
+    return sim
+
+
+class Reading(dgp.Event):
+    table_name = "readings"
+    value: float
+    timestamp: int
+
+class Sensor(dgp.Entity):
+    emitters: Dict = {
+        "reading": dgp.IntervalEmitter.from_params(
+            event_type_name="Reading",
+            interval=1,
+            value="random.random()",
+            timestamp="timestamp",
+        ),
+    }
+
+def make_high_frequency_simulation() -> dgp.Simulation:
+    """A few sensors emitting a reading every second."""
+    class ScaledSensor(Sensor):
+        default_values = [{} for _ in range(scaled(10))]
+
+    return dgp.Simulation(event_types=[Reading], entity_types=[ScaledSensor], rand_seed=1)
+
+
+class Product(dgp.Entity):
+    product_name: str
+    popularity: float
+
+    default_values = []
+
+class ProductSale(dgp.Event):
+    table_name = "product_sales"
+    product_name: str
+    timestamp: int
+
+class Shop(dgp.Entity):
+    emitters: Dict = {
+        "new_sale": dgp.IntervalEmitter.from_params(
+            event_type_name="ProductSale",
+            interval=60,
+            product_name=dgp.RandomObjectAttributeChooser(
+                object_eval_str='sim.entities["Product"]',
+                attribute="product_name",
+                weight_attribute="popularity",
+            ),
+            timestamp="timestamp",
+        ),
+    }
+
+def make_chooser_simulation() -> dgp.Simulation:
+    """Shops selling products chosen by popularity from a catalog of 1000."""
+    class ScaledShop(Shop):
+        default_values = [{} for _ in range(scaled(100))]
+
+    sim = dgp.Simulation(event_types=[ProductSale], entity_types=[Product, ScaledShop], rand_seed=1)
+    sim.spawn_entities(Product, 1000, {
+        "product_name": [f"product-{i}" for i in range(1000)],
+        "popularity": np.random.default_rng(1).pareto(1.5, 1000) + 1,
+    })
+    return sim
+
+
+class Ping(dgp.Event):
+    table_name = "pings"
+    timestamp: int
+
+class Device(dgp.Entity):
+    emitters: Dict = {
+        "ping": dgp.IntervalEmitter.from_params(
+            event_type_name="Ping",
+            interval=3600,
+            skip_probability=0.5,
+            timestamp="timestamp",
+        ),
+    }
+
+def make_sparse_simulation() -> dgp.Simulation:
+    """20k devices, each pinging about every other hour, so most steps emit at most one event per entity."""
+    class ScaledDevice(Device):
+        default_values = [{} for _ in range(scaled(20_000))]
+
+    return dgp.Simulation(event_types=[Ping], entity_types=[ScaledDevice], rand_seed=1)
+
+
+class Scenario(NamedTuple):
+    make_simulation: Callable[[], dgp.Simulation]
+    steps: int
+
+scenarios = {
+    "lemonade": Scenario(make_lemonade_simulation, steps=24),
+    "poisson_100k": Scenario(make_poisson_simulation, steps=4),
+    "interval_high_frequency": Scenario(make_high_frequency_simulation, steps=24),
+    "chooser_sales": Scenario(make_chooser_simulation, steps=24),
+    "interval_sparse": Scenario(make_sparse_simulation, steps=5),
+}
+
+def count_events(sim: dgp.Simulation) -> int:
+    return sum(events.total_count for events in sim.events.values())
+
+def measure_peak_rss(scenario_name: str) -> float:
+    """Build and run a scenario, and return the peak RSS of this process in MB. Run it in a fresh process."""
+    scenario = scenarios[scenario_name]
+    scenario.make_simulation().run(scenario.steps)
+    return get_peak_rss()
+
+def get_peak_rss() -> float:
+    """Return the peak RSS of this process in MB."""
+    # On Linux, ru_maxrss carries over the parent's peak into a forked or spawned process, but VmHWM starts afresh
+    if os.path.exists("/proc/self/status"):
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
@@ -7,4 +7,5 @@ from dgpinata.emitters.base import Emitter
 from dgpinata.emitters.interval import IntervalEmitter
 from dgpinata.emitters.poisson import PoissonEmitter
 from dgpinata.emitters.gamma import GammaEmitter
-from dgpinata.chooser import RandomObjectAttributeChooser
\ No newline at end of file
+from dgpinata.chooser import RandomObjectAttributeChooser, FakerChooser
+from dgpinata.instrumentation import Instrumentation, InstrumentationHook
\ No newline at end of file
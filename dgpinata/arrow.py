@@ -0,0 +1,50 @@
+"""Arrow tables for Recordable types. Requires pyarrow, e.g. `pip install dgpinata[parquet]`."""
+from typing import Dict, Sequence, Type
+
+import numpy as np
+
+from dgpinata.emittable import Recordable, annotation_type_lookup
+
+# Maps the SQL type of a column (from annotation_type_lookup) to the name of the Arrow type used to store it
+sql_type_arrow_type_lookup = {
+    "INTEGER": "int64",
+    "FLOAT": "float64",
+    "TEXT": "string",
+}
+
+def import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("Arrow and Parquet support requires pyarrow: pip install dgpinata[parquet]") from e
+
+    return pyarrow
+
+def get_arrow_schema(record_type: Type[Recordable]) -> "pyarrow.Schema":
+    """Return the Arrow schema of a Recordable type's columns, mapped from its field annotations."""
+    pa = import_pyarrow()
+
+    fields = []
+    for column_name in record_type.get_column_names():
+        sql_type = annotation_type_lookup[record_type.model_fields[column_name].annotation]
+        arrow_type = getattr(pa, sql_type_arrow_type_lookup[sql_type])()
+        fields.append(pa.field(column_name, arrow_type))
+
+    return pa.schema(fields)
+
+def to_arrow_table(record_type: Type[Recordable], columns: Dict[str, Sequence], copy: bool = False) -> "pyarrow.Table":
+    """Build an Arrow table from one sequence of values per column.
+
+    Numeric NumPy columns are wrapped without copying, unless copy is True.
+    """
+    pa = import_pyarrow()
+    schema = get_arrow_schema(record_type)
+
+    arrays = []
+    for field in schema:
+        values = columns[field.name]
+        if copy and isinstance(values, np.ndarray) and values.dtype != object:
+            values = values.copy()
+        arrays.append(pa.array(values, type=field.type))
+
+    return pa.Table.from_arrays(arrays, schema=schema)
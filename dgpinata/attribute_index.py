@@ -0,0 +1,97 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+class AttributeIndex:
+    """The entities of one type, kept in the order they were added, for drawing one of their attributes at random.
+
+    The simulation appends to the index whenever it adds an entity of that type, so sampling never has to walk the
+    entities. The attribute is read from each sampled entity when it's drawn, so changes made after the entity was
+    added are seen. If weight_attribute is given, entities are sampled in proportion to it, read at each draw.
+
+    With snapshot=True, the attribute and weight of each entity are read once, when it's added to the index, so a draw
+    needs no attribute lookups and the cumulative weights are only recomputed after new entities have been added. Later
+    changes to either attribute aren't seen.
+    """
+
+    def __init__(
+        self,
+        attribute: str,
+        weight_attribute: Optional[str] = None,
+        snapshot: bool = False,
+        capacity: int = 64,
+    ):
+        self.attribute = attribute
+        self.weight_attribute = weight_attribute
+        self.snapshot = snapshot
+
+        self._size = 0
+        self._entities = np.empty(capacity, dtype=object)
+        self._values = np.empty(capacity, dtype=object) if snapshot else None
+        self._weights = np.empty(capacity, dtype=np.float64) if snapshot and weight_attribute is not None else None
+        self._cumulative_weights: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Entities are saved with the simulation; attach() links them back in after loading
+        return {**self.__dict__, "_entities": None}
+
+    def attach(self, entities: List[Any]):
+        """Link the index back to the entities it was built from, after it has been loaded from a checkpoint."""
+        self._entities = np.empty(max(len(entities), 1), dtype=object)
+        self._entities[:self._size] = entities[:self._size]
+
+    def append(self, entity: Any):
+        if self._size == len(self._entities):
+            self._entities = self._grow(self._entities)
+            if self._values is not None:
+                self._values = self._grow(self._values)
+            if self._weights is not None:
+                self._weights = self._grow(self._weights)
+
+        self._entities[self._size] = entity
+        if self._values is not None:
+            self._values[self._size] = getattr(entity, self.attribute)
+        if self._weights is not None:
+            self._weights[self._size] = getattr(entity, self.weight_attribute)
+            self._cumulative_weights = None
+        self._size += 1
+
+    def sample(self, rng: np.random.Generator, size: int) -> List[Any]:
+        """Draw `size` values, with replacement. The positions are drawn in a single vectorized draw."""
+        if self._size == 0:
+            raise ValueError(f"Cannot choose a {self.attribute} from an empty list of entities")
+
+        if self.weight_attribute is None:
+            positions = rng.integers(0, self._size, size=size)
+
+        else:
+            cumulative_weights = self._get_cumulative_weights()
+            total = cumulative_weights[-1]
+            positions = np.searchsorted(cumulative_weights, rng.random(size) * total, side="right")
+
+        if self._values is not None:
+            return self._values[positions].tolist()
+
+        attribute = self.attribute
+        return [getattr(entity, attribute) for entity in self._entities[positions]]
+
+    def _get_cumulative_weights(self) -> np.ndarray:
+        if self._weights is None:
+            weight_attribute = self.weight_attribute
+            weights = np.fromiter(
+                (getattr(entity, weight_attribute) for entity in self._entities[:self._size]),
+                dtype=np.float64,
+                count=self._size,
+            )
+            return np.cumsum(weights)
+
+        if self._cumulative_weights is None:
+            self._cumulative_weights = np.cumsum(self._weights[:self._size])
+        return self._cumulative_weights
+
+    @staticmethod
+    def _grow(array: np.ndarray) -> np.ndarray:
+        return np.concatenate([array, np.empty(len(array), dtype=array.dtype)])
@@ -0,0 +1,304 @@
+"""Checkpoints of a running simulation, so that a long run can be resumed after a crash.
+
+A checkpoint file is a sequence of frames, each a zlib-compressed pickle prefixed with its length. The first frame
+holds the whole state of the simulation. Each later frame only holds what changed since the frame before it: rows added
+to event stores, entities that were added or whose state changed, and so on. Resuming replays the frames in order.
+
+A SQLite export can also hold one full frame, in the dgpinata_state table, so that a later run can extend it.
+
+Entity and event types are pickled by reference, so they must be importable (i.e. defined at module level).
+
+Security: loading a checkpoint unpickles it, and unpickling can run arbitrary code. Only load checkpoints, and SQLite
+exports with saved state, that you wrote yourself or otherwise trust; never ones from an untrusted source.
+"""
+import os
+import pickle
+import random
+import sqlite3
+import struct
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from dgpinata.entity import Entity
+from dgpinata.store import EventStore
+
+frame_header = struct.Struct("<Q")
+
+# Table that holds the state of the simulation in a SQLite export
+state_table_name = "dgpinata_state"
+
+# Simulation fields that are saved as they are. Entities and events are saved separately; instrumentation isn't saved.
+unsaved_simulation_fields = ["entities", "events", "instrumentation"]
+
+def dump_frame(frame: Dict) -> bytes:
+    return zlib.compress(pickle.dumps(frame, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+def write_frame(f, frame: Dict):
+    data = dump_frame(frame)
+    f.write(frame_header.pack(len(data)))
+    f.write(data)
+
+def is_sqlite_file(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(16) == b"SQLite format 3\x00"
+
+def iter_frames(path: str) -> Iterator[Dict]:
+    """Yield the frames of a checkpoint file, in order. A frame left incomplete by a crash while writing is ignored.
+
+    For a SQLite export, yield the state saved in it.
+    """
+    if is_sqlite_file(path):
+        connection = sqlite3.connect(path)
+        try:
+            rows = connection.execute(f"SELECT frame FROM {state_table_name} ORDER BY rowid").fetchall()
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"{path} doesn't hold a simulation's state; export it with save_state=True") from e
+        finally:
+            connection.close()
+
+        for data, in rows:
+            yield pickle.loads(zlib.decompress(data))
+        return
+
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(frame_header.size)
+            if len(header) < frame_header.size:
+                return
+
+            size, = frame_header.unpack(header)
+            data = f.read(size)
+            if len(data) < size:
+                return
+
+            yield pickle.loads(zlib.decompress(data))
+
+def save_state_to_sqlite(sim: "Simulation", connection: sqlite3.Connection, sink_offsets: Dict[str, int]):
+    """Replace the state saved in a SQLite export with a full frame of sim.
+
+    Events held in memory are saved as already written, since the export holds them.
+    """
+    frame = CheckpointWriter(None)._build_frame(sim, sink_offsets, full=True, written=True)
+    connection.execute(f"CREATE TABLE IF NOT EXISTS {state_table_name} (frame BLOB)")
+    connection.execute(f"DELETE FROM {state_table_name}")
+    connection.execute(f"INSERT INTO {state_table_name} (frame) VALUES (?)", (dump_frame(frame),))
+
+def clear_state_from_sqlite(connection: sqlite3.Connection):
+    """Drop any state saved in a SQLite export, e.g. once rows that it doesn't account for have been written."""
+    connection.execute(f"DROP TABLE IF EXISTS {state_table_name}")
+
+def get_entity_state(entity: Entity) -> Tuple[Dict[str, Any], Optional[int], Optional[Dict], Dict]:
+    """Return everything about an entity that changes during a run: its fields, random stream and emitter states."""
+    fields = {
+        field_name: value
+        for field_name, value in entity.__dict__.items()
+        if field_name not in ("simulation", "emitters")
+    }
+    rng_state = entity.rng.bit_generator.state if entity.has_rng() else None
+    return fields, entity._seed_index, rng_state, entity._emitter_states
+
+
+class CheckpointWriter:
+    """Writes checkpoints of a simulation to one file, keeping track of what the last frame held."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.store_states: Dict[str, Tuple[int, int]] = {}      # Event type name -> (flushed count, rows in memory)
+        self.entity_digests: Dict[str, List[int]] = {}          # Entity type name -> hash of each entity's state
+        self.attribute_index_sizes: Dict[Tuple, int] = {}
+        self.faker_pool_keys: Set[Tuple] = set()
+
+    def write(self, sim: "Simulation", sink_offsets: Optional[Dict[str, int]] = None, full: bool = False):
+        frame = self._build_frame(sim, sink_offsets, full)
+
+        if full:
+            # Write a new file alongside the old one, so a crash part way through leaves the old checkpoint intact
+            temporary_path = f"{self.path}.tmp"
+            with open(temporary_path, "wb") as f:
+                write_frame(f, frame)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary_path, self.path)
+
+        else:
+            with open(self.path, "ab") as f:
+                write_frame(f, frame)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _build_frame(
+        self,
+        sim: "Simulation",
+        sink_offsets: Optional[Dict[str, int]],
+        full: bool,
+        written: bool = False,
+    ) -> Dict:
+        frame = {
+            "full": full,
+            "simulation": {
+                field_name: getattr(sim, field_name)
+                for field_name in type(sim).model_fields
+                if field_name not in unsaved_simulation_fields
+            },
+            "seed_sequence": sim._seed_sequence,
+            "spawned_seed_count": sim._spawned_seed_count,
+            "rng_state": sim._rng.bit_generator.state,
+            "random_state": random.getstate(),
+            "schedule": None if sim._schedule is None else [(time, key) for time, key, _ in sim._schedule],
+            "sink_offsets": sink_offsets,
+            "stores": {},
+            "entities": {},
+            "attribute_indexes": {},
+            "faker_pools": {},
+        }
+
+        # Rows before the last frame's can't have changed, unless the store has been flushed since
+        for event_type_name, events in sim.events.items():
+            flushed_count = events.total_count - len(events)
+            last_state = None if full else self.store_states.get(event_type_name)
+            if written:
+                frame["stores"][event_type_name] = ("replace", events.total_count, events.get_columns(len(events)))
+            elif last_state is not None and last_state[0] == flushed_count:
+                frame["stores"][event_type_name] = ("append", flushed_count, events.get_columns(last_state[1]))
+            else:
+                frame["stores"][event_type_name] = ("replace", flushed_count, events.get_columns())
+            self.store_states[event_type_name] = (flushed_count, len(events))
+
+        for entity_type_name, entities in sim.entities.items():
+            digests = [] if full else self.entity_digests.get(entity_type_name, [])
+            records = {}
+            for index, entity in enumerate(entities):
+                record = pickle.dumps(get_entity_state(entity), protocol=pickle.HIGHEST_PROTOCOL)
+                digest = hash(record)
+                if index >= len(digests):
+                    digests.append(digest)
+                elif digests[index] == digest:
+                    continue
+                else:
+                    digests[index] = digest
+                records[index] = record
+
+            self.entity_digests[entity_type_name] = digests
+            frame["entities"][entity_type_name] = (len(entities), records)
+
+        for entity_type_name, indexes in sim._attribute_indexes.items():
+            for key, index in indexes.items():
+                index_key = (entity_type_name,) + key
+                if full or self.attribute_index_sizes.get(index_key) != len(index):
+                    frame["attribute_indexes"][index_key] = index
+                    self.attribute_index_sizes[index_key] = len(index)
+
+        # Pools that reuse their values never change once they're made
+        for key, pool in sim._faker_pools.items():
+            if full or not pool.reuse or key not in self.faker_pool_keys:
+                frame["faker_pools"][key] = pool
+                self.faker_pool_keys.add(key)
+
+        return frame
+
+
+def load_simulation(path: str) -> "Simulation":
+    """Rebuild a simulation from a checkpoint file, ready to carry on running."""
+    from dgpinata.simulation import Simulation
+
+    state = None
+    for frame in iter_frames(path):
+        if frame["full"] or state is None:
+            state = {**frame, "stores": {}, "entities": {}}
+        else:
+            for key in ["simulation", "seed_sequence", "spawned_seed_count", "rng_state", "random_state", "schedule", "sink_offsets"]:
+                state[key] = frame[key]
+            state["attribute_indexes"].update(frame["attribute_indexes"])
+            state["faker_pools"].update(frame["faker_pools"])
+
+        for event_type_name, (mode, flushed_count, columns) in frame["stores"].items():
+            if mode == "replace" or event_type_name not in state["stores"]:
+                state["stores"][event_type_name] = (flushed_count, [columns])
+            else:
+                state["stores"][event_type_name][1].append(columns)
+
+        for entity_type_name, (count, records) in frame["entities"].items():
+            all_records = state["entities"].setdefault(entity_type_name, {})
+            all_records.update(records)
+            for index in [index for index in all_records if index >= count]:
+                del all_records[index]
+
+    if state is None:
+        raise ValueError(f"{path} doesn't contain a checkpoint")
+
+    sim = Simulation.model_construct(**state["simulation"], entities={}, events={})
+    sim._seed_sequence = state["seed_sequence"]
+    sim._spawned_seed_count = state["spawned_seed_count"]
+    sim._rng = np.random.default_rng()
+    sim._rng.bit_generator.state = state["rng_state"]
+    random.setstate(state["random_state"])
+
+    writer = CheckpointWriter(path)
+
+    for event_type in sim.event_types:
+        events = EventStore(event_type)
+        flushed_count, column_chunks = state["stores"].get(event_type.__name__, (0, []))
+        for columns in column_chunks:
+            events.extend_columns(columns, len(next(iter(columns.values()))) if columns else 0)
+        events._flushed_count = flushed_count
+        sim.events[event_type.__name__] = events
+        writer.store_states[event_type.__name__] = (flushed_count, len(events))
+
+    for entity_type in sim.entity_types:
+        records = state["entities"].get(entity_type.__name__, {})
+        _restore_entities(sim, entity_type, [records[index] for index in range(len(records))])
+        writer.entity_digests[entity_type.__name__] = [hash(records[index]) for index in range(len(records))]
+
+    for index_key, index in state["attribute_indexes"].items():
+        index.attach(sim.entities[index_key[0]])
+        sim._attribute_indexes.setdefault(index_key[0], {})[index_key[1:]] = index
+        writer.attribute_index_sizes[index_key] = len(index)
+
+    sim._faker_pools = dict(state["faker_pools"])
+    writer.faker_pool_keys = set(state["faker_pools"])
+
+    if state["schedule"] is not None:
+        # The saved schedule is already in heap order
+        sim._schedule = [
+            (time, key, sim.entities[sim.entity_types[key[0]].__name__][key[1]])
+            for time, key in state["schedule"]
+        ]
+
+    sim._sink_offsets = state["sink_offsets"]
+
+    # Later checkpoints go to a new file, rather than into a SQLite export
+    sim._checkpoint_writer = None if is_sqlite_file(path) else writer
+    return sim
+
+def _restore_entities(sim: "Simulation", entity_type: type, records: List[bytes]):
+    entity_states = [pickle.loads(record) for record in records]
+    sim.entities[entity_type.__name__] = build_entities(sim, entity_type, entity_states)
+
+def build_entities(sim: "Simulation", entity_type: type, entity_states: List[Tuple]) -> List[Entity]:
+    """Build entities of one type from states returned by get_entity_state, without adding them to sim."""
+    if not entity_states:
+        return []
+
+    columns = {field_name: [fields[field_name] for fields, *_ in entity_states] for field_name in entity_states[0][0]}
+    entities = sim._construct_entities(entity_type, columns, len(entity_states))
+
+    for entity, entity_state in zip(entities, entity_states):
+        set_entity_state(entity, entity_state, fields=False)
+
+    return entities
+
+def set_entity_state(entity: Entity, entity_state: Tuple, fields: bool = True):
+    """Give an entity a state returned by get_entity_state. If not fields, its fields are left as they are."""
+    entity_fields, seed_index, rng_state, emitter_states = entity_state
+    if fields:
+        entity.__dict__.update(entity_fields)
+
+    entity._seed_index = seed_index
+    entity._emitter_states = emitter_states
+    if rng_state is not None:
+        # Making a Generator costs far more than setting the state of one the entity already has
+        if not entity.has_rng():
+            entity.set_rng(np.random.default_rng())
+        entity.rng.bit_generator.state = rng_state
@@ -1,14 +1,53 @@
-import random
-from pydantic import BaseModel
+import numpy as np
+import re
+from pydantic import BaseModel, PrivateAttr
+from typing import Any, Callable, List, Optional
+
+from dgpinata.evaluation import compile_eval_str
 
 class Chooser(BaseModel):
-    pass
+
+    def invoke(self, sim, parent, timestamp):
+        raise NotImplementedError
+
+    def invoke_batch(self, sim, parent, timestamps) -> List[Any]:
+        """Return one value for each timestamp. Subclasses can override this with a vectorized version."""
+        return [
+            self.invoke(sim=sim, parent=parent, timestamp=timestamp)
+            for timestamp in timestamps.tolist()
+        ]
+
+# Matches object_eval_strs like 'sim.entities["Product"]', which can be served from an index instead of evaluated
+entity_list_pattern = re.compile(r"""^\s*sim\.entities\[\s*(['"])(\w+)\1\s*\]\s*$""")
 
 class RandomObjectAttributeChooser(Chooser):
-    """Pick a random object from a list and return the value of a specified attribute of that object."""
+    """Pick a random object from a list and return the value of a specified attribute of that object.
+
+    When object_eval_str is all the entities of one type (e.g. 'sim.entities["Product"]'), values are drawn from an
+    index that the simulation maintains, so a whole batch is a single vectorized draw. If weight_attribute is given,
+    objects are chosen in proportion to that attribute.
+
+    Set snapshot=True to have the index read the attribute and weight of each object once, when the object is added
+    to the index, rather than at each draw. Draws are faster, but later changes to those attributes aren't seen.
+    """
 
     object_eval_str: str # A string that can be evaluated to a list of objects
     attribute: str       # The attribute to return from the chosen object
+    weight_attribute: Optional[str] = None # An attribute of the objects to weight the choice by
+    snapshot: bool = False               # Read attribute values once per object, when it's added
+
+    _compiled_object_eval_str: Optional[Callable] = PrivateAttr(default=None)
+    _entity_type_name: Optional[str] = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._compiled_object_eval_str = compile_eval_str(self.object_eval_str)
+
+        match = entity_list_pattern.match(self.object_eval_str)
+        if match is not None:
+            self._entity_type_name = match.group(2)
+
+    def _get_rng(self, sim, parent):
+        return parent.rng if parent is not None else sim.rng
 
     def invoke(
         self,
@@ -16,7 +55,52 @@ class RandomObjectAttributeChooser(Chooser):
         parent,    # Even though this parameter is never used in the code, it might be used in the eval statement
         timestamp, # Even though this parameter is never used in the code, it might be used in the eval statement
     ):
-        obj_list = eval(self.object_eval_str)
-        obj = random.choice(obj_list)
+        if self._entity_type_name is not None:
+            return self.invoke_batch(sim, parent, np.array([timestamp]))[0]
+
+        obj_list = self._compiled_object_eval_str(sim, parent, timestamp)
+        rng = self._get_rng(sim, parent)
+
+        if self.weight_attribute is None:
+            obj = obj_list[int(rng.integers(len(obj_list)))]
+        else:
+            weights = np.array([getattr(candidate, self.weight_attribute) for candidate in obj_list], dtype=np.float64)
+            obj = obj_list[int(rng.choice(len(obj_list), p=weights / weights.sum()))]
+
         attr = getattr(obj, self.attribute)
-        return attr
\ No newline at end of file
+        return attr
+
+    def invoke_batch(self, sim, parent, timestamps) -> List[Any]:
+        if self._entity_type_name is None:
+            return super().invoke_batch(sim, parent, timestamps)
+
+        index = sim.get_attribute_index(self._entity_type_name, self.attribute, self.weight_attribute, self.snapshot)
+        return index.sample(self._get_rng(sim, parent), len(timestamps))
+
+
+class FakerChooser(Chooser):
+    """Return a value from a Faker provider, e.g. FakerChooser(provider="first_name").
+
+    Values come from a pool that the simulation keeps for each provider and settings, seeded from the simulation's
+    random stream. See FakerPool for what reuse and background do.
+    """
+
+    provider: str                 # The name of a Faker provider method, e.g. "first_name"
+    locale: Optional[str] = None  # The Faker locale
+    pool_size: int = 10000        # How many values to generate at a time
+    reuse: bool = True            # Draw from a fixed pool with replacement, instead of using each value once
+    background: bool = False      # When not reusing values, generate the next blocks in a background thread
+
+    def invoke(self, sim, parent, timestamp):
+        return self.invoke_batch(sim, parent, np.array([timestamp]))[0]
+
+    def invoke_batch(self, sim, parent, timestamps) -> List[Any]:
+        pool = sim.get_faker_pool(
+            provider=self.provider,
+            locale=self.locale,
+            pool_size=self.pool_size,
+            reuse=self.reuse,
+            background=self.background,
+        )
+        rng = parent.rng if parent is not None else sim.rng
+        return pool.take(rng, len(timestamps))
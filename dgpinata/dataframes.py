@@ -0,0 +1,25 @@
+"""DataFrame adapters for columns of simulation output. Require pandas or polars, e.g. `pip install dgpinata[pandas]`."""
+from typing import Dict
+
+import numpy as np
+
+def to_pandas(columns: Dict[str, np.ndarray]) -> "pandas.DataFrame":
+    """Build a pandas DataFrame from one array per column, without copying numeric columns where pandas allows."""
+    try:
+        import pandas
+    except ImportError as e:
+        raise ImportError("DataFrame output requires pandas: pip install dgpinata[pandas]") from e
+
+    return pandas.DataFrame(columns, copy=False)
+
+def to_polars(columns: Dict[str, np.ndarray]) -> "polars.DataFrame":
+    """Build a polars DataFrame from one array per column."""
+    try:
+        import polars
+    except ImportError as e:
+        raise ImportError("DataFrame output requires polars: pip install dgpinata[polars]") from e
+
+    return polars.DataFrame({
+        column_name: values.tolist() if values.dtype == object else values
+        for column_name, values in columns.items()
+    })
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import ClassVar, List
+from pydantic import BaseModel, TypeAdapter
+from typing import Annotated, ClassVar, Dict, List, Sequence, Tuple
 
 annotation_type_lookup = {
     str : "TEXT",
@@ -7,6 +7,9 @@ annotation_type_lookup = {
     float: "FLOAT",
 }
 
+# Cached validators for whole columns of a field, keyed by (type, field name)
+_column_adapters: Dict[Tuple[type, str], TypeAdapter] = {}
+
 class Recordable(BaseModel):
     """An object that can be recorded in the simulation DB."""
 
@@ -16,6 +19,39 @@ class Recordable(BaseModel):
         "table_name",
     ]
 
+    @classmethod
+    def get_column_names(cls) -> List[str]:
+        return [field_name for field_name in cls.model_fields.keys() if field_name not in cls.column_block_list]
+
+    @classmethod
+    def has_custom_validators(cls) -> bool:
+        """Whether this type has field or model validators, which column-wise validation would skip."""
+        decorators = cls.__pydantic_decorators__
+        return bool(decorators.field_validators or decorators.model_validators)
+
+    @classmethod
+    def validate_column(cls, field_name: str, values: Sequence) -> List:
+        """Validate every value of one field at once, against the field's annotation and constraints (e.g. ge=0)."""
+        key = (cls, field_name)
+        if key not in _column_adapters:
+            field = cls.model_fields[field_name]
+            value_type = Annotated[(field.annotation, *field.metadata)] if field.metadata else field.annotation
+            _column_adapters[key] = TypeAdapter(List[value_type])
+
+        return _column_adapters[key].validate_python(values)
+
+    @classmethod
+    def get_default_column(cls, field_name: str, n: int) -> List:
+        """Return n default values for a field, calling its default_factory once per value."""
+        field = cls.model_fields[field_name]
+        if field.default_factory is not None:
+            return [field.default_factory() for _ in range(n)]
+
+        if field.is_required():
+            raise ValueError(f"{cls.__name__}.{field_name} is required, but no value was provided")
+
+        return [field.default] * n
+
     @classmethod
     def get_create_table_sql(cls) -> str:
         field_str_list = []
@@ -35,6 +71,19 @@ CREATE TABLE {cls.table_name} (
 """
         return schema_str
     
+    @classmethod
+    def get_parameterized_insert_sql(cls) -> str:
+        """Return an INSERT statement with one `?` placeholder per column, for use with executemany."""
+        column_names = cls.get_column_names()
+        field_str = ", ".join(column_names)
+        placeholder_str = ", ".join("?" for _ in column_names)
+
+        return f"""INSERT INTO {cls.table_name} ({field_str}) VALUES ({placeholder_str})"""
+
+    def get_row(self) -> tuple:
+        """Return the values of this object's columns, in the same order as get_column_names."""
+        return tuple(getattr(self, column_name) for column_name in self.get_column_names())
+
     def get_insert_sql(self):
         column_names = [column_name for column_name in self.model_fields.keys() if column_name not in self.column_block_list]
         field_str = ", ".join(column_names)
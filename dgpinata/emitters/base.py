@@ -1,19 +1,111 @@
-from pydantic import BaseModel
-from typing import Any, Dict, List, Optional
+import numpy as np
+from pydantic import BaseModel, PrivateAttr
+from typing import Any, Callable, Dict, List, Optional, Sequence
 
-from dgpinata.message import Message, AddEvent, AddEntity
+from dgpinata.chooser import Chooser
+from dgpinata.evaluation import compile_eval_str
+from dgpinata.message import Message, AddEvents, AddEntity
 
 class ParameterBuilder(BaseModel):
     name: str
     eval_str: Optional[str] = None
     value: Optional[Any] = None
 
+    _compiled_eval_str: Optional[Callable] = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        if self.eval_str is not None:
+            self._compiled_eval_str = compile_eval_str(self.eval_str)
+
+    def build(self, sim: "Simulation", parent: "Entity", timestamp: int) -> Any:
+        """Build the value of this parameter for a single Event or Entity."""
+        if self._compiled_eval_str is not None:
+            return self._compiled_eval_str(sim, parent, timestamp)
+
+        elif isinstance(self.value, Chooser):
+            return self.value.invoke(
+                sim=sim,
+                parent=parent,
+                timestamp=timestamp,
+            )
+
+        else:
+            return self.value
+
+    def build_column(self, sim: "Simulation", parent: "Entity", timestamps: np.ndarray) -> Sequence[Any]:
+        """Build the values of this parameter for a batch of Events that share a parent."""
+        if self.eval_str == "timestamp":
+            # Stores take int64 arrays as they are, without validating each value
+            return timestamps
+
+        elif self._compiled_eval_str is not None:
+            compiled = self._compiled_eval_str
+            return [compiled(sim, parent, timestamp) for timestamp in timestamps.tolist()]
+
+        elif isinstance(self.value, Chooser):
+            return self.value.invoke_batch(
+                sim=sim,
+                parent=parent,
+                timestamps=timestamps,
+            )
+
+        else:
+            return [self.value] * len(timestamps)
+
 
 class Emitter(BaseModel):
     event_type_name: Optional[str] = None
     entity_type_name: Optional[str] = None
     parameter_builders: Dict[str, ParameterBuilder]
 
+    _rng: Optional[np.random.Generator] = PrivateAttr(default=None)
+    _state: Dict = PrivateAttr(default_factory=dict)
+    _event_store: Optional["EventStore"] = PrivateAttr(default=None)
+    _entity_type: Optional[type] = PrivateAttr(default=None)
+
+    def bind(self, sim: "Simulation"):
+        """Resolve this emitter's target once, so that emitted messages carry it instead of a type name to look up."""
+        if self.event_type_name is not None:
+            self._event_store = sim.events.get(self.event_type_name)
+
+        elif self.entity_type_name is not None:
+            self._entity_type = sim.entity_type_lookup.get(self.entity_type_name)
+
+    def seed(self, seed: Optional[int] = None):
+        """Seed the random stream used when this emitter is called without a parent entity, and restart its state."""
+        self._rng = np.random.default_rng(seed)
+        self._state = {}
+
+    def _get_rng(self, parent: "Entity") -> np.random.Generator:
+        """Draw from the parent entity's random stream, so that every entity is reproducible on its own."""
+        if parent is not None:
+            return parent.rng
+
+        if self._rng is None:
+            self._rng = np.random.default_rng()
+        return self._rng
+
+    def _uses_rng(self) -> bool:
+        """Whether emitting draws random numbers. Emitters that never do skip creating their parents' random streams."""
+        return True
+
+    def _get_state(self, parent: "Entity") -> Dict:
+        """Return the state this emitter carries between steps. Each parent entity keeps its own."""
+        if parent is not None:
+            return parent.get_emitter_state(self)
+
+        return self._state
+
+    def _resolve_parameter(self, value: Any, parent: "Entity", timestamp: int) -> Any:
+        """Evaluate an emitter setting that may be given as a ParameterBuilder."""
+        if isinstance(value, (int, float)):
+            return value
+
+        if isinstance(value, ParameterBuilder):
+            return parent.sim._build_parameter(value, parent, timestamp)
+
+        return value
+
     def emit(
         self,
         parent: "Entity",
@@ -47,36 +139,69 @@ class Emitter(BaseModel):
 
         Note: prev_timestamp is inclusive, timestamp is exclusive.
         If prev_timestamp == timestamp, no events are emitted.
-        """
-        intervals = self._get_interval_start_time_list(parent, prev_timestamp, timestamp)
-
-        actions = []
-        for interval_start in intervals:
-            new_action = self._emit_event(parent, interval_start)
-            if new_action is not None:
-                actions.append(new_action)
-        
-        return actions
 
-    def _get_interval_start_time_list(self, parent: "Entity", prev_timestamp: int, timestamp: int):
-        raise NotImplementedError
-    
-    def _emit_event(self, parent: "Entity", timestamp: int) -> Optional[Message]:
+        Events are emitted as a single AddEvents batch. Entities are emitted as one AddEntity per timestamp.
+        """
+        # The random stream is resolved once here and passed down, since finding it costs more than most draws
+        rng = self._get_rng(parent) if self._uses_rng() else None
+        timestamps = self._get_emission_timestamps(parent, prev_timestamp, timestamp, rng)
+        if len(timestamps) == 0:
+            return []
 
+        # Messages built here are trusted, so they skip validation. The bound targets are read from pydantic's private
+        # storage directly, since its attribute lookup for private attributes is slow enough to show up here.
+        private = self.__pydantic_private__
         if self.event_type_name is not None:
-            return AddEvent(
+            return [AddEvents.construct_trusted(
                 event_type_name=self.event_type_name,
                 parameter_builders=self.parameter_builders,
                 parent=parent,
-                timestamp=timestamp,
-            )
-        
+                timestamps=timestamps,
+                event_store=private["_event_store"],
+            )]
+
         elif self.entity_type_name is not None:
-            return AddEntity(
-                entity_type_name=self.entity_type_name,
-                parameter_builders=self.parameter_builders,
-                parent=parent,
-                timestamp=timestamp,
-            )
+            entity_type = private["_entity_type"]
+            return [
+                AddEntity.construct_trusted(
+                    entity_type_name=self.entity_type_name,
+                    parameter_builders=self.parameter_builders,
+                    parent=parent,
+                    timestamp=emission_timestamp,
+                    entity_type=entity_type,
+                )
+                for emission_timestamp in timestamps.tolist()
+            ]
+
+        return []
+
+    def _get_interval_start_time_list(
+        self,
+        parent: "Entity",
+        prev_timestamp: int,
+        timestamp: int,
+        rng: Optional[np.random.Generator],
+    ):
+        raise NotImplementedError
+
+    def get_next_emission_time(self, parent: "Entity", timestamp: int) -> float:
+        """Return the earliest time at or after `timestamp` at which this emitter might emit.
+
+        The event-driven scheduler uses this to skip entities that have nothing due. By default an emitter might emit in
+        every step, so it is always due.
+        """
+        return timestamp
 
-        return None    
+    def _get_emission_timestamps(
+        self,
+        parent: "Entity",
+        prev_timestamp: int,
+        timestamp: int,
+        rng: Optional[np.random.Generator],
+    ) -> np.ndarray:
+        """Return the timestamps of all emissions in [prev_timestamp, timestamp), as an int64 array.
+
+        rng is the parent's random stream, or None if the emitter doesn't use one.
+        """
+        intervals = self._get_interval_start_time_list(parent, prev_timestamp, timestamp, rng)
+        return np.asarray(intervals).astype(np.int64)
@@ -1,14 +1,16 @@
-from typing import Dict, Optional, Union
+from typing import Any, Dict, Optional, Tuple, Union
 
 import numpy as np
-from dgpinata.emitters.base import Emitter, ParameterBuilder
+from dgpinata.emitters.base import ParameterBuilder
+from dgpinata.emitters.renewal import RenewalEmitter
 
-class GammaEmitter(Emitter):
+class GammaEmitter(RenewalEmitter):
+    """Emits events with gamma-distributed gaps between them. The gaps average shape * scale seconds."""
 
     # event_type_name: Optional[str] = None
     # entity_type_name: Optional[str] = None
-    shape: Union[int, ParameterBuilder]
-    scale: Union[int, ParameterBuilder]
+    shape: Union[float, ParameterBuilder]
+    scale: Union[float, ParameterBuilder]
     # parameter_builders: Dict[str, ParameterBuilder]
 
     @classmethod
@@ -16,8 +18,8 @@ class GammaEmitter(Emitter):
         cls,
         event_type_name: Optional[str] = None,
         entity_type_name: Optional[str] = None,
-        shape: Optional[Union[int, str]] = None,
-        scale: Optional[Union[int, str]] = None,
+        shape: Optional[Union[float, str]] = None,
+        scale: Optional[Union[float, str]] = None,
         **kwargs,
     ):
         """Creates a GammaEmitter from parameters.
@@ -25,13 +27,19 @@ class GammaEmitter(Emitter):
         Args:
             event_type_name (Optional[str]): The name of the event type to emit.
             entity_type_name (Optional[str]): The name of the entity type to emit.
-            shape (Optional[Union[int, str]]): The shape parameter of the gamma distribution.
-            scale (Optional[Union[int, str]]): The scale parameter of the gamma distribution.
+            shape (Optional[Union[float, str]]): The shape parameter of the gamma distribution.
+            scale (Optional[Union[float, str]]): The scale parameter of the gamma distribution, in seconds.
             parameter_builders (Optional[Dict[str, ParameterBuilder]]): The parameter builders.
 
         Returns:
             GammaEmitter: The GammaEmitter instance.
         """
+        if type(shape) == str:
+            shape = ParameterBuilder(name="shape", eval_str=shape)
+
+        if type(scale) == str:
+            scale = ParameterBuilder(name="scale", eval_str=scale)
+
         parameter_builders = cls._define_parameter_builders(**kwargs)
         return cls(
             event_type_name=event_type_name,
@@ -41,18 +49,21 @@ class GammaEmitter(Emitter):
             parameter_builders=parameter_builders,
         )
     
-    def _get_interval_start_time_list(self, parent: "Entity", prev_timestamp: int, timestamp: int):
-        duration = timestamp - prev_timestamp
-
-        inter_arrival_times = np.random.gamma(self.shape, 1/self.rate, size=1000)
-
-        # Generate cumulative event times
-        event_times = np.cumsum(inter_arrival_times)
-        
-        # Filter out event times that are beyond the specified interval
-        event_times = event_times[event_times < duration]
+    def _get_rate_parameters(self) -> Tuple[Any, ...]:
+        return self.shape, self.scale
 
-        # Adjust event times to start from start_time
-        event_times = event_times + prev_timestamp
+    def _get_mean_inter_arrival_time(self, parent: "Entity", timestamp: int) -> float:
+        shape = self._resolve_parameter(self.shape, parent, timestamp)
+        scale = self._resolve_parameter(self.scale, parent, timestamp)
+        return shape * scale
 
-        return event_times
\ No newline at end of file
+    def _draw_inter_arrival_times(
+        self,
+        parent: "Entity",
+        timestamp: int,
+        size: int,
+        rng: np.random.Generator,
+    ) -> np.ndarray:
+        shape = self._resolve_parameter(self.shape, parent, timestamp)
+        scale = self._resolve_parameter(self.scale, parent, timestamp)
+        return rng.gamma(shape, scale, size=size)
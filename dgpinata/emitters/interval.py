@@ -1,9 +1,8 @@
 from enum import Enum
+import numpy as np
 from pydantic import BaseModel
-import random
-from typing import Dict, Optional, Union
+from typing import Dict, List, Optional, Union
 
-from dgpinata.message import Message
 from dgpinata.emitters.base import Emitter, ParameterBuilder
 
 
@@ -18,6 +17,10 @@ class UniformDistributionParams(BaseModel):
 class ExponentialDistributionParams(BaseModel):
     lambda_: float
 
+# Returned for steps without emissions, so they don't each build an empty array
+empty_timestamps = np.empty(0, dtype=np.int64)
+empty_timestamps.flags.writeable = False
+
 class IntervalSpacingOption(str, Enum):
     START="start"
     UNIFORM="uniform"
@@ -30,6 +33,11 @@ class IntervalEmitter(Emitter):
 
     You can use skip_probability to skip events at random
 
+    Offsets and uniform spacing can move an event out of the step its interval starts in. Events moved past the end of
+    the step are kept in the emitter's state and emitted in the step they fall in. Intervals are drawn far enough ahead
+    that negative offsets can move events back into the current step (to four standard deviations, for normal
+    offsets); events that would still fall before the step, as some do in the first step, are moved to its start.
+
     Args:
         event_type_name (str): The name of the event type to emit.
         entity_type_name (str): The name of the entity type to emit.
@@ -94,54 +102,167 @@ class IntervalEmitter(Emitter):
             parameter_builders=parameter_builders,
         )
     
-    def _get_interval_start_time_list(self, parent: "Entity", prev_timestamp: int, timestamp: int):
-        """Return a list of start times for each interval."""
+    def _uses_rng(self) -> bool:
+        return self.spacing == IntervalSpacingOption.UNIFORM or self.skip_probability != 0 or self._has_offset()
+
+    def _get_interval_start_time_list(
+        self,
+        parent: "Entity",
+        prev_timestamp: int,
+        timestamp: int,
+        rng: Optional[np.random.Generator],
+    ) -> np.ndarray:
+        """Return an array of start times for each interval."""
+
+        interval = self._resolve_parameter(self.interval, parent, timestamp)
+
+        start_times = np.arange(prev_timestamp, timestamp, interval, dtype=np.int64)
 
-        if isinstance(self.interval, ParameterBuilder):
-            interval = parent.sim._build_parameter(self.interval, parent, timestamp)
+        if self.spacing == IntervalSpacingOption.START:
+            return start_times
+        elif self.spacing == IntervalSpacingOption.UNIFORM:
+            return start_times + rng.integers(0, interval, size=len(start_times), endpoint=True)
         else:
-            interval = self.interval
+            raise ValueError(f"Unsupported spacing option: {self.spacing}")
 
-        start_time_list = []
-        for i in range(prev_timestamp, timestamp, interval):
+    def _get_emission_timestamps(
+        self,
+        parent: "Entity",
+        prev_timestamp: int,
+        timestamp: int,
+        rng: Optional[np.random.Generator],
+    ) -> np.ndarray:
+        """Compute the whole step at once: the interval slots, then the skip mask, then the offsets."""
 
-            if self.spacing == IntervalSpacingOption.START:
-                start_time_list.append(i)
-            elif self.spacing == IntervalSpacingOption.UNIFORM:
-                start_time_list.append(i + random.randint(0, interval))
-            else:
-                raise ValueError(f"Unsupported spacing option: {self.spacing}")
+        if self.spacing == IntervalSpacingOption.UNIFORM or self._has_offset():
+            return self._get_carried_emission_timestamps(parent, prev_timestamp, timestamp, rng)
 
-        return start_time_list
+        if isinstance(self.interval, int) and timestamp - prev_timestamp <= 2 * self.interval:
+            emission_timestamps = self._get_few_emission_timestamps(parent, prev_timestamp, timestamp, rng)
+            return np.array(emission_timestamps, dtype=np.int64) if emission_timestamps else empty_timestamps
 
-    def _emit_event(self, parent: "Entity", timestamp: int) -> Optional[Message]:
+        emission_timestamps = self._get_interval_start_time_list(parent, prev_timestamp, timestamp, rng)
 
-        if self.skip_probability > 0 and random.random() < self.skip_probability:
-            return None
-        
-        self._get_offset(parent, timestamp)
+        skip_probability = self._resolve_parameter(self.skip_probability, parent, timestamp)
 
-        return super()._emit_event(parent, timestamp)
-    
-    def _get_offset(self, parent: "Entity", timestamp: int) -> int:
-        offset = 0
+        if skip_probability > 0:
+            keep = rng.random(len(emission_timestamps)) >= skip_probability
+            emission_timestamps = emission_timestamps[keep]
+
+        return emission_timestamps
+
+    def _get_carried_emission_timestamps(
+        self,
+        parent: "Entity",
+        prev_timestamp: int,
+        timestamp: int,
+        rng: Optional[np.random.Generator],
+    ) -> np.ndarray:
+        """Compute a step whose events can be moved out of their interval, by offsets or uniform spacing.
+
+        Stores and iter_steps rely on each step's events falling within the step, so events are drawn for every interval
+        that starts before the end of the step plus the lookahead, and those that fall past the end are carried in the
+        emitter's state until their step.
+        """
+        state = self._get_state(parent)
+        interval = self._resolve_parameter(self.interval, parent, timestamp)
+
+        first_slot = max(state.get("next_slot", prev_timestamp), prev_timestamp)
+        emission_timestamps = np.arange(first_slot, timestamp + self._get_lookahead(), interval, dtype=np.int64)
+        if len(emission_timestamps) > 0:
+            state["next_slot"] = int(emission_timestamps[-1]) + interval
+
+        if self.spacing == IntervalSpacingOption.UNIFORM:
+            emission_timestamps += rng.integers(0, interval, size=len(emission_timestamps), endpoint=True)
+
+        skip_probability = self._resolve_parameter(self.skip_probability, parent, timestamp)
+        if skip_probability > 0:
+            keep = rng.random(len(emission_timestamps)) >= skip_probability
+            emission_timestamps = emission_timestamps[keep]
+
+        if self._has_offset():
+            emission_timestamps += self._get_offsets(rng, len(emission_timestamps))
+
+        pending_timestamps = state.get("pending_timestamps")
+        if pending_timestamps:
+            emission_timestamps = np.concatenate([np.array(pending_timestamps, dtype=np.int64), emission_timestamps])
+        emission_timestamps.sort()
+
+        split = np.searchsorted(emission_timestamps, timestamp)
+        state["pending_timestamps"] = emission_timestamps[split:].tolist()
+
+        # Events can't be emitted before the step they're drawn in
+        return np.maximum(emission_timestamps[:split], prev_timestamp)
+
+    def _get_few_emission_timestamps(
+        self,
+        parent: "Entity",
+        prev_timestamp: int,
+        timestamp: int,
+        rng: Optional[np.random.Generator],
+    ) -> List[int]:
+        """Compute a step with only one or two slots, as sparse emitters' steps are, with scalar draws.
+
+        NumPy's per-call overhead dwarfs the work on arrays this small. The draws are made in the same order as the
+        vectorized path, so both give the same timestamps.
+        """
+        emission_timestamps = list(range(prev_timestamp, timestamp, self.interval))
+
+        skip_probability = self.skip_probability
+        if not isinstance(skip_probability, (int, float)):
+            skip_probability = self._resolve_parameter(skip_probability, parent, timestamp)
+
+        if skip_probability > 0:
+            emission_timestamps = [t for t in emission_timestamps if rng.random() >= skip_probability]
+
+        return emission_timestamps
+
+    def _has_offset(self) -> bool:
+        return (
+            self.constant_offset is not None
+            or self.normal_offset is not None
+            or self.uniform_offset is not None
+            or self.exponential_offset is not None
+        )
+
+    def _get_lookahead(self) -> int:
+        """How far past the end of a step to draw intervals, so that negative offsets can move their events into it."""
+        lookahead = 0.0
 
         if self.constant_offset is not None:
-            offset += self.constant_offset
+            lookahead -= min(self.constant_offset, 0)
 
         if self.normal_offset is not None:
-            offset += int(random.normalvariate(
+            lookahead -= min(self.normal_offset.mean - 4 * self.normal_offset.standard_deviation, 0)
+
+        if self.uniform_offset is not None:
+            lookahead -= min(self.uniform_offset.min, 0)
+
+        return int(np.ceil(lookahead))
+
+    def _get_offsets(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        """Return n offsets, one for each emitted event."""
+        offsets = np.zeros(n, dtype=np.int64)
+
+        if self.constant_offset is not None:
+            offsets += self.constant_offset
+
+        if self.normal_offset is not None:
+            offsets += rng.normal(
                 self.normal_offset.mean,
                 self.normal_offset.standard_deviation,
-            ))
+                size=n,
+            ).astype(np.int64)
 
         if self.uniform_offset is not None:
-            offset += random.randint(
+            offsets += rng.integers(
                 self.uniform_offset.min,
                 self.uniform_offset.max,
+                size=n,
+                endpoint=True,
             )
 
         if self.exponential_offset is not None:
-            offset += int(random.expovariate(self.exponential_offset.lambda_))
-        
-        return 0
\ No newline at end of file
+            offsets += rng.exponential(1 / self.exponential_offset.lambda_, size=n).astype(np.int64)
+
+        return offsets
@@ -1,15 +1,16 @@
-from typing import Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import numpy as np
 
-from dgpinata.message import Message, AddEvent, AddEntity
-from dgpinata.emitters.base import Emitter, ParameterBuilder
+from dgpinata.emitters.base import ParameterBuilder
+from dgpinata.emitters.renewal import RenewalEmitter
+
+class PoissonEmitter(RenewalEmitter):
+    """Emits events as a Poisson process, averaging `rate` events every `time_interval` seconds."""
 
-class PoissonEmitter(Emitter):
-    
     # event_type_name: Optional[str] = None
     # entity_type_name: Optional[str] = None
-    rate: Union[int, ParameterBuilder]
+    rate: Union[float, ParameterBuilder]
     time_interval: Union[int, ParameterBuilder]
     # parameter_builders: Dict[str, ParameterBuilder]
 
@@ -18,8 +19,8 @@ class PoissonEmitter(Emitter):
         cls,
         event_type_name: Optional[str] = None,
         entity_type_name: Optional[str] = None,
-        rate: Optional[Union[int, str]] = None,
-        time_interval: Optional[Union[int, str]] = None,
+        rate: Optional[Union[float, str]] = None,
+        time_interval: Optional[Union[int, str]] = 1,
         # parameter_builders: Optional[Dict[str, ParameterBuilder]] = None,
         **kwargs,
     ):
@@ -28,13 +29,19 @@ class PoissonEmitter(Emitter):
         Args:
             event_type_name (Optional[str]): The name of the event type to emit.
             entity_type_name (Optional[str]): The name of the entity type to emit.
-            rate (Optional[Union[int, str]]): The rate of the Poisson process.
-            time_interval (Optional[Union[int, str]]): The time interval.
+            rate (Optional[Union[float, str]]): The average number of events per time_interval.
+            time_interval (Optional[Union[int, str]]): The time interval that rate is measured over, in seconds.
             parameter_builders (Optional[Dict[str, ParameterBuilder]]): The parameter builders.
 
         Returns:
             PoissonEmitter: The PoissonEmitter instance.
         """
+        if type(rate) == str:
+            rate = ParameterBuilder(name="rate", eval_str=rate)
+
+        if type(time_interval) == str:
+            time_interval = ParameterBuilder(name="time_interval", eval_str=time_interval)
+
         parameter_builders = cls._define_parameter_builders(**kwargs)
         return cls(
             event_type_name=event_type_name,
@@ -44,16 +51,19 @@ class PoissonEmitter(Emitter):
             parameter_builders=parameter_builders,
         )
 
-    def _get_interval_start_time_list(self, parent: "Entity", prev_timestamp: int, timestamp: int):
-        duration = timestamp - prev_timestamp
-
-        # Generate the number of events
-        num_events = np.random.poisson(self.rate * duration)
-
-        # Generate event times uniformly in the interval [start_time, end_time]
-        points = np.random.uniform(timestamp, prev_timestamp, num_events)
+    def _get_rate_parameters(self) -> Tuple[Any, ...]:
+        return self.rate, self.time_interval
 
-        # Sort the points in ascending order (optional, for easier interpretation)
-        points = np.sort(points)
+    def _get_mean_inter_arrival_time(self, parent: "Entity", timestamp: int) -> float:
+        rate = self._resolve_parameter(self.rate, parent, timestamp)
+        time_interval = self._resolve_parameter(self.time_interval, parent, timestamp)
+        return time_interval / rate if rate > 0 else np.inf
 
-        return points
+    def _draw_inter_arrival_times(
+        self,
+        parent: "Entity",
+        timestamp: int,
+        size: int,
+        rng: np.random.Generator,
+    ) -> np.ndarray:
+        return rng.exponential(self._get_mean_inter_arrival_time(parent, timestamp), size=size)
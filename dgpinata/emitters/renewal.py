@@ -0,0 +1,99 @@
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+from dgpinata.emitters.base import Emitter, ParameterBuilder
+
+class RenewalEmitter(Emitter):
+    """Emits events at the arrival times of a renewal process, i.e. with independent, identically distributed gaps.
+
+    The process runs continuously across steps: each parent keeps the arrival times that have been drawn but not yet
+    emitted, so no draws are thrown away at step boundaries. Gaps are drawn in blocks sized to the number of arrivals
+    expected before the end of the step, so both rare and frequent emitters do O(events) work.
+
+    A zero rate (a mean gap that is zero, infinite or not a number) stops the process: there are no more arrivals, and
+    the next arrival is parked at inf. If the rate is given as a ParameterBuilder, a stopped process checks it again in
+    every step, and restarts at the beginning of the first step in which it is positive. Subclasses define the
+    distribution of the gaps.
+    """
+
+    def _get_mean_inter_arrival_time(self, parent: "Entity", timestamp: int) -> float:
+        raise NotImplementedError
+
+    def _draw_inter_arrival_times(
+        self,
+        parent: "Entity",
+        timestamp: int,
+        size: int,
+        rng: np.random.Generator,
+    ) -> np.ndarray:
+        raise NotImplementedError
+
+    def _get_rate_parameters(self) -> Tuple[Any, ...]:
+        """The settings the mean gap is computed from, which a stopped process checks for ParameterBuilders."""
+        raise NotImplementedError
+
+    def _get_interval_start_time_list(
+        self,
+        parent: "Entity",
+        prev_timestamp: int,
+        timestamp: int,
+        rng: np.random.Generator,
+    ) -> np.ndarray:
+        """Return the arrival times in [prev_timestamp, timestamp), carrying later arrivals over to the next step."""
+        state = self._get_state(parent)
+
+        # The process starts at the beginning of the first step it is asked about, and restarts at the beginning of the
+        # first step after it stopped in which the rate is positive again
+        if "pending_arrivals" not in state or self._can_restart(parent, timestamp):
+            if self._is_stopped(parent, timestamp):
+                state["pending_arrivals"] = np.array([np.inf])
+            else:
+                state["pending_arrivals"] = prev_timestamp + np.cumsum(self._draw_inter_arrival_times(parent, timestamp, 1, rng))
+
+        pending_arrivals = state["pending_arrivals"]
+        while pending_arrivals[-1] < timestamp:
+            if self._is_stopped(parent, timestamp):
+                pending_arrivals = np.append(pending_arrivals, np.inf)
+                break
+
+            expected = (timestamp - pending_arrivals[-1]) / self._get_mean_inter_arrival_time(parent, timestamp)
+            block_size = int(expected * 1.1) + 1
+            gaps = self._draw_inter_arrival_times(parent, timestamp, block_size, rng)
+            pending_arrivals = np.concatenate([pending_arrivals, pending_arrivals[-1] + np.cumsum(gaps)])
+
+        n_arrivals = np.searchsorted(pending_arrivals, timestamp, side="left")
+        state["pending_arrivals"] = pending_arrivals[n_arrivals:]
+        return pending_arrivals[:n_arrivals]
+
+    def _is_stopped(self, parent: "Entity", timestamp: int) -> bool:
+        return not 0 < self._get_mean_inter_arrival_time(parent, timestamp) < np.inf
+
+    def _is_parked(self, parent: "Entity") -> bool:
+        """Whether the process has stopped and emitted every arrival drawn before it did."""
+        return self.get_next_arrival(parent) == np.inf
+
+    def _rate_can_change(self) -> bool:
+        return any(isinstance(value, ParameterBuilder) for value in self._get_rate_parameters())
+
+    def _can_restart(self, parent: "Entity", timestamp: int) -> bool:
+        return self._is_parked(parent) and self._rate_can_change() and not self._is_stopped(parent, timestamp)
+
+    def get_next_emission_time(self, parent: "Entity", timestamp: int) -> float:
+        next_arrival = self.get_next_arrival(parent)
+        if next_arrival is None:
+            return timestamp
+
+        # A stopped process whose rate can change is due in every step, so that it can check the rate again
+        if next_arrival == np.inf and self._rate_can_change():
+            return timestamp
+
+        return next_arrival
+
+    def get_next_arrival(self, parent: "Entity") -> Optional[float]:
+        """The time of the next arrival that has been drawn but not yet emitted, or None if the process hasn't started."""
+        state = self._get_state(parent)
+        if "pending_arrivals" not in state:
+            return None
+
+        return float(state["pending_arrivals"][0])
@@ -1,6 +1,8 @@
 
-from pydantic import BaseModel, Field
-from typing import ClassVar, Dict, List, Optional, Tuple, TYPE_CHECKING
+import math
+import numpy as np
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import ClassVar, Dict, List, Optional, Sequence, Tuple, TYPE_CHECKING
 from uuid import uuid4
 
 from dgpinata.event import Event
@@ -13,18 +15,156 @@ if TYPE_CHECKING:
 class Entity(Recordable):
     """Entities can have state and emit events."""
 
+    # The entity's random stream is read by every emission, so it lives in a plain slot rather than a private attribute,
+    # which pydantic looks up much more slowly. It holds None until the stream is first used.
+    __slots__ = ("_generator",)
+
     simulation: "Simulation" = Field(..., title="The simulation that this entity belongs to")
     column_block_list = Recordable.column_block_list + [
-        "simulation"
+        "simulation",
+        "emitters",
     ]
     emitters: Dict[str, "Emitter"] = {}
     default_values: ClassVar[Optional[List[Dict]]] = None
+    replicated: ClassVar[bool] = False # In sharded simulations, keep a read-only copy of these entities in every shard
+
+    _seed_index: Optional[int] = PrivateAttr(default=None) # Which of the simulation's seeds this entity's stream uses
+    _emitter_states: Dict[str, Dict] = PrivateAttr(default_factory=dict)
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        object.__setattr__(self, "_generator", None)
+
+    @classmethod
+    def construct_many(
+        cls,
+        simulation: "Simulation",
+        columns: Dict[str, Sequence],
+        n: int,
+        emitters: Optional[Dict[str, "Emitter"]] = None,
+    ) -> List["Entity"]:
+        """Build n entities from one sequence of values per field, without validating each entity separately.
+
+        Each column is validated once, as a whole, and missing fields are filled in from their defaults. Every entity
+        shares `emitters` (by default, a fresh copy of the class's emitters) by reference, since emitters keep their
+        per-entity state on the entity, unless `columns` has an "emitters" column, which gives each entity its own.
+        Types with custom validators are still validated one entity at a time.
+        """
+        if emitters is None:
+            emitters = cls.model_fields["emitters"].get_default(call_default_factory=True)
+
+        if cls.has_custom_validators():
+            names = list(columns.keys())
+            rows = [dict(zip(names, values)) for values in zip(*columns.values())] if columns else [{} for _ in range(n)]
+            return [cls(**{"simulation": simulation, "emitters": emitters, **row}) for row in rows]
+
+        entity_emitters = cls.validate_column("emitters", columns["emitters"]) if "emitters" in columns else None
+
+        field_names = [field_name for field_name in cls.model_fields if field_name not in ("simulation", "emitters")]
+        field_values = [
+            cls.validate_column(field_name, columns[field_name]) if field_name in columns
+            else cls.get_default_column(field_name, n)
+            for field_name in field_names
+        ]
+        rows = zip(*field_values) if field_values else [()] * n
+
+        # This is model_construct, minus the work of filling in defaults, which are already in the rows
+        names = ["simulation", "emitters"] + field_names
+        shared_values = (simulation, emitters)
+        has_model_post_init = cls._has_model_post_init()
+        private_defaults = {}
+        private_factories = []
+        for name, private_attribute in cls.__private_attributes__.items():
+            if private_attribute.default_factory is not None:
+                private_factories.append((name, private_attribute.default_factory))
+            else:
+                private_defaults[name] = private_attribute.default
+
+        entities = []
+        for i, values in enumerate(rows):
+            entity = cls.__new__(cls)
+            object.__setattr__(entity, "__dict__", dict(zip(names, shared_values + values)))
+            if entity_emitters is not None:
+                entity.__dict__["emitters"] = entity_emitters[i]
+            object.__setattr__(entity, "__pydantic_fields_set__", set(names))
+            object.__setattr__(entity, "__pydantic_extra__", None)
+            object.__setattr__(entity, "_generator", None)
+
+            if has_model_post_init:
+                entity.model_post_init(None)
+            else:
+                private = private_defaults.copy()
+                for name, default_factory in private_factories:
+                    private[name] = default_factory()
+                object.__setattr__(entity, "__pydantic_private__", private)
+
+            entities.append(entity)
+
+        return entities
+
+    @classmethod
+    def _has_model_post_init(cls) -> bool:
+        """Whether a subclass defines its own model_post_init, as opposed to the one pydantic generates."""
+        return any(
+            getattr(klass.__dict__.get("model_post_init"), "__module__", "pydantic").split(".")[0] != "pydantic"
+            for klass in cls.__mro__
+        )
 
     @property
     def sim(self):
         """Alias for self.simulation"""
         return self.simulation
 
+    @property
+    def rng(self) -> np.random.Generator:
+        """This entity's random stream. The simulation gives each entity its own child of the simulation's seed.
+
+        The stream is created on first use, so entities that never draw anything don't pay for one.
+        """
+        rng = self._generator
+        if rng is None:
+            seed_index = self.__pydantic_private__["_seed_index"]
+            seed_sequence = None if seed_index is None else self.simulation.get_seed_sequence(seed_index)
+            rng = np.random.default_rng(seed_sequence)
+            self.set_rng(rng)
+        return rng
+
+    def has_rng(self) -> bool:
+        """Whether this entity's random stream has been created yet."""
+        return self._generator is not None
+
+    def set_rng(self, rng: np.random.Generator):
+        """Replace this entity's random stream, e.g. with one restored from a checkpoint."""
+        object.__setattr__(self, "_generator", rng)
+
+    def __getstate__(self) -> Dict:
+        return {**super().__getstate__(), "_generator": self._generator}
+
+    def __setstate__(self, state: Dict):
+        super().__setstate__(state)
+        self.set_rng(state.get("_generator"))
+
+    def get_emitter_state(self, emitter: "Emitter") -> Dict:
+        """Return the state that an emitter keeps for this entity between steps, keyed by the emitter's name."""
+        for emitter_name, candidate in self.emitters.items():
+            if candidate is emitter:
+                return self._emitter_states.setdefault(emitter_name, {})
+
+        raise ValueError(f"{type(emitter).__name__} is not one of this {type(self).__name__}'s emitters")
+
+    def get_next_update_time(self, timestamp: int) -> float:
+        """Return the earliest time at or after `timestamp` at which updating this entity might do anything.
+
+        Entities that override `_update` are always due. Entities without emitters are never due.
+        """
+        if type(self)._update is not Entity._update:
+            return timestamp
+
+        return min(
+            (emitter.get_next_emission_time(self, timestamp) for emitter in self.emitters.values()),
+            default=math.inf,
+        )
+
     def update(
         self,
         prev_timestamp: int,
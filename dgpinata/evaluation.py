@@ -0,0 +1,22 @@
+import random
+from typing import Any, Callable
+
+import numpy as np
+
+# Names available to eval strings, in addition to `sim`, `parent` and `timestamp`
+eval_globals = {
+    "random": random,
+    "np": np,
+}
+
+def compile_eval_str(eval_str: str) -> Callable[[Any, Any, Any], Any]:
+    """Compile an eval string into a function of (sim, parent, timestamp).
+
+    The string is parsed and compiled exactly once, so evaluating it for every event is just a function call.
+    """
+    code = compile(
+        f"lambda sim, parent, timestamp: (\n{eval_str}\n)",
+        f"<eval_str: {eval_str}>",
+        "eval",
+    )
+    return eval(code, dict(eval_globals))
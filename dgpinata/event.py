@@ -1,6 +1,65 @@
+from collections import namedtuple
+from typing import ClassVar, Dict, List, Optional, Type
+
 from dgpinata.emittable import Recordable
 
+class CompactRecord:
+    """Mixin for the slotted record classes generated for Event types with `compact_records = True`.
+
+    Records are named tuples of an event's column values, so they cost about as much memory as a plain tuple. They
+    support attribute access like the Event they stand for, and enough of Recordable's API to be written out.
+    """
+
+    __slots__ = ()
+
+    record_type: ClassVar[Type[Recordable]]
+    table_name: ClassVar[str]
+
+    @classmethod
+    def get_column_names(cls) -> List[str]:
+        return cls.record_type.get_column_names()
+
+    @classmethod
+    def get_create_table_sql(cls) -> str:
+        return cls.record_type.get_create_table_sql()
+
+    @classmethod
+    def get_parameterized_insert_sql(cls) -> str:
+        return cls.record_type.get_parameterized_insert_sql()
+
+    def get_row(self) -> tuple:
+        return tuple(self)
+
+    def model_dump(self) -> Dict:
+        return self._asdict()
+
+    def to_event(self) -> Recordable:
+        """Return the full Event for this record."""
+        return self.record_type.model_construct(**self._asdict())
+
+
+def make_record_class(record_type: Type[Recordable]) -> type:
+    """Generate a slotted named tuple class with one field per column of record_type."""
+    name = f"{record_type.__name__}Record"
+    base = namedtuple(name, record_type.get_column_names())
+
+    return type(name, (base, CompactRecord), {
+        "__slots__": (),
+        "__module__": record_type.__module__,
+        # Lets records be pickled, by finding their class through the Event type's record_class
+        "__qualname__": f"{record_type.__qualname__}.record_class",
+        "record_type": record_type,
+        "table_name": record_type.table_name,
+    })
+
+
 class Event(Recordable):
     """An event that can be recorded in the simulation DB."""
 
-    pass
\ No newline at end of file
+    compact_records: ClassVar[bool] = False # Represent rows of this type as slotted tuples (record_class) instead of Events
+    record_class: ClassVar[Optional[type]] = None
+
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs):
+        super().__pydantic_init_subclass__(**kwargs)
+        cls.record_class = make_record_class(cls) if cls.compact_records else None
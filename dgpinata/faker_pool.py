@@ -0,0 +1,145 @@
+import queue
+import threading
+from typing import Any, List, Optional
+
+import numpy as np
+from faker import Faker
+
+class FakerPool:
+    """Values from one Faker provider (e.g. "first_name"), generated in blocks ahead of time.
+
+    If reuse is True, a single block of pool_size values is generated up front and values are drawn from it with
+    replacement, so each value costs a vectorized draw instead of a Faker call. If reuse is False, every value is used
+    once, and the pool is refilled a block at a time; with background=True, the next blocks are generated in a
+    background thread while the simulation runs. `close` stops the thread, keeping the blocks it already generated; it
+    starts again the next time the pool needs a block.
+
+    Faker is seeded from `seed`, so the values are reproducible. Pools can be pickled (e.g. in a checkpoint), except
+    while a background thread is running.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        seed: int,
+        locale: Optional[str] = None,
+        pool_size: int = 10000,
+        reuse: bool = True,
+        background: bool = False,
+    ):
+        self._faker = Faker(locale)
+        self._faker.seed_instance(seed)
+        self._generate_value = getattr(self._faker, provider)
+
+        self.provider = provider
+        self.locale = locale
+        self.pool_size = pool_size
+        self.reuse = reuse
+        self.background = background and not reuse
+
+        self._values: List[Any] = []
+        self._position = 0
+        self._blocks: Optional[queue.Queue] = None
+        self._stopping: Optional[threading.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self._generated_blocks: List[List[Any]] = []   # Generated in the background before it was stopped, not yet used
+
+        if reuse:
+            self._values = np.array(self._generate_block(), dtype=object)
+
+        elif self.background:
+            self._start()
+
+    def __getstate__(self):
+        if self._thread is not None:
+            raise TypeError("FakerPools can't be pickled while their background thread is running; close them first")
+
+        state = {
+            key: value
+            for key, value in self.__dict__.items()
+            if key not in ("_faker", "_generate_value", "_blocks", "_stopping", "_thread")
+        }
+        state["faker_random_state"] = self._faker.random.getstate()
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        faker_random_state = state.pop("faker_random_state")
+        self.__dict__.update(state)
+        self._blocks = None
+        self._stopping = None
+        self._thread = None
+
+        # Seeding gives the instance its own random, instead of the one shared by all unseeded Fakers
+        self._faker = Faker(self.locale)
+        self._faker.seed_instance(0)
+        self._faker.random.setstate(faker_random_state)
+        self._generate_value = getattr(self._faker, self.provider)
+
+    def _generate_block(self) -> List[Any]:
+        return [self._generate_value() for _ in range(self.pool_size)]
+
+    def _start(self):
+        self._blocks = queue.Queue(maxsize=2)
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._fill_blocks, args=(self._blocks, self._stopping), daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop the background thread, if it's running, and wait for it to exit."""
+        if self._thread is None:
+            return
+
+        self._stopping.set()
+        self._thread.join()
+
+        # Blocks still in the queue were generated before any the thread kept when it stopped
+        queued_blocks = []
+        while not self._blocks.empty():
+            queued_blocks.append(self._blocks.get())
+        self._generated_blocks = queued_blocks + self._generated_blocks
+
+        self._blocks = None
+        self._stopping = None
+        self._thread = None
+
+    def _fill_blocks(self, blocks: queue.Queue, stopping: threading.Event):
+        while not stopping.is_set():
+            block = self._generate_block()
+            while True:
+                try:
+                    blocks.put(block, timeout=0.1)
+                    break
+                except queue.Full:
+                    if stopping.is_set():
+                        self._generated_blocks.append(block)
+                        return
+
+    def _next_block(self) -> List[Any]:
+        if self._generated_blocks:
+            return self._generated_blocks.pop(0)
+
+        if self._blocks is None and self.background:
+            self._start()
+
+        if self._blocks is not None:
+            return self._blocks.get()
+
+        return self._generate_block()
+
+    def take(self, rng: np.random.Generator, n: int) -> List[Any]:
+        """Return n values."""
+        if self.reuse:
+            return self._values[rng.integers(0, len(self._values), size=n)].tolist()
+
+        values = []
+        while len(values) < n:
+            if self._position >= len(self._values):
+                self._values = self._next_block()
+                self._position = 0
+
+            stop = min(self._position + n - len(values), len(self._values))
+            values.extend(self._values[self._position:stop])
+            self._position = stop
+
+        return values
@@ -0,0 +1,122 @@
+from collections import defaultdict
+from time import perf_counter
+from typing import Dict, List, Optional
+
+from dgpinata.entity import Entity
+from dgpinata.message import AddEvents, Message
+
+# The phases that a simulation's time is split into, in the order they happen
+phases = ["emit", "update", "build_parameters", "instantiate", "store", "export"]
+
+class InstrumentationHook:
+    """Receives measurements as they are made, e.g. to feed a metrics exporter. Override any of the methods."""
+
+    def on_phase(self, phase: str, seconds: float):
+        pass
+
+    def on_emit(self, entity_type_name: str, emitter_name: str, event_count: int, seconds: float):
+        pass
+
+    def on_step(self, timestamp: int, seconds: float):
+        pass
+
+
+class Instrumentation:
+    """Opt-in timers and counters for a simulation: pass one as `Simulation(..., instrumentation=Instrumentation())`.
+
+    Time is split into phases: emit (emitters choosing timestamps), update (custom `_update` methods),
+    build_parameters (evaluating parameter builders), instantiate (building entities and single events), store
+    (appending to event stores) and export (writing to sinks). Emitters and entity types also get counts of the events
+    they produce and the time spent in them. Measurements accumulate across runs until `reset`.
+
+    When workers are used, entities are updated in other processes, so emitter and entity type counters aren't kept.
+    """
+
+    def __init__(self, hooks: Optional[List[InstrumentationHook]] = None):
+        self.hooks: List[InstrumentationHook] = hooks or []
+        self.reset()
+
+    def reset(self):
+        self.phase_seconds: Dict[str, float] = defaultdict(float)
+        self.emitter_events: Dict[str, int] = defaultdict(int)
+        self.emitter_seconds: Dict[str, float] = defaultdict(float)
+        self.entity_type_updates: Dict[str, int] = defaultdict(int)
+        self.entity_type_events: Dict[str, int] = defaultdict(int)
+        self.entity_type_seconds: Dict[str, float] = defaultdict(float)
+        self.step_count = 0
+        self.step_seconds = 0.0
+
+    def add_phase_time(self, phase: str, seconds: float):
+        self.phase_seconds[phase] += seconds
+        for hook in self.hooks:
+            hook.on_phase(phase, seconds)
+
+    def add_step_time(self, timestamp: int, seconds: float):
+        self.step_count += 1
+        self.step_seconds += seconds
+        for hook in self.hooks:
+            hook.on_step(timestamp, seconds)
+
+    def update_entity(self, entity: Entity, prev_timestamp: int, timestamp: int) -> List[Message]:
+        """Update an entity, like Entity.update, while timing each of its emitters and its `_update`."""
+        entity_type_name = type(entity).__name__
+        start = perf_counter()
+
+        # Entities that replace update entirely can only be timed as a whole
+        if type(entity).update is not Entity.update:
+            actions = entity.update(prev_timestamp=prev_timestamp, timestamp=timestamp)
+            self.add_phase_time("update", perf_counter() - start)
+
+        else:
+            actions = []
+            for emitter_name, emitter in entity.emitters.items():
+                emitter_start = perf_counter()
+                emitted_actions = emitter.emit(parent=entity, prev_timestamp=prev_timestamp, timestamp=timestamp)
+                seconds = perf_counter() - emitter_start
+
+                event_count = count_events(emitted_actions)
+                key = f"{entity_type_name}.{emitter_name}"
+                self.emitter_events[key] += event_count
+                self.emitter_seconds[key] += seconds
+                self.add_phase_time("emit", seconds)
+                for hook in self.hooks:
+                    hook.on_emit(entity_type_name, emitter_name, event_count, seconds)
+
+                actions.extend(emitted_actions)
+
+            update_start = perf_counter()
+            actions.extend(entity._update(prev_timestamp=prev_timestamp, timestamp=timestamp))
+            self.add_phase_time("update", perf_counter() - update_start)
+
+        self.entity_type_updates[entity_type_name] += 1
+        self.entity_type_events[entity_type_name] += count_events(actions)
+        self.entity_type_seconds[entity_type_name] += perf_counter() - start
+        return actions
+
+    @property
+    def summary(self) -> str:
+        summary_str = "=== Phases ===\n"
+        for phase in phases:
+            summary_str += f"  {phase}: {self.phase_seconds[phase]:.3f}s\n"
+        summary_str += f"  total: {self.step_seconds:.3f}s over {self.step_count} steps\n"
+
+        summary_str += "\n=== Emitters ===\n"
+        for key, event_count in self.emitter_events.items():
+            summary_str += f"  {key}: {event_count} events, {self.emitter_seconds[key]:.3f}s\n"
+
+        summary_str += "\n=== Entity types ===\n"
+        for entity_type_name, update_count in self.entity_type_updates.items():
+            summary_str += (
+                f"  {entity_type_name}: {update_count} updates, {self.entity_type_events[entity_type_name]} events, "
+                f"{self.entity_type_seconds[entity_type_name]:.3f}s\n"
+            )
+
+        return summary_str
+
+    def __str__(self):
+        return self.summary
+
+
+def count_events(actions: List[Message]) -> int:
+    """Count the events and entities that a list of actions will add."""
+    return sum(len(action.timestamps) if type(action) is AddEvents else 1 for action in actions)
@@ -5,15 +5,42 @@ from dgpinata.emittable import Recordable
 
 class MessageType(str, Enum):
     AddEvent = "AddEvent"
+    AddEvents = "AddEvents"
     AddEntity = "AddEntity"
     # RemoveEntity = "RemoveEntity"
     # ChangeEntityType = "ChangeEntityType"
     # SendMessage = "SendMessage"
 
+# The default values of each message type's fields, for construct_trusted
+_message_defaults: Dict[type, Dict[str, Any]] = {}
+
 class Message(Recordable):
     """Abstract base class for all Messages"""
     action_type: MessageType
 
+    @classmethod
+    def construct_trusted(cls, **values: Any) -> "Message":
+        """Build a message from values that need no validation, giving every field that has no default.
+
+        This is model_construct, minus its per-call overhead, which adds up when every emission builds a message.
+        """
+        message = cls.__new__(cls)
+        object.__setattr__(message, "__dict__", {**cls._get_defaults(), **values})
+        object.__setattr__(message, "__pydantic_fields_set__", set(values))
+        object.__setattr__(message, "__pydantic_extra__", None)
+        object.__setattr__(message, "__pydantic_private__", None)
+        return message
+
+    @classmethod
+    def _get_defaults(cls) -> Dict[str, Any]:
+        if cls not in _message_defaults:
+            _message_defaults[cls] = {
+                field_name: field.default
+                for field_name, field in cls.model_fields.items()
+                if not field.is_required()
+            }
+        return _message_defaults[cls]
+
 class AddEvent(Message):
     action_type: MessageType = MessageType.AddEvent
     
@@ -37,6 +64,19 @@ class AddEvent(Message):
     #         timestamp=timestamp,
     #     )
 
+class AddEvents(Message):
+    """Add a batch of events of the same type, one for each timestamp.
+
+    All events in the batch share the same parent and parameter builders, so the simulation can build their parameters a column at a time.
+    """
+    action_type: MessageType = MessageType.AddEvents
+
+    event_type_name: str
+    parameter_builders: Dict[str, Any]#Union[Any, "ParameterBuilder"]]
+    parent: Any#"Entity"
+    timestamps: Any#np.ndarray of int64 timestamps
+    event_store: Any = None#"EventStore" the events are added to, when the emitter has been bound to a simulation
+
 class AddEntity(Message):
     action_type: MessageType = MessageType.AddEntity
 
@@ -44,6 +84,7 @@ class AddEntity(Message):
     parameter_builders: Dict[str, Any]#Union[Any, "ParameterBuilder"]]
     parent: Any#"Entity"
     timestamp: int
+    entity_type: Any = None#Type["Entity"] to instantiate, when the emitter has been bound to a simulation
 
 # class RemoveEntity(Message):
 #     action_type = MessageType.RemoveEntity
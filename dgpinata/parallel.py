@@ -0,0 +1,279 @@
+import gc
+import heapq
+import math
+import multiprocessing
+import random
+import traceback
+from typing import Any, Dict, Iterator, List, Tuple
+
+from dgpinata.checkpoint import build_entities, get_entity_state, set_entity_state
+from dgpinata.emitters.base import ParameterBuilder
+from dgpinata.entity import Entity
+from dgpinata.message import Message, MessageType
+
+# The most consecutive entities of a type that each worker takes in turn
+max_block_size = 1024
+
+class WorkerPool:
+    """Forked worker processes that update a simulation's entities, kept for as long as the pool is open.
+
+    Each worker owns a fixed partition of the entities, for the lifetime of the pool: positions in each type's list are
+    dealt out to the workers in blocks of up to max_block_size, so a worker's entities are mostly contiguous in memory,
+    and only its own pages of the forked simulation get copied. Smaller simulations are split evenly. Workers keep their entities' state between steps, so each step only
+    sends them the entities added since the last one, and only sends back what those entities emitted, with its
+    parameters already built. The results are applied here in the same order that a serial update would have applied
+    them, and entities created during a step are updated here, at the point a serial step would reach them.
+
+    Every entity draws from its own random stream, and eval strings that use the module-level random get a stream
+    seeded for each entity and step, so the output doesn't depend on the number of workers. The state of the workers'
+    entities is only copied back by `sync`, and when the pool is closed. While the pool is open, changes made to
+    entities outside the workers aren't seen by them, and changes a worker makes to any other shared state are lost.
+    """
+
+    def __init__(self, sim: "Simulation", workers: int):
+        if "fork" not in multiprocessing.get_all_start_methods():
+            raise ValueError("Parallel stepping requires the 'fork' multiprocessing start method.")
+
+        self.sim = sim
+        self.workers = workers
+        self.updated_type_names = [
+            entity_type.__name__ for entity_type in sim.entity_types if sim._updates_entity_type(entity_type)
+        ]
+        # How many entities of each type the workers hold
+        self.synced_counts = {
+            entity_type_name: len(sim.entities[entity_type_name]) for entity_type_name in self.updated_type_names
+        }
+        largest_count = max(self.synced_counts.values(), default=0)
+        block_size = min(max(math.ceil(largest_count / workers), 1), max_block_size)
+
+        context = multiprocessing.get_context("fork")
+        self._connections = []
+        self._processes = []
+        # Frozen objects are left alone by the workers' garbage collection, which would otherwise write to, and so copy,
+        # every page of the simulation they inherit
+        gc.freeze()
+        try:
+            for worker_index in range(workers):
+                connection, worker_connection = context.Pipe()
+                # Forked processes inherit the simulation as it is now, so it isn't pickled
+                process = context.Process(target=_run_worker, args=(sim, worker_index, workers, block_size, worker_connection), daemon=True)
+                process.start()
+                worker_connection.close()
+                self._connections.append(connection)
+                self._processes.append(process)
+        finally:
+            gc.unfreeze()
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+    def step(self):
+        """Update all of the simulation's entities for its current step."""
+        sim = self.sim
+        additions = {}
+        for entity_type_name, synced_count in self.synced_counts.items():
+            entities = sim.entities[entity_type_name]
+            if len(entities) > synced_count:
+                additions[entity_type_name] = [get_entity_state(entity) for entity in entities[synced_count:]]
+                self.synced_counts[entity_type_name] = len(entities)
+
+        results = self._request(("step", sim.prev_timestamp, sim.timestamp, additions))
+
+        # Apply the results type by type, like a serial step: the existing entities of a type, in order of position,
+        # then the ones added to it so far in this step, which a serial loop over the type's growing list would reach
+        existing_counts = dict(self.synced_counts)
+        random_users = {}
+        for entity_type_name in self.updated_type_names:
+            for _, output in heapq.merge(*[outputs[entity_type_name] for outputs in results], key=lambda item: item[0]):
+                _apply_output(sim, output)
+
+            entities = sim.entities[entity_type_name]
+            index = existing_counts[entity_type_name]
+            while index < len(entities):
+                _seed_module_random(sim, entities[index], random_users)
+                sim._update_entity(entities[index])
+                index += 1
+
+    def sync(self):
+        """Copy the state of the workers' entities back into the simulation."""
+        for entity_states in self._request(("sync",)):
+            for (entity_type_name, index), entity_state in entity_states:
+                set_entity_state(self.sim.entities[entity_type_name][index], entity_state)
+
+    def close(self):
+        """Copy the state of the workers' entities back into the simulation, then stop the workers."""
+        try:
+            self.sync()
+            for connection in self._connections:
+                connection.send(("close",))
+        finally:
+            self.terminate()
+
+    def terminate(self):
+        """Stop the workers, discarding their state."""
+        for connection in self._connections:
+            connection.close()
+        for process in self._processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+        self._connections = []
+        self._processes = []
+
+    def _request(self, request: Tuple) -> List[Any]:
+        for connection in self._connections:
+            connection.send(request)
+
+        replies = [connection.recv() for connection in self._connections]
+        for kind, value in replies:
+            if kind == "error":
+                raise RuntimeError(f"A parallel worker failed:\n{value}")
+
+        return [value for _, value in replies]
+
+
+def _run_worker(sim: "Simulation", worker_index: int, workers: int, block_size: int, connection):
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            return
+
+        if request[0] == "close":
+            return
+
+        try:
+            if request[0] == "step":
+                _, sim.prev_timestamp, sim.timestamp, additions = request
+                _add_entities(sim, additions)
+                reply = _update_owned_entities(sim, worker_index, workers, block_size)
+            else:
+                reply = [
+                    ((entity_type.__name__, index), get_entity_state(sim.entities[entity_type.__name__][index]))
+                    for entity_type in sim.entity_types
+                    if sim._updates_entity_type(entity_type)
+                    for index in _get_owned_positions(len(sim.entities[entity_type.__name__]), worker_index, workers, block_size)
+                ]
+            connection.send(("ok", reply))
+
+        except Exception:
+            connection.send(("error", traceback.format_exc()))
+
+def _get_owned_positions(count: int, worker_index: int, workers: int, block_size: int) -> Iterator[int]:
+    """The positions in a list of count entities that a worker owns, in order."""
+    for block_start in range(worker_index * block_size, count, workers * block_size):
+        yield from range(block_start, min(block_start + block_size, count))
+
+def _add_entities(sim: "Simulation", additions: Dict[str, List[Tuple]]):
+    """Add entities created in the main process, keeping each type's list in the same order as there."""
+    for entity_type_name, entity_states in additions.items():
+        entity_type = sim.entity_type_lookup[entity_type_name]
+        entities = build_entities(sim, entity_type, entity_states)
+        sim.entities[entity_type_name].extend(entities)
+        for index in sim._attribute_indexes.get(entity_type_name, {}).values():
+            for entity in entities:
+                index.append(entity)
+
+def _update_owned_entities(
+    sim: "Simulation",
+    worker_index: int,
+    workers: int,
+    block_size: int,
+) -> Dict[str, List[Tuple[int, Any]]]:
+    outputs = {}
+    random_users = {}
+    for entity_type in sim.entity_types:
+        if not sim._updates_entity_type(entity_type):
+            continue
+
+        entities = sim.entities[entity_type.__name__]
+        type_outputs = outputs[entity_type.__name__] = []
+        for index in _get_owned_positions(len(entities), worker_index, workers, block_size):
+            entity = entities[index]
+            _seed_module_random(sim, entity, random_users)
+            actions = entity.update(
+                prev_timestamp=sim.prev_timestamp,
+                timestamp=sim.timestamp,
+            )
+            type_outputs.extend((index, _build_output(sim, action)) for action in actions)
+
+    return outputs
+
+def _seed_module_random(sim: "Simulation", entity: Entity, random_users: Dict[Tuple[type, int], bool]):
+    """Give eval strings that use the module-level random a stream of their own for this entity and step.
+
+    Seeding costs about as much as a small update, so it's skipped for entities that can't use it. random_users caches
+    which (entity type, emitters) pairs can, for as long as the emitters are alive.
+    """
+    if sim.rand_seed is None:
+        return
+
+    key = (type(entity), id(entity.emitters))
+    if key not in random_users:
+        random_users[key] = _may_use_module_random(entity)
+    if not random_users[key]:
+        return
+
+    random.seed(f"{sim.rand_seed}:{sim.shard_index}:{sim.timestamp}:{entity._seed_index}")
+
+def _may_use_module_random(entity: Entity) -> bool:
+    """Whether updating an entity might draw from the module-level random: its type overrides _update, or one of its
+    emitters' eval strings names random."""
+    if type(entity)._update is not Entity._update:
+        return True
+
+    for emitter in entity.emitters.values():
+        parameter_builders = list(emitter.parameter_builders.values()) + [
+            value for value in emitter.__dict__.values() if isinstance(value, ParameterBuilder)
+        ]
+        for parameter_builder in parameter_builders:
+            compiled = parameter_builder._compiled_eval_str
+            if compiled is not None and "random" in compiled.__code__.co_names:
+                return True
+
+    return False
+
+def _build_output(sim: "Simulation", action: Message) -> Tuple[str, str, Any, int]:
+    """Build the parameters for an action, so that only plain values need to be sent back to the main process."""
+    if action.action_type == MessageType.AddEvents:
+        columns = sim._build_parameter_columns(
+            parameter_builders=action.parameter_builders,
+            parent=action.parent,
+            timestamps=action.timestamps,
+        )
+        return ("events", action.event_type_name, columns, len(action.timestamps))
+
+    elif action.action_type == MessageType.AddEvent:
+        parameters = sim._build_parameters(
+            parameter_builders=action.parameter_builders,
+            parent=action.parent,
+            timestamp=action.timestamp,
+        )
+        return ("events", action.event_type_name, {name: [value] for name, value in parameters.items()}, 1)
+
+    elif action.action_type == MessageType.AddEntity:
+        parameters = sim._build_parameters(
+            parameter_builders=action.parameter_builders,
+            parent=action.parent,
+            timestamp=action.timestamp,
+        )
+        return ("entity", action.entity_type_name, parameters, 1)
+
+    raise ValueError(f"Unsupported action type in parallel mode: {action.action_type}")
+
+def _apply_output(sim: "Simulation", output: Tuple[str, str, Any, int]):
+    kind, type_name, parameters, n = output
+
+    if kind == "events":
+        sim.events[type_name].extend_columns(parameters, n)
+
+    elif kind == "entity":
+        sim.spawn_entities(type_name, 1, {name: [value] for name, value in parameters.items()})
@@ -0,0 +1,117 @@
+import heapq
+import multiprocessing
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional
+
+from dgpinata.simulation import Simulation
+
+def run_sharded(
+    make_simulation: Callable[[int, int], Simulation],
+    shard_count: int,
+    steps: int,
+    output_dir: str,
+    filename: str = "simulation.db",
+    workers: Optional[int] = None,
+) -> str:
+    """Run a simulation split into shards, each in its own process, and merge their output into a single database.
+
+    make_simulation(shard_index, shard_count) must build the same Simulation for every shard, passing both arguments
+    through to Simulation. Entities from default_values are dealt out to the shards by position; entity types with
+    `replicated = True` (e.g. a product catalog that other entities choose from) are kept in every shard, but only
+    shard 0 updates and exports them.
+
+    Each shard is written to its own database in output_dir, then the shards are merged into output_dir/filename.
+    Returns the path of the merged database.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    shard_filenames = [
+        os.path.join(output_dir, f"shard-{shard_index:04d}.db")
+        for shard_index in range(shard_count)
+    ]
+
+    # Fork where possible, so that make_simulation can be defined in a script's __main__
+    start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(
+        max_workers=workers or shard_count,
+        mp_context=multiprocessing.get_context(start_method),
+    ) as pool:
+        futures = [
+            pool.submit(_run_shard, make_simulation, shard_index, shard_count, steps, shard_filename)
+            for shard_index, shard_filename in enumerate(shard_filenames)
+        ]
+        for future in futures:
+            future.result()
+
+    merged_filename = os.path.join(output_dir, filename)
+    merge_shards(shard_filenames, merged_filename)
+    return merged_filename
+
+def _run_shard(
+    make_simulation: Callable[[int, int], Simulation],
+    shard_index: int,
+    shard_count: int,
+    steps: int,
+    filename: str,
+):
+    sim = make_simulation(shard_index, shard_count)
+    if sim.shard_index != shard_index or sim.shard_count != shard_count:
+        raise ValueError("make_simulation must pass shard_index and shard_count through to Simulation.")
+
+    sim.run(steps)
+    sim.export(filename, overwrite=True)
+
+def merge_shards(shard_filenames: List[str], filename: str, chunk_size: int = 10000):
+    """Merge the databases written by each shard into a single database.
+
+    Tables with a timestamp column are merged by timestamp with a k-way merge, breaking ties by shard, so the output is
+    time ordered and identical from run to run. Other tables are concatenated in shard order.
+    """
+    open(filename, "w").close()
+    output = sqlite3.connect(filename, isolation_level=None)
+    output.execute("PRAGMA journal_mode=OFF")
+    output.execute("PRAGMA synchronous=OFF")
+
+    shards = [sqlite3.connect(shard_filename) for shard_filename in shard_filenames]
+    try:
+        output.execute("BEGIN")
+
+        # Every shard has the same schema, so shard 0 describes all of them
+        tables = shards[0].execute("SELECT name, sql FROM sqlite_master WHERE type = 'table' ORDER BY rowid").fetchall()
+        for table_name, create_sql in tables:
+            output.execute(create_sql)
+
+            column_names = [row[1] for row in shards[0].execute(f"PRAGMA table_info({table_name})")]
+            insert_sql = f"INSERT INTO {table_name} ({', '.join(column_names)}) VALUES ({', '.join('?' for _ in column_names)})"
+
+            shard_rows = [_iter_table_rows(shard, table_name, chunk_size) for shard in shards]
+            if "timestamp" in column_names:
+                timestamp_position = column_names.index("timestamp")
+                rows = heapq.merge(*shard_rows, key=lambda row: row[timestamp_position])
+            else:
+                rows = (row for rows in shard_rows for row in rows)
+
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    output.executemany(insert_sql, chunk)
+                    chunk = []
+            if chunk:
+                output.executemany(insert_sql, chunk)
+
+        output.execute("COMMIT")
+
+    finally:
+        for shard in shards:
+            shard.close()
+        output.close()
+
+def _iter_table_rows(connection: sqlite3.Connection, table_name: str, chunk_size: int):
+    cursor = connection.execute(f"SELECT * FROM {table_name} ORDER BY rowid")
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield from rows
@@ -1,13 +1,26 @@
-from pydantic import BaseModel, Field
+import gc
+import heapq
+import numpy as np
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 import random
-import sqlite3
-from typing import Any, Dict, List, Optional, Type
+from time import perf_counter
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Type, Union
 
+from dgpinata.attribute_index import AttributeIndex
+from dgpinata.checkpoint import CheckpointWriter, load_simulation
 from dgpinata.entity import Entity
+from dgpinata.faker_pool import FakerPool
+from dgpinata.instrumentation import Instrumentation
 from dgpinata.event import Event
-from dgpinata.emitters.base import ParameterBuilder
-from dgpinata.message import Message, MessageType
-from dgpinata.chooser import Chooser
+from dgpinata.message import Message, AddEvent, AddEvents, AddEntity
+from dgpinata.parallel import WorkerPool
+from dgpinata.arrow import to_arrow_table
+from dgpinata.sinks import ParquetSink, Sink, SQLiteSink
+from dgpinata.dataframes import to_pandas, to_polars
+from dgpinata.store import EventStore, get_column_dtype, iter_merged_row_chunks, to_structured_array
+
+# How often a run with a checkpoint_path saves a checkpoint, in seconds, unless it's told otherwise
+default_checkpoint_seconds = 600.0
 
 class SimulationReport(BaseModel):
     simulation: "Simulation" = Field(..., title="The simulation that this report is based on")
@@ -32,7 +45,10 @@ class SimulationReport(BaseModel):
             summary_str += f"  {entity_type}: {len(entities)}\n"
         summary_str += "\n=== Events ===\n"
         for event_type, events in self.simulation.events.items():
-            summary_str += f"  {event_type}: {len(events)}\n"
+            summary_str += f"  {event_type}: {events.total_count}\n"
+
+        if self.simulation.instrumentation is not None:
+            summary_str += "\n" + self.simulation.instrumentation.summary
 
         return summary_str
 
@@ -41,89 +57,562 @@ class SimulationReport(BaseModel):
 
 
 class Simulation(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
 
     entity_types: List[Type[Entity]] = Field(..., title="List of entity types")
     event_types: List[Type[Event]] = Field(..., title="List of event types")
 
     entities: Dict[str, List[Entity]] = {}
-    events: Dict[str, List[Event]] = {}
+    events: Dict[str, EventStore] = {}
     tables: List[str] = []
 
     prev_timestamp: int = Field(0, title="Previous time in the simulation")
     timestamp: int = Field(0, title="Current time in the simulation")
     interval: int = 3600
     rand_seed: Optional[int] = None
+    workers: Optional[int] = Field(None, title="Number of worker processes used to update entities in each step")
+    shard_index: Optional[int] = Field(None, title="Index of this shard, when the simulation is split into shards")
+    shard_count: Optional[int] = Field(None, title="Number of shards the simulation is split into")
+    event_driven: bool = Field(False, title="Only update entities that have something due, instead of every entity in every step")
+    instrumentation: Optional[Instrumentation] = Field(None, title="Timers and counters for the simulation's phases, if enabled")
+
+    _seed_sequence: np.random.SeedSequence = PrivateAttr(default=None)
+    _spawned_seed_count: int = PrivateAttr(default=0)
+    _rng: np.random.Generator = PrivateAttr(default=None)
+    _schedule: Optional[List[Tuple[float, Tuple[int, int], Entity]]] = PrivateAttr(default=None)
+    _update_key: Optional[Tuple[int, int]] = PrivateAttr(default=None)  # (type position, index) being updated, if event driven
+    _type_lookups: Dict[str, Tuple[Tuple[type, ...], Dict[str, type]]] = PrivateAttr(default_factory=dict)
+    _attribute_indexes: Dict[str, Dict[Tuple[str, Optional[str], bool], AttributeIndex]] = PrivateAttr(default_factory=dict)
+    _faker_pools: Dict[Tuple, FakerPool] = PrivateAttr(default_factory=dict)
+    _shared_emitters: Dict[str, Dict] = PrivateAttr(default_factory=dict)
+    _checkpoint_writer: Optional[CheckpointWriter] = PrivateAttr(default=None)
+    _sink_offsets: Optional[Dict[str, int]] = PrivateAttr(default=None)   # Where to reopen the sink, when resumed
+    _worker_pool: Optional[WorkerPool] = PrivateAttr(default=None)    # Open for the length of a run with workers
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+        if self.event_driven and self.workers is not None and self.workers > 1:
+            raise ValueError("event_driven and workers cannot be used together.")
+
+        # Every simulation owns a tree of random streams: one for the simulation itself, and a child for each entity.
+        # Each shard gets its own tree, derived from the simulation's seed.
+        if self.shard_count is not None and self.rand_seed is not None:
+            self._seed_sequence = np.random.SeedSequence([self.rand_seed, self.shard_index])
+        else:
+            self._seed_sequence = np.random.SeedSequence(self.rand_seed)
+        self._rng = self.spawn_rng()
+
+        # The module-level random is only seeded for eval strings that use it directly
+        if self.rand_seed is not None:
+            random.seed(int(self._seed_sequence.generate_state(1)[0]))
+
+        # Initialize events first, so that entities' emitters can be bound to them
+        for event_type in self.event_types:
+            self.events[event_type.__name__] = EventStore(event_type)
+
         # Initialize entities
         for entity_type in self.entity_types:
             self.entities[entity_type.__name__] = []
 
             if hasattr(entity_type, "default_values") and entity_type.default_values is not None:
-
-                for default_values in entity_type.default_values:
-                    default_values["simulation"] = self
-                    entity = entity_type(**default_values)
-                    self.entities[entity_type.__name__].append(entity)
-            
-            else:
+                rows = [
+                    row
+                    for position, row in enumerate(entity_type.default_values)
+                    if self._owns_entity(entity_type, position)
+                ]
+                self._spawn_entities_from_rows(entity_type, rows)
+
+            elif self._owns_entity(entity_type, 0):
                 # Add a single entity
-                entity = entity_type(
-                    simulation=self
-                )
-                self.entities[entity_type.__name__].append(entity)
+                self.spawn_entities(entity_type, 1)
 
 
-        # Initialize events
-        for event_type in self.event_types:
-            self.events[event_type.__name__] = []
+    @property
+    def rng(self) -> np.random.Generator:
+        """The simulation's own random stream, for draws that don't belong to a single entity."""
+        return self._rng
+
+    def spawn_rng(self) -> np.random.Generator:
+        """Return a new, independent random stream. Streams are spawned in a deterministic order from rand_seed."""
+        return np.random.default_rng(self.get_seed_sequence(self._spawn_seed_indexes(1)[0]))
+
+    def get_seed_sequence(self, seed_index: int) -> np.random.SeedSequence:
+        """Return the seed_index-th child of the simulation's seed, as SeedSequence.spawn would have made it."""
+        # Read from pydantic's private storage directly, since this runs once for every entity's random stream
+        seed_sequence = self.__pydantic_private__["_seed_sequence"]
+        return np.random.SeedSequence(
+            seed_sequence.entropy,
+            spawn_key=seed_sequence.spawn_key + (seed_index,),
+            pool_size=seed_sequence.pool_size,
+        )
 
-        if self.rand_seed is not None:
-            random.seed(self.rand_seed)
+    def _spawn_seed_indexes(self, n: int) -> range:
+        """Reserve the next n children of the simulation's seed. They are only built when they are first used."""
+        start = self._spawned_seed_count
+        self._spawned_seed_count += n
+        return range(start, start + n)
+
+    def spawn_entities(
+        self,
+        entity_type: Union[str, Type[Entity]],
+        n: int,
+        columns: Optional[Dict[str, Sequence]] = None,
+    ) -> List[Entity]:
+        """Create and add n entities of a type, given one sequence of values per field. Returns the new entities.
+
+        This is much faster than creating entities one at a time: each column is validated once, and the entities
+        share their type's emitters within this simulation. Missing fields are filled in from their defaults.
+        """
+        if isinstance(entity_type, str):
+            entity_type = self.entity_type_lookup[entity_type]
+
+        # Garbage collection passes over a growing heap dominate building many objects at once, and none of these
+        # objects can be garbage until they're built, so collection is paused until they are
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            entities = self._construct_entities(entity_type, columns or {}, n)
+            self._add_entities(entities)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        return entities
+
+    def _spawn_entities_from_rows(self, entity_type: Type[Entity], rows: List[Dict]):
+        if not rows:
+            return
+
+        # Rows that all set the same fields can be validated as columns
+        names = list(rows[0].keys())
+        if all(row.keys() == rows[0].keys() for row in rows):
+            self.spawn_entities(entity_type, len(rows), {
+                name: [row[name] for row in rows]
+                for name in names
+            })
+        else:
+            self._add_entities([
+                self._construct_entities(entity_type, {name: [value] for name, value in row.items()}, 1)[0]
+                for row in rows
+            ])
+
+    def _construct_entities(self, entity_type: Type[Entity], columns: Dict[str, Sequence], n: int) -> List[Entity]:
+        return entity_type.construct_many(
+            simulation=self,
+            columns=columns,
+            n=n,
+            emitters=self._get_shared_emitters(entity_type),
+        )
+
+    def _get_shared_emitters(self, entity_type: Type[Entity]) -> Dict:
+        """Return this simulation's copy of an entity type's emitters, bound to the simulation. Entities share it."""
+        type_name = entity_type.__name__
+        if type_name not in self._shared_emitters:
+            emitters = entity_type.model_fields["emitters"].get_default(call_default_factory=True)
+            for emitter in emitters.values():
+                emitter.bind(self)
+            self._shared_emitters[type_name] = emitters
+
+        return self._shared_emitters[type_name]
+
+    def _add_entity(self, entity: Entity):
+        self._add_entities([entity])
+
+    def _add_entities(self, entities: List[Entity]):
+        """Add entities, which must all be of the same type."""
+        if not entities:
+            return
+
+        entity_type = type(entities[0])
+        entities_of_type = self.entities[entity_type.__name__]
+        shared_emitters = self._shared_emitters.get(entity_type.__name__)
+        indexes = list(self._attribute_indexes.get(entity_type.__name__, {}).values())
+        scheduled = self._schedule is not None and self._updates_entity_type(entity_type)
+        # Streams are created as entities are added when their emitters draw, so steps don't pay for them. Entities
+        # whose emitters never draw only get one if something else asks for it.
+        draws = shared_emitters is not None and any(emitter._uses_rng() for emitter in shared_emitters.values())
+
+        # New entities go at the end of their type's list, so a serial step still reaches them unless it has already
+        # moved past their type. Those it would reach are due straight away; the rest wait for the next step.
+        if scheduled and self._update_key is not None and self.entity_types.index(entity_type) < self._update_key[0]:
+            first_update_time = self.timestamp
+        else:
+            first_update_time = self.prev_timestamp
+
+        for entity, seed_index in zip(entities, self._spawn_seed_indexes(len(entities))):
+            entity.__pydantic_private__["_seed_index"] = seed_index
+            if draws:
+                entity.set_rng(np.random.default_rng(self.get_seed_sequence(seed_index)))
+
+            if entity.emitters is not shared_emitters:
+                for emitter in entity.emitters.values():
+                    emitter.bind(self)
+
+            entities_of_type.append(entity)
+
+            for index in indexes:
+                index.append(entity)
+
+            if scheduled:
+                self._schedule_entity(entity, len(entities_of_type) - 1, first_update_time)
+
+    def get_attribute_index(
+        self,
+        entity_type_name: str,
+        attribute: str,
+        weight_attribute: Optional[str] = None,
+        snapshot: bool = False,
+    ) -> AttributeIndex:
+        """Return an index of one attribute across all entities of a type. It is built on first use, then kept up to date."""
+        indexes = self._attribute_indexes.setdefault(entity_type_name, {})
+        key = (attribute, weight_attribute, snapshot)
+
+        if key not in indexes:
+            index = AttributeIndex(attribute, weight_attribute, snapshot)
+            for entity in self.entities[entity_type_name]:
+                index.append(entity)
+            indexes[key] = index
+
+        return indexes[key]
+
+    def get_faker_pool(
+        self,
+        provider: str,
+        locale: Optional[str] = None,
+        pool_size: int = 10000,
+        reuse: bool = True,
+        background: bool = False,
+    ) -> FakerPool:
+        """Return the pool of Faker values for a provider and settings, creating it on first use."""
+        key = (provider, locale, pool_size, reuse, background)
+
+        if key not in self._faker_pools:
+            self._faker_pools[key] = FakerPool(
+                provider=provider,
+                seed=int(self.rng.integers(2**32)),
+                locale=locale,
+                pool_size=pool_size,
+                reuse=reuse,
+                background=background,
+            )
 
-    def run(self, steps: int):
-        for i in range(steps):
-            self.prev_timestamp = self.timestamp
-            self.timestamp += self.interval
-            self._update_entities()
+        return self._faker_pools[key]
+
+    def _owns_entity(self, entity_type: Type[Entity], position: int) -> bool:
+        """Whether this shard holds the entity at `position` in its type's default_values."""
+        if self.shard_count is None or entity_type.replicated:
+            return True
+
+        return position % self.shard_count == self.shard_index
+
+    def _updates_entity_type(self, entity_type: Type[Entity]) -> bool:
+        """Whether this shard updates (and exports) entities of this type. Replicated entities are only updated by shard 0."""
+        if self.shard_count is None or not entity_type.replicated:
+            return True
+
+        return self.shard_index == 0
+
+    def run(
+        self,
+        steps: int,
+        sink: Optional[Sink] = None,
+        flush_threshold: int = 10000,
+        checkpoint_path: Optional[str] = None,
+        checkpoint_every: Optional[int] = None,
+        checkpoint_seconds: Optional[float] = None,
+    ):
+        """Run the simulation for a number of steps.
+
+        If a sink is given, events are streamed to it during the run: whenever an event type has at least
+        flush_threshold rows in memory, they are written to the sink and dropped. Remaining events and all entities
+        are written when the run finishes, and the report only keeps the counts.
+
+        If checkpoint_path is given, a checkpoint is saved there, along with the sink's offsets, after every
+        checkpoint_every steps and after any step that ends at least checkpoint_seconds after the last checkpoint, and
+        once more when the run finishes. If neither is given, checkpoints are saved about every ten minutes, since each
+        one flushes the sink and writes every entity that changed. After a crash, `Simulation.resume(checkpoint_path)`
+        followed by a run of the remaining steps with a new sink over the same output produces the same output as an
+        uninterrupted run.
+
+        Checkpoints are pickles: resuming from one can run arbitrary code, so only resume from checkpoints you wrote.
+        """
+        if checkpoint_path is not None and checkpoint_every is None and checkpoint_seconds is None:
+            checkpoint_seconds = default_checkpoint_seconds
+        last_checkpoint_time = perf_counter()
+
+        if sink is not None:
+            self._open_sink(sink)
+
+        # A run keeps one pool of workers for all its steps. They hand their entities' state back when it closes.
+        if self.workers is not None and self.workers > 1:
+            self._worker_pool = WorkerPool(self, self.workers)
+
+        try:
+            for i in range(steps):
+                self._step()
+
+                if sink is not None:
+                    start = self._start_timer()
+                    self._flush_events(sink, flush_threshold)
+                    self._stop_timer("export", start)
+
+                if checkpoint_path is not None and (
+                    (checkpoint_every is not None and (i + 1) % checkpoint_every == 0)
+                    or (checkpoint_seconds is not None and perf_counter() - last_checkpoint_time >= checkpoint_seconds)
+                    or i == steps - 1
+                ):
+                    self._save_checkpoint(checkpoint_path, sink)
+                    last_checkpoint_time = perf_counter()
+
+            self._close_worker_pool()
+
+            if sink is not None:
+                start = self._start_timer()
+                self._flush_events(sink, 0)
+                self._write_entities(sink)
+                self._stop_timer("export", start)
+
+        except BaseException:
+            if self._worker_pool is not None:
+                self._worker_pool.terminate()
+                self._worker_pool = None
+            if sink is not None:
+                sink.abort()
+            raise
+
+        finally:
+            self._close_faker_pools()
+
+        if sink is not None:
+            start = self._start_timer()
+            sink.close()
+            self._stop_timer("export", start)
 
         return self.get_report()
-    
+
+    def checkpoint(self, path: str, incremental: bool = True, sink_offsets: Optional[Dict[str, int]] = None):
+        """Save the state of the simulation to path, so that it can be continued with `Simulation.resume(path)`.
+
+        If incremental, and this simulation was last checkpointed to (or resumed from) the same path, only what changed
+        since then is appended to the file. Otherwise the file is replaced with the full state. sink_offsets are saved
+        for the next run with a sink to reopen it from.
+        """
+        if self._worker_pool is not None:
+            self._worker_pool.sync()
+
+        full = not incremental or self._checkpoint_writer is None or self._checkpoint_writer.path != path
+        if full:
+            self._checkpoint_writer = CheckpointWriter(path)
+
+        self._checkpoint_writer.write(self, sink_offsets=sink_offsets, full=full)
+
+    @classmethod
+    def resume(cls, path: str) -> "Simulation":
+        """Load a simulation from a checkpoint saved with `checkpoint`, or by a run with checkpoint_path.
+
+        path can also be a SQLite database written with save_state=True, to extend it with more steps.
+
+        Warning: checkpoints, and the state saved in SQLite exports, are pickles, and loading a pickle can run arbitrary
+        code. Only resume from files you wrote yourself, or otherwise trust.
+        """
+        return load_simulation(path)
+
+    def _close_faker_pools(self):
+        """Stop the background threads of Faker pools. They start again if a later run needs them."""
+        for faker_pool in self._faker_pools.values():
+            faker_pool.close()
+
+    def _close_worker_pool(self):
+        if self._worker_pool is not None:
+            worker_pool, self._worker_pool = self._worker_pool, None
+            worker_pool.close()
+
+    def _save_checkpoint(self, path: str, sink: Optional[Sink]):
+        sink_offsets = None
+        if sink is not None:
+            # Everything the checkpoint doesn't hold must be durable in the sink
+            self._flush_events(sink, 0)
+            sink_offsets = sink.checkpoint()
+
+        self.checkpoint(path, sink_offsets=sink_offsets)
+
+    def iter_steps(self, steps: Optional[int] = None, retain: bool = True) -> Iterator[List[Event]]:
+        """Run the simulation lazily, yielding the list of new events after each step.
+
+        Each step's events are sorted by timestamp (stably, so ties keep the order they were emitted in). The next step
+        is only computed when the consumer asks for it. If steps is None, the simulation runs until the consumer stops.
+        If retain is False, events are dropped from memory once they have been yielded.
+        """
+        step = 0
+        try:
+            while steps is None or step < steps:
+                starts = {event_type_name: len(events) for event_type_name, events in self.events.items()}
+                self._step()
+                yield self._get_new_events(starts)
+
+                if not retain:
+                    for events in self.events.values():
+                        events.clear()
+
+                step += 1
+
+        finally:
+            self._close_faker_pools()
+
+    def iter_events(self, steps: Optional[int] = None, retain: bool = True) -> Iterator[Event]:
+        """Run the simulation lazily, yielding new events one at a time, in timestamp order within each step."""
+        for step_events in self.iter_steps(steps=steps, retain=retain):
+            yield from step_events
+
     def get_report(self):
         return SimulationReport(simulation=self)
 
-    def export(self, filename:str, overwrite:bool=False):
-        if overwrite:
-            open(filename, "w").close()
+    def export(
+        self,
+        filename: str,
+        overwrite: bool = False,
+        chunk_size: int = 10000,
+        journal_mode: str = "OFF",
+        save_state: bool = False,
+    ):
+        """Write all entities and events to a SQLite database.
+
+        Rows are inserted with one parameterized INSERT per table, chunk_size rows per executemany call, inside a single
+        transaction. journal_mode is passed to `PRAGMA journal_mode`, e.g. "OFF" (fastest) or "WAL". With save_state,
+        the database can later be extended: see SQLiteSink.
+        """
+        self.export_to_sink(SQLiteSink(
+            filename,
+            overwrite=overwrite,
+            chunk_size=chunk_size,
+            journal_mode=journal_mode,
+            save_state=save_state,
+        ))
+
+    def export_parquet(
+        self,
+        directory: str,
+        row_group_size: int = 1_000_000,
+        compression: str = "zstd",
+        rows_per_file: Optional[int] = None,
+    ):
+        """Write all entities and events as Parquet, one dataset directory per table. Requires pyarrow.
+
+        To stream events to Parquet during a run instead, pass a ParquetSink to `run`.
+        """
+        self.export_to_sink(ParquetSink(
+            directory,
+            row_group_size=row_group_size,
+            compression=compression,
+            rows_per_file=rows_per_file,
+        ))
+
+    def to_numpy(self, type_name: str) -> Dict[str, np.ndarray]:
+        """Return the events (or entities) of a type currently held in memory, as one NumPy array per column.
+
+        Event columns are views of the event store, so nothing is copied; like EventStore.column, they are invalidated
+        by later appends. Entity columns are built from the entities' attributes.
+        """
+        if type_name in self.events:
+            return self.events[type_name].get_columns()
+
+        entity_type = self.entity_type_lookup[type_name]
+        entities = self.entities[type_name]
+        columns = {}
+        for column_name in entity_type.get_column_names():
+            values = np.empty(len(entities), dtype=get_column_dtype(entity_type, column_name))
+            values[:] = [getattr(entity, column_name) for entity in entities]
+            columns[column_name] = values
+        return columns
+
+    def to_records(self, type_name: str) -> np.ndarray:
+        """Return the events (or entities) of a type currently held in memory as a NumPy structured array."""
+        return to_structured_array(self.to_numpy(type_name))
+
+    def to_arrow(self, type_name: str) -> "pyarrow.Table":
+        """Return the events (or entities) of a type currently held in memory as an Arrow table. Requires pyarrow.
+
+        Numeric event columns share memory with the event store, so the table is only valid until the store is cleared.
+        """
+        record_type = self.events[type_name].record_type if type_name in self.events else self.entity_type_lookup[type_name]
+        return to_arrow_table(record_type, self.to_numpy(type_name))
+
+    def to_pandas(self, type_name: str) -> "pandas.DataFrame":
+        """Return the events (or entities) of a type currently held in memory as a pandas DataFrame. Requires pandas."""
+        return to_pandas(self.to_numpy(type_name))
+
+    def to_polars(self, type_name: str) -> "polars.DataFrame":
+        """Return the events (or entities) of a type currently held in memory as a polars DataFrame. Requires polars."""
+        return to_polars(self.to_numpy(type_name))
+
+    def export_to_sink(self, sink: Sink):
+        """Write all entities and the events currently held in memory to a sink."""
+        start = self._start_timer()
+        self._open_sink(sink)
+
+        try:
+            for event_types in self._get_event_type_groups():
+                self._write_event_group(sink, event_types)
+
+            self._write_entities(sink)
+
+        except BaseException:
+            sink.abort()
+            raise
+
+        sink.close()
+        self._stop_timer("export", start)
+
+    def _open_sink(self, sink: Sink):
+        """Open a sink, or reopen it where the checkpoint or export this simulation was resumed from left off."""
+        if self._sink_offsets is not None:
+            sink.reopen(self, self._sink_offsets)
+            self._sink_offsets = None
+        else:
+            sink.open(self)
+
+    def _flush_events(self, sink: Sink, flush_threshold: int):
+        for event_types in self._get_event_type_groups():
+            stores = [self.events[event_type.__name__] for event_type in event_types]
+            if sum(len(events) for events in stores) == 0:
+                continue
+            if max(len(events) for events in stores) < flush_threshold:
+                continue
 
-        sql = sqlite3.connect(filename)
+            self._write_event_group(sink, event_types)
+            for events in stores:
+                events.clear()
 
-        # Create all the tables that we'll need
+    def _get_event_type_groups(self) -> List[List[Type[Event]]]:
+        """Group event types that are written to the same table, in order of first appearance."""
+        groups: Dict[str, List[Type[Event]]] = {}
         for event_type in self.event_types:
-            sql.execute(event_type.get_create_table_sql())
-        
-        for entity_type in self.entity_types:
-            if entity_type.table_name is None:
-                continue
-            sql.execute(entity_type.get_create_table_sql())
-        
-        # Insert all the data
-        #!!! If multiple objects are written to the same table, this will sort them by type, then timestamp.
-        #!!! Instead, they should be sorted by timestamp
-        for event_type, events in self.events.items():
-            for event in events:
-                sql.execute(event.get_insert_sql())
+            groups.setdefault(event_type.table_name, []).append(event_type)
+        return list(groups.values())
+
+    def _write_event_group(self, sink: Sink, event_types: List[Type[Event]]):
+        """Write the events of types that share a table. Several types are merged by timestamp, so the table is in time order."""
+        stores = [self.events[event_type.__name__] for event_type in event_types]
+
+        if len(stores) == 1 or not all("timestamp" in events.dtypes for events in stores):
+            for event_type, events in zip(event_types, stores):
+                sink.write_columns(event_type, events.get_columns())
+            return
 
+        for event_type, rows in iter_merged_row_chunks(stores):
+            sink.write_rows(event_type, rows)
+
+    def _write_entities(self, sink: Sink):
         for entity_type in self.entity_types:
-            if entity_type.table_name is None:
+            if entity_type.table_name is None or not self._updates_entity_type(entity_type):
                 continue
 
-            for entity in self.entities[entity_type.__name__]:
-                sql.execute(entity.get_insert_sql())
+            entities = self.entities[entity_type.__name__]
+            if len(entities) == 0:
+                continue
 
-        sql.commit()
+            sink.write_rows(entity_type, [entity.get_row() for entity in entities])
 
     # Doesn't work yet.
     # def _sort_event_types(self):
@@ -142,91 +631,223 @@ class Simulation(BaseModel):
             
     #     self.event_types.sort(key=lambda a,b: check_dependency(a,b))
 
+    def _step(self):
+        step_start = self._start_timer()
+        starts = {event_type_name: len(events) for event_type_name, events in self.events.items()}
+
+        self.prev_timestamp = self.timestamp
+        self.timestamp += self.interval
+        self._update_entities()
+
+        # Keep each store in timestamp order, by sorting only the rows added during this step
+        for event_type_name, events in self.events.items():
+            events.sort_by_timestamp(start=starts[event_type_name])
+
+        if self.instrumentation is not None:
+            self.instrumentation.add_step_time(self.timestamp, perf_counter() - step_start)
+
+    def _start_timer(self) -> float:
+        return perf_counter() if self.instrumentation is not None else 0.0
+
+    def _stop_timer(self, phase: str, start: float) -> float:
+        """If instrumentation is enabled, add the time since `start` to a phase. Returns the time now, to start the next phase."""
+        if self.instrumentation is None:
+            return 0.0
+
+        now = perf_counter()
+        self.instrumentation.add_phase_time(phase, now - start)
+        return now
+
+    def _get_new_events(self, starts: Dict[str, int]) -> List[Event]:
+        """Return the events added to each store since `starts`, sorted by timestamp across all event types."""
+        stores = []
+        timestamp_arrays = []
+        for event_type_name, events in self.events.items():
+            start = starts.get(event_type_name, 0)
+            if len(events) <= start:
+                continue
+
+            stores.append((events, start))
+            if "timestamp" in events.dtypes:
+                timestamp_arrays.append(np.asarray(events.column("timestamp")[start:]))
+            else:
+                timestamp_arrays.append(np.full(len(events) - start, self.prev_timestamp))
+
+        if not stores:
+            return []
+
+        store_ids = np.concatenate([
+            np.full(len(timestamps), i) for i, timestamps in enumerate(timestamp_arrays)
+        ])
+        offsets = np.concatenate([
+            np.arange(start, start + len(timestamps)) for (_, start), timestamps in zip(stores, timestamp_arrays)
+        ])
+        order = np.argsort(np.concatenate(timestamp_arrays), kind="stable")
+
+        return [
+            stores[store_id][0][offset]
+            for store_id, offset in zip(store_ids[order].tolist(), offsets[order].tolist())
+        ]
+
     def _update_entities(self):
+        if self.event_driven:
+            self._update_due_entities()
+            return
+
+        if self.workers is not None and self.workers > 1:
+            if self._worker_pool is not None:
+                self._worker_pool.step()
+            else:
+                # Outside of run, e.g. in iter_steps, each step has a pool of its own, so entities are always up to date
+                with WorkerPool(self, self.workers) as worker_pool:
+                    worker_pool.step()
+            return
+
         for entity_type in self.entity_types:
+            if not self._updates_entity_type(entity_type):
+                continue
+
             for entity in self.entities[entity_type.__name__]:
                 self._update_entity(entity)
     
+    def _update_due_entities(self):
+        """Update only the entities that have something due before the end of this step.
+
+        Entities wait in a priority queue keyed by the next time they might emit. Due entities are updated in the same
+        order as a serial step (entity type, then position), so the output matches stepping through every entity.
+        """
+        if self._schedule is None:
+            self._schedule = []
+            for entity_type in self.entity_types:
+                if not self._updates_entity_type(entity_type):
+                    continue
+
+                for index, entity in enumerate(self.entities[entity_type.__name__]):
+                    self._schedule_entity(entity, index, entity.get_next_update_time(self.prev_timestamp))
+
+        # Due entities are taken one at a time in serial order, so entities added during the step are updated at the
+        # point a serial step would reach them
+        due = []
+        self._take_due_entities(due)
+        try:
+            while due:
+                key, _, entity = heapq.heappop(due)
+                self._update_key = key
+                self._update_entity(entity)
+                self._schedule_entity(entity, key[1], entity.get_next_update_time(self.timestamp))
+                self._take_due_entities(due)
+        finally:
+            self._update_key = None
+
+    def _take_due_entities(self, due: List[Tuple[Tuple[int, int], float, Entity]]):
+        """Move the entities due before the end of this step from the schedule to `due`, a heap keyed by serial order."""
+        while self._schedule and self._schedule[0][0] < self.timestamp:
+            next_update_time, key, entity = heapq.heappop(self._schedule)
+            heapq.heappush(due, (key, next_update_time, entity))
+
+    def _schedule_entity(self, entity: Entity, index: int, next_update_time: float):
+        type_position = self.entity_types.index(type(entity))
+        heapq.heappush(self._schedule, (next_update_time, (type_position, index), entity))
+
     def _update_entity(self, entity: Entity):
-        new_actions : List[Message] = entity.update(
-            prev_timestamp=self.prev_timestamp,
-            timestamp=self.timestamp
-        )
+        if self.instrumentation is not None:
+            new_actions = self.instrumentation.update_entity(entity, self.prev_timestamp, self.timestamp)
+        else:
+            new_actions : List[Message] = entity.update(
+                prev_timestamp=self.prev_timestamp,
+                timestamp=self.timestamp
+            )
 
         for action in new_actions:
             self._process_action(action)
 
     def _process_action(self, action: Message):
-        if action.action_type == MessageType.AddEvent:
-            new_event = self._instantiate_event(
-                event_type_name=action.event_type_name,
-                parameter_builders=action.parameter_builders,
-                parent=action.parent,
-                timestamp=action.timestamp,
-            )
-            self.events[action.event_type_name].append(new_event)
-
-        elif action.action_type == MessageType.AddEntity:
-            new_entity = self._instantiate_entity(
-                entity_type_name=action.entity_type_name,
-                parameter_builders=action.parameter_builders,
-                parent=action.parent,
-                timestamp=action.timestamp,
-            )
-            self.entities[action.entity_type_name].append(new_entity)
+        action_type = type(action)
+        if action_type is AddEvents:
+            self._add_events(action)
+        elif action_type is AddEntity:
+            self._add_entity_from_action(action)
+        elif action_type is AddEvent:
+            self._add_event(action)
+        else:
+            raise ValueError(f"Unsupported action: {action_type.__name__}")
+
+    def _add_events(self, action: AddEvents):
+        events = action.event_store
+        if events is None:
+            events = self.events[action.event_type_name]
+
+        start = self._start_timer()
+        columns = self._build_parameter_columns(
+            parameter_builders=action.parameter_builders,
+            parent=action.parent,
+            timestamps=action.timestamps,
+        )
+        start = self._stop_timer("build_parameters", start)
 
-    @property
-    def event_type_lookup(self):
-        return dict([(et.__name__, et) for et in self.event_types])
+        events.extend_columns(columns, len(action.timestamps))
+        self._stop_timer("store", start)
 
-    @property
-    def entity_type_lookup(self):
-        return dict([(et.__name__, et) for et in self.entity_types])
-    
-    def _instantiate_event(
-        self,
-        event_type_name: str,
-        parameter_builders: Dict[str, ParameterBuilder],
-        parent: Entity,
-        timestamp: int,
-    ) -> Event:
-        event_type = self.event_type_lookup[event_type_name]
+    def _add_event(self, action: AddEvent):
+        events = self.events[action.event_type_name]
 
+        start = self._start_timer()
         parameters = self._build_parameters(
-            parameter_builders=parameter_builders,
-            parent=parent,
-            timestamp=timestamp,
+            parameter_builders=action.parameter_builders,
+            parent=action.parent,
+            timestamp=action.timestamp,
         )
+        start = self._stop_timer("build_parameters", start)
 
-        # Instatiate the new event
-        new_event = event_type(
-            **parameters
-        )
+        # Compact types skip building an Event, and are validated by the store instead
+        if events.record_type.compact_records:
+            events.extend_columns({name: [value] for name, value in parameters.items()}, 1)
+            self._stop_timer("store", start)
+            return
 
-        return new_event
-    
-    def _instantiate_entity(
-        self,
-        entity_type_name: str,
-        parameter_builders: Dict[str, ParameterBuilder],
-        parent: Entity,
-        timestamp: int,
-    ) -> Event:
-        entity_type = self.entity_type_lookup[entity_type_name]
+        new_event = events.record_type(**parameters)
+        start = self._stop_timer("instantiate", start)
+
+        events.append(new_event)
+        self._stop_timer("store", start)
 
+    def _add_entity_from_action(self, action: AddEntity):
+        entity_type = action.entity_type
+        if entity_type is None:
+            entity_type = self.entity_type_lookup[action.entity_type_name]
+
+        start = self._start_timer()
         parameters = self._build_parameters(
-            parameter_builders=parameter_builders,
-            parent=parent,
-            timestamp=timestamp,
+            parameter_builders=action.parameter_builders,
+            parent=action.parent,
+            timestamp=action.timestamp,
         )
+        start = self._stop_timer("build_parameters", start)
 
-        # Instatiate the new event
-        new_event = entity_type(
-            simulation=self,
-            **parameters
-        )
+        new_entity, = self._construct_entities(entity_type, {name: [value] for name, value in parameters.items()}, 1)
+        start = self._stop_timer("instantiate", start)
+
+        self._add_entity(new_entity)
+        self._stop_timer("store", start)
+
+    @property
+    def event_type_lookup(self) -> Dict[str, Type[Event]]:
+        return self._get_type_lookup("event_types")
 
-        return new_event
+    @property
+    def entity_type_lookup(self) -> Dict[str, Type[Entity]]:
+        return self._get_type_lookup("entity_types")
+
+    def _get_type_lookup(self, field_name: str) -> Dict[str, type]:
+        """Return a name -> type dict for a list of types, rebuilt whenever the list's contents change."""
+        key = tuple(getattr(self, field_name))
+
+        cached = self._type_lookups.get(field_name)
+        if cached is None or cached[0] != key:
+            cached = (key, dict([(t.__name__, t) for t in key]))
+            self._type_lookups[field_name] = cached
+
+        return cached[1]
     
     def _build_parameters(self, parameter_builders, parent, timestamp) -> Dict:
         """Iterate over parameter_builders to build up the keyword args for an Event or Entity"""
@@ -235,36 +856,22 @@ class Simulation(BaseModel):
         sim = self
         
         for name, pb in parameter_builders.items():
-            if pb.eval_str is not None:
-                new_param = eval(pb.eval_str)
-
-            elif isinstance(pb.value, Chooser):
-                new_param = pb.value.invoke(
-                    sim=sim,
-                    parent=parent,
-                    timestamp=timestamp,
-                )
-            else:
-                new_param = pb.value
-
-            parameters[pb.name] = new_param        
+            parameters[pb.name] = pb.build(sim, parent, timestamp)
         
         return parameters
 
-    def _build_parameter(self, parameter_builder, parent, timestamp) -> Dict:
-        """Iterate over parameter_builders to build up the keyword args for an Event or Entity"""
+    def _build_parameter_columns(self, parameter_builders, parent, timestamps) -> Dict[str, List]:
+        """Iterate over parameter_builders to build up one column of keyword args per parameter, for a batch of Events"""
 
+        columns = {}
         sim = self
-        
-        if parameter_builder.eval_str is not None:
-            return eval(parameter_builder.eval_str)
-
-        elif isinstance(parameter_builder.value, Chooser):
-            return parameter_builder.value.invoke(
-                sim=sim,
-                parent=parent,
-                timestamp=timestamp,
-            )
 
-        else:
-            return parameter_builder.value
\ No newline at end of file
+        for name, pb in parameter_builders.items():
+            columns[pb.name] = pb.build_column(sim, parent, timestamps)
+
+        return columns
+
+    def _build_parameter(self, parameter_builder, parent, timestamp) -> Dict:
+        """Iterate over parameter_builders to build up the keyword args for an Event or Entity"""
+
+        return parameter_builder.build(self, parent, timestamp)
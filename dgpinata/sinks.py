@@ -0,0 +1,527 @@
+import csv
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence, Type
+
+from dgpinata.arrow import get_arrow_schema, import_pyarrow, to_arrow_table
+from dgpinata.checkpoint import clear_state_from_sqlite, save_state_to_sqlite
+from dgpinata.emittable import Recordable
+
+sqlite_journal_modes = ["OFF", "WAL", "MEMORY", "DELETE", "TRUNCATE", "PERSIST"]
+
+# Journal mode used to append to an existing database, when journal_mode is "OFF"
+sqlite_append_journal_mode = "MEMORY"
+
+class Sink:
+    """A destination for the rows produced by a simulation.
+
+    The simulation calls `open` once, then `write_columns` any number of times, then `close`. Sinks that work row by
+    row only need to implement `write_rows`.
+    """
+
+    def open(self, simulation: "Simulation"):
+        pass
+
+    def write_columns(self, record_type: Type[Recordable], columns: Dict[str, Sequence]):
+        """Write a batch of rows, given as one sequence of values per column (in get_column_names order)."""
+        column_values = [
+            values.tolist() if hasattr(values, "tolist") else list(values)
+            for values in columns.values()
+        ]
+        self.write_rows(record_type, list(zip(*column_values)))
+
+    def write_rows(self, record_type: Type[Recordable], rows: List[tuple]):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def abort(self):
+        """Called instead of `close` when the simulation fails part way through."""
+        self.close()
+
+    def checkpoint(self) -> Dict[str, int]:
+        """Make everything written so far durable, and return an offset per table to `reopen` the sink at."""
+        raise NotImplementedError(f"{type(self).__name__} doesn't support checkpoints")
+
+    def reopen(self, simulation: "Simulation", offsets: Dict[str, int]):
+        """Called instead of `open` when resuming from a checkpoint: drop anything written after the offsets
+        returned by `checkpoint`, then carry on writing after them."""
+        raise NotImplementedError(f"{type(self).__name__} doesn't support checkpoints")
+
+    @staticmethod
+    def _get_record_types(simulation: "Simulation") -> List[Type[Recordable]]:
+        """All the types that get written: every event type, plus entity types that have a table."""
+        record_types = list(simulation.event_types)
+        for entity_type in simulation.entity_types:
+            if entity_type.table_name is None:
+                continue
+            record_types.append(entity_type)
+        return record_types
+
+
+class SQLiteSink(Sink):
+    """Write rows to a SQLite database, inside a single transaction.
+
+    Rows are inserted with one parameterized INSERT per table, chunk_size rows per executemany call. journal_mode is
+    passed to `PRAGMA journal_mode`. The default, "MEMORY", lets a failed run be rolled back. "OFF" is faster, but SQLite
+    can't roll back without a journal: a failed run deletes the database if this sink created it, and checkpoints
+    aren't supported. Appending to an existing database with `reopen` uses "MEMORY" instead of "OFF". Each checkpoint
+    commits the transaction and starts a new one; use "WAL" if the database must survive a crash between checkpoints.
+
+    With save_state, the state of the simulation is saved in the database when the sink is closed. A later
+    `Simulation.resume(filename)` then continues from the end of the run, and its next run with a sink over the same
+    database appends to the event tables. Entity tables are rewritten, since they hold the entities' latest state.
+    Without save_state, any state saved by an earlier run is dropped on close, since it no longer matches the database.
+    The saved state is a pickle, so resuming from a database someone else wrote can run arbitrary code.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        overwrite: bool = False,
+        chunk_size: int = 10000,
+        journal_mode: str = "MEMORY",
+        save_state: bool = False,
+    ):
+        if journal_mode.upper() not in sqlite_journal_modes:
+            raise ValueError(f"Unsupported journal_mode: {journal_mode}")
+
+        self.filename = filename
+        self.overwrite = overwrite
+        self.chunk_size = chunk_size
+        self.journal_mode = journal_mode.upper()
+        self.save_state = save_state
+        self._simulation: Optional["Simulation"] = None
+        self._connection: Optional[sqlite3.Connection] = None
+        self._insert_sql: Dict[Type[Recordable], str] = {}
+        self._row_counts: Dict[str, int] = {}
+        self._created_file = False
+
+    def open(self, simulation: "Simulation"):
+        self._created_file = self.filename != ":memory:" and (self.overwrite or not os.path.exists(self.filename))
+        if self.overwrite:
+            open(self.filename, "w").close()
+
+        self._connect(simulation, self.journal_mode)
+
+        # Create all the tables that we'll need
+        for record_type in self._get_record_types(simulation):
+            if record_type.table_name in self._row_counts:
+                continue
+            self._connection.execute(record_type.get_create_table_sql())
+            self._row_counts[record_type.table_name] = 0
+
+    def reopen(self, simulation: "Simulation", offsets: Dict[str, int]):
+        # Rows that are already in the database must survive a failed run
+        self._created_file = False
+        journal_mode = sqlite_append_journal_mode if self.journal_mode == "OFF" else self.journal_mode
+        self._connect(simulation, journal_mode)
+
+        for table_name, row_count in offsets.items():
+            self._connection.execute(f"DELETE FROM {table_name} WHERE rowid > ?", (row_count,))
+        self._row_counts = dict(offsets)
+
+    def _connect(self, simulation: "Simulation", journal_mode: str):
+        self._simulation = simulation
+        self._connection = sqlite3.connect(self.filename, isolation_level=None)
+        self._connection.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._connection.execute("PRAGMA synchronous=OFF")
+        self._connection.execute("BEGIN")
+
+    def write_rows(self, record_type: Type[Recordable], rows: List[tuple]):
+        if record_type not in self._insert_sql:
+            self._insert_sql[record_type] = record_type.get_parameterized_insert_sql()
+
+        insert_sql = self._insert_sql[record_type]
+        for chunk_start in range(0, len(rows), self.chunk_size):
+            self._connection.executemany(insert_sql, rows[chunk_start:chunk_start + self.chunk_size])
+        self._row_counts[record_type.table_name] += len(rows)
+
+    def checkpoint(self) -> Dict[str, int]:
+        if self._connection.execute("PRAGMA journal_mode").fetchone()[0].upper() == "OFF":
+            raise ValueError('SQLiteSink checkpoints need a journal that can roll back, not journal_mode="OFF"')
+
+        self._connection.execute("COMMIT")
+        self._connection.execute("BEGIN")
+        return dict(self._row_counts)
+
+    def close(self):
+        if self._connection is None:
+            return
+
+        try:
+            if self.save_state:
+                self._save_state()
+            else:
+                clear_state_from_sqlite(self._connection)
+            self._connection.execute("COMMIT")
+        finally:
+            self._connection.close()
+            self._connection = None
+
+    def _save_state(self):
+        # A resumed run drops the entity rows written at the end of this one, then writes their new state
+        entity_table_names = {entity_type.table_name for entity_type in self._simulation.entity_types}
+        sink_offsets = {
+            table_name: 0 if table_name in entity_table_names else row_count
+            for table_name, row_count in self._row_counts.items()
+        }
+        save_state_to_sqlite(self._simulation, self._connection, sink_offsets)
+
+    def abort(self):
+        """Roll back everything written since `open`, or since the last checkpoint.
+
+        Without a journal, ROLLBACK can leave the database corrupt, so a database this sink created is deleted instead.
+        """
+        if self._connection is None:
+            return
+
+        journal_mode = self._connection.execute("PRAGMA journal_mode").fetchone()[0].upper()
+        try:
+            if self._connection.in_transaction and journal_mode != "OFF":
+                self._connection.execute("ROLLBACK")
+        finally:
+            self._connection.close()
+            self._connection = None
+
+        if journal_mode == "OFF" and self._created_file:
+            os.remove(self.filename)
+
+
+class CSVSink(Sink):
+    """Write one CSV file per table into a directory, with a header row."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._files: Dict[str, Any] = {}
+        self._writers: Dict[str, Any] = {}
+
+    def open(self, simulation: "Simulation"):
+        os.makedirs(self.directory, exist_ok=True)
+
+        for record_type in self._get_record_types(simulation):
+            if record_type.table_name in self._writers:
+                continue
+
+            f = open(self._get_filename(record_type.table_name), "w", newline="")
+            writer = csv.writer(f)
+            writer.writerow(record_type.get_column_names())
+            self._files[record_type.table_name] = f
+            self._writers[record_type.table_name] = writer
+
+    def reopen(self, simulation: "Simulation", offsets: Dict[str, int]):
+        for table_name, offset in offsets.items():
+            f = open(self._get_filename(table_name), "r+", newline="")
+            f.truncate(offset)
+            f.seek(offset)
+            self._files[table_name] = f
+            self._writers[table_name] = csv.writer(f)
+
+    def _get_filename(self, table_name: str) -> str:
+        return os.path.join(self.directory, f"{table_name}.csv")
+
+    def write_rows(self, record_type: Type[Recordable], rows: List[tuple]):
+        self._writers[record_type.table_name].writerows(rows)
+
+    def checkpoint(self) -> Dict[str, int]:
+        offsets = {}
+        for table_name, f in self._files.items():
+            f.flush()
+            os.fsync(f.fileno())
+            offsets[table_name] = f.tell()
+        return offsets
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+        self._writers = {}
+
+
+class CallbackSink(Sink):
+    """Pass each batch to a user-defined callback, as `callback(record_type, columns)`.
+
+    The callback receives its own copy of each column, so it can keep them after the simulation moves on.
+    """
+
+    def __init__(self, callback: Callable[[Type[Recordable], Dict[str, Sequence]], Any]):
+        self.callback = callback
+
+    def write_columns(self, record_type: Type[Recordable], columns: Dict[str, Sequence]):
+        self.callback(record_type, {
+            column_name: values.copy() if hasattr(values, "copy") else list(values)
+            for column_name, values in columns.items()
+        })
+
+    def write_rows(self, record_type: Type[Recordable], rows: List[tuple]):
+        column_names = record_type.get_column_names()
+        column_values = zip(*rows) if rows else [[] for _ in column_names]
+        self.callback(record_type, {
+            column_name: list(values)
+            for column_name, values in zip(column_names, column_values)
+        })
+
+    def checkpoint(self) -> Dict[str, int]:
+        return {}
+
+    def reopen(self, simulation: "Simulation", offsets: Dict[str, int]):
+        pass
+
+
+class ParquetSink(Sink):
+    """Write each table as a Parquet dataset: a directory of files, {directory}/{table_name}/part-00000.parquet, ...
+
+    Rows are buffered per table and written in row groups of row_group_size rows, compressed with `compression`. If
+    rows_per_file is given, a new file is started once a file holds that many rows. Each checkpoint also finishes the
+    current files. Requires pyarrow.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        row_group_size: int = 1_000_000,
+        compression: str = "zstd",
+        rows_per_file: Optional[int] = None,
+    ):
+        self.directory = directory
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.rows_per_file = rows_per_file
+
+        self._record_types: Dict[str, Type[Recordable]] = {}
+        self._buffers: Dict[str, List] = {}
+        self._buffered_counts: Dict[str, int] = {}
+        self._writers: Dict[str, Any] = {}
+        self._file_counts: Dict[str, int] = {}
+        self._rows_in_file: Dict[str, int] = {}
+
+    def open(self, simulation: "Simulation"):
+        self._add_tables(simulation)
+
+    def reopen(self, simulation: "Simulation", offsets: Dict[str, int]):
+        self._add_tables(simulation)
+
+        # Files started after the checkpoint are incomplete, so they are deleted and written again
+        for table_name, file_count in offsets.items():
+            table_directory = os.path.join(self.directory, table_name)
+            for filename in os.listdir(table_directory):
+                if filename.startswith("part-") and int(filename[5:10]) >= file_count:
+                    os.remove(os.path.join(table_directory, filename))
+            self._file_counts[table_name] = file_count
+
+    def _add_tables(self, simulation: "Simulation"):
+        import_pyarrow()
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Every type that shares a table is written with the schema of the first one
+        for record_type in self._get_record_types(simulation):
+            if record_type.table_name in self._record_types:
+                continue
+
+            os.makedirs(os.path.join(self.directory, record_type.table_name), exist_ok=True)
+            self._record_types[record_type.table_name] = record_type
+            self._buffers[record_type.table_name] = []
+            self._buffered_counts[record_type.table_name] = 0
+            self._file_counts[record_type.table_name] = 0
+
+    def write_columns(self, record_type: Type[Recordable], columns: Dict[str, Sequence]):
+        table_name = record_type.table_name
+
+        # Columns may be views of a store that is about to be cleared, so buffered values are copied
+        table = to_arrow_table(self._record_types[table_name], columns, copy=True)
+        self._buffers[table_name].append(table)
+        self._buffered_counts[table_name] += table.num_rows
+
+        if self._buffered_counts[table_name] >= self.row_group_size:
+            self._write_buffer(table_name, final=False)
+
+    def write_rows(self, record_type: Type[Recordable], rows: List[tuple]):
+        column_names = record_type.get_column_names()
+        column_values = zip(*rows) if rows else [[] for _ in column_names]
+        self.write_columns(record_type, {
+            column_name: list(values)
+            for column_name, values in zip(column_names, column_values)
+        })
+
+    def _write_buffer(self, table_name: str, final: bool):
+        """Write whole row groups from a table's buffer. With final, also write whatever is left over."""
+        if not self._buffers[table_name]:
+            return
+
+        table = import_pyarrow().concat_tables(self._buffers[table_name])
+        position = 0
+        while table.num_rows - position >= self.row_group_size or (final and position < table.num_rows):
+            row_group = table.slice(position, self.row_group_size)
+            self._write_row_group(table_name, row_group)
+            position += row_group.num_rows
+
+        remainder = table.slice(position)
+        self._buffers[table_name] = [remainder] if remainder.num_rows else []
+        self._buffered_counts[table_name] = remainder.num_rows
+
+    def _write_row_group(self, table_name: str, row_group: "pyarrow.Table"):
+        writer = self._writers.get(table_name)
+        if writer is not None and self.rows_per_file is not None and self._rows_in_file[table_name] >= self.rows_per_file:
+            writer.close()
+            writer = None
+
+        if writer is None:
+            writer = self._open_writer(table_name, row_group.schema)
+
+        writer.write_table(row_group, row_group_size=self.row_group_size)
+        self._rows_in_file[table_name] += row_group.num_rows
+
+    def _open_writer(self, table_name: str, schema: "pyarrow.Schema"):
+        import pyarrow.parquet as pq
+
+        filename = os.path.join(self.directory, table_name, f"part-{self._file_counts[table_name]:05d}.parquet")
+        writer = pq.ParquetWriter(filename, schema, compression=self.compression)
+        self._writers[table_name] = writer
+        self._file_counts[table_name] += 1
+        self._rows_in_file[table_name] = 0
+        return writer
+
+    def close(self):
+        for table_name, record_type in self._record_types.items():
+            self._write_buffer(table_name, final=True)
+
+            # Tables without any rows still get a file, so that readers see their schema
+            if self._file_counts[table_name] == 0:
+                self._open_writer(table_name, get_arrow_schema(record_type))
+
+        self._close_writers()
+
+    def abort(self):
+        """Close the files written so far, without writing any buffered rows."""
+        self._close_writers()
+
+    def checkpoint(self) -> Dict[str, int]:
+        for table_name in self._record_types:
+            self._write_buffer(table_name, final=True)
+        self._close_writers()
+        return dict(self._file_counts)
+
+    def _close_writers(self):
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+
+
+class ThreadedSink(Sink):
+    """Write to another sink from a background thread, so that writing overlaps with the simulation's next steps.
+
+    Every call to the wrapped sink is made from the one background thread, in order. Batches are copied and queued,
+    since they may be views of stores that are about to be cleared; once max_pending batches are queued, the
+    simulation waits for the writer to catch up. If a write fails, the error is raised from the next call to this
+    sink, which makes the run abort. `close` waits until every queued batch has been written.
+    """
+
+    def __init__(self, sink: Sink, max_pending: int = 8):
+        self.sink = sink
+        self.max_pending = max_pending
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+    def open(self, simulation: "Simulation"):
+        self._start("open", simulation)
+
+    def reopen(self, simulation: "Simulation", offsets: Dict[str, int]):
+        self._start("reopen", simulation, offsets)
+
+    def write_columns(self, record_type: Type[Recordable], columns: Dict[str, Sequence]):
+        self._put("write_columns", record_type, {
+            column_name: values.copy() if hasattr(values, "copy") else list(values)
+            for column_name, values in columns.items()
+        })
+
+    def write_rows(self, record_type: Type[Recordable], rows: List[tuple]):
+        self._put("write_rows", record_type, list(rows))
+
+    def checkpoint(self) -> Dict[str, int]:
+        return self._call("checkpoint")
+
+    def close(self):
+        """Wait for the queued batches, then close the wrapped sink. If any of them failed, abort it and raise."""
+        if self._thread is None:
+            return
+
+        try:
+            try:
+                self._call("close")
+            except BaseException:
+                if self._error is None:
+                    raise
+
+            if self._error is not None:
+                self._put("abort", wait=True, check_error=False).result()
+                raise self._error
+        finally:
+            self._stop()
+
+    def abort(self):
+        if self._thread is None:
+            return
+
+        try:
+            self._put("abort", wait=True, check_error=False).result()
+        finally:
+            self._stop()
+
+    def _start(self, method_name: str, *args):
+        self._queue = queue.Queue(maxsize=self.max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._write_queued, daemon=True)
+        self._thread.start()
+
+        try:
+            self._call(method_name, *args)
+        except BaseException:
+            self._stop()
+            raise
+
+    def _stop(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _put(self, method_name: str, *args, wait: bool = False, check_error: bool = True) -> Optional[Future]:
+        if check_error and self._error is not None:
+            raise self._error
+
+        future = Future() if wait else None
+        self._queue.put((method_name, args, future))
+        return future
+
+    def _call(self, method_name: str, *args) -> Any:
+        """Call a method of the wrapped sink once everything queued before it is written, and return its result."""
+        return self._put(method_name, *args, wait=True).result()
+
+    def _write_queued(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            method_name, args, future = item
+
+            # After a failed write, only abort is still passed on; the rest are dropped
+            if self._error is not None and method_name != "abort":
+                if future is not None:
+                    future.set_exception(self._error)
+                continue
+
+            try:
+                result = getattr(self.sink, method_name)(*args)
+            except BaseException as e:
+                if future is None:
+                    self._error = e
+                else:
+                    future.set_exception(e)
+            else:
+                if future is not None:
+                    future.set_result(result)
@@ -0,0 +1,248 @@
+import heapq
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Type
+
+import numpy as np
+from pydantic import TypeAdapter
+
+from dgpinata.emittable import Recordable, annotation_type_lookup
+
+# Maps the SQL type of a column (from annotation_type_lookup) to the dtype used to store it in memory
+sql_type_dtype_lookup = {
+    "INTEGER": np.int64,
+    "FLOAT": np.float64,
+    "TEXT": object,
+}
+
+def get_column_dtype(record_type: Type[Recordable], column_name: str):
+    """Return the NumPy dtype used to hold a column of a Recordable type in memory."""
+    annotation = record_type.model_fields[column_name].annotation
+    sql_type = annotation_type_lookup.get(annotation)
+    return sql_type_dtype_lookup.get(sql_type, object)
+
+def to_structured_array(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """Interleave one array per column into a NumPy structured array, with one record per row. This copies every value."""
+    size = len(next(iter(columns.values()))) if columns else 0
+    records = np.empty(size, dtype=[(column_name, values.dtype) for column_name, values in columns.items()])
+    for column_name, values in columns.items():
+        records[column_name] = values
+    return records
+
+class EventStore:
+    """Columnar storage for all the events of a single type.
+
+    Each column is a typed NumPy array, built from the annotations of the Recordable's fields. Appends are amortized
+    by doubling the capacity of every column when it fills up.
+
+    The store behaves like a read-only list of Events: indexing and iterating build Event objects on demand, one row at
+    a time. For Event types with `compact_records = True`, rows are built as the type's slotted record_class instead,
+    which is far cheaper. Use `column` to get a view of a whole column without building any rows.
+    """
+
+    def __init__(self, record_type: Type[Recordable], capacity: int = 1024):
+        self.record_type = record_type
+        self.column_names: List[str] = record_type.get_column_names()
+        self.dtypes: Dict[str, Any] = {
+            column_name: get_column_dtype(record_type, column_name)
+            for column_name in self.column_names
+        }
+
+        self._record_class = getattr(record_type, "record_class", None)
+
+        self._size = 0
+        self._capacity = capacity
+        self._flushed_count = 0
+        self._columns: Dict[str, np.ndarray] = {
+            column_name: np.empty(capacity, dtype=dtype)
+            for column_name, dtype in self.dtypes.items()
+        }
+
+        # Column-wise validation skips custom validators, so records that have them are validated row by row.
+        self._validate_rows = record_type.has_custom_validators()
+        self._row_adapter: Optional[TypeAdapter] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def total_count(self) -> int:
+        """The number of rows ever added to this store, including rows that have been flushed."""
+        return self._flushed_count + self._size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._get_row(i) for i in range(*index.indices(self._size))]
+
+        if index < 0:
+            index += self._size
+        if index < 0 or index >= self._size:
+            raise IndexError(f"{self.record_type.__name__} index out of range")
+
+        return self._get_row(index)
+
+    def __iter__(self) -> Iterator[Recordable]:
+        if self._record_class is not None:
+            for rows in self.iter_row_chunks(4096):
+                yield from map(self._record_class._make, rows)
+            return
+
+        for start in range(0, self._size, 4096):
+            stop = min(start + 4096, self._size)
+            for row in self.iter_dicts(start, stop):
+                yield self.record_type.model_construct(**row)
+
+    def __repr__(self):
+        return f"EventStore({self.record_type.__name__}, rows={self._size})"
+
+    def _get_row(self, index: int) -> Recordable:
+        values = [
+            column[index].item() if column.dtype != object else column[index]
+            for column in self._columns.values()
+        ]
+        if self._record_class is not None:
+            return self._record_class._make(values)
+
+        return self.record_type.model_construct(**dict(zip(self.column_names, values)))
+
+    def column(self, column_name: str) -> np.ndarray:
+        """Return a view of a single column. The view is invalidated by later appends."""
+        return self._columns[column_name][:self._size]
+
+    def get_columns(self, start: int = 0, stop: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Return views of all columns for rows [start, stop). The views are invalidated by later appends."""
+        stop = self._size if stop is None else min(stop, self._size)
+        return {
+            column_name: self._columns[column_name][start:stop]
+            for column_name in self.column_names
+        }
+
+    def clear(self):
+        """Drop all rows held in memory, keeping count of them in total_count."""
+        self._flushed_count += self._size
+        for column in self._columns.values():
+            if column.dtype == object:
+                column[:self._size] = None
+        self._size = 0
+
+    def iter_dicts(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yield rows as dicts of plain Python values."""
+        stop = self._size if stop is None else min(stop, self._size)
+        column_values = [self._columns[column_name][start:stop].tolist() for column_name in self.column_names]
+        for values in zip(*column_values):
+            yield dict(zip(self.column_names, values))
+
+    def iter_row_chunks(self, chunk_size: int = 10000, start: int = 0, stop: Optional[int] = None) -> Iterator[List[tuple]]:
+        """Yield rows as lists of tuples of plain Python values, at most chunk_size rows at a time."""
+        stop = self._size if stop is None else min(stop, self._size)
+        for chunk_start in range(start, stop, chunk_size):
+            chunk_stop = min(chunk_start + chunk_size, stop)
+            column_values = [self._columns[column_name][chunk_start:chunk_stop].tolist() for column_name in self.column_names]
+            yield list(zip(*column_values))
+
+    def sort_by_timestamp(self, start: int = 0):
+        """Stably sort rows [start, len) by their timestamp column, in place. Does nothing if there is no timestamp."""
+        if "timestamp" not in self._columns or self._size - start < 2:
+            return
+
+        timestamps = self._columns["timestamp"][start:self._size]
+        if self.dtypes["timestamp"] != object and np.all(timestamps[1:] >= timestamps[:-1]):
+            return
+
+        order = np.argsort(timestamps, kind="stable")
+        for column in self._columns.values():
+            column[start:self._size] = column[start:self._size][order]
+
+    def append(self, record: Recordable):
+        """Append a single, already-validated record."""
+        self._reserve(1)
+        for column_name, column in self._columns.items():
+            column[self._size] = getattr(record, column_name)
+        self._size += 1
+
+    def extend(self, records: Sequence[Recordable]):
+        for record in records:
+            self.append(record)
+
+    def extend_columns(self, columns: Dict[str, Sequence], n: int):
+        """Append n rows, given as one sequence of values per column.
+
+        Columns that are missing are filled in from the field defaults. Each column is validated once, as a whole.
+        """
+        if n == 0:
+            return
+
+        if self._validate_rows:
+            self.extend(self._validate_as_rows(columns, n))
+            return
+
+        validated = {}
+        for column_name in self.column_names:
+            if column_name in columns:
+                validated[column_name] = self._validate_column(column_name, columns[column_name])
+            else:
+                validated[column_name] = self.record_type.get_default_column(column_name, n)
+
+        self._reserve(n)
+        for column_name, values in validated.items():
+            self._columns[column_name][self._size:self._size + n] = values
+        self._size += n
+
+    def _validate_column(self, column_name: str, values: Sequence) -> Sequence:
+        # Arrays of the column's own dtype need no conversion, unless the field has constraints to check
+        unconstrained = not self.record_type.model_fields[column_name].metadata
+        if unconstrained and isinstance(values, np.ndarray) and values.dtype == self.dtypes[column_name]:
+            return values
+
+        return self.record_type.validate_column(column_name, values)
+
+    def _validate_as_rows(self, columns: Dict[str, Sequence], n: int) -> List[Recordable]:
+        if self._row_adapter is None:
+            self._row_adapter = TypeAdapter(List[self.record_type])
+
+        if columns:
+            names = list(columns.keys())
+            rows = [dict(zip(names, values)) for values in zip(*columns.values())]
+        else:
+            rows = [{} for _ in range(n)]
+
+        return self._row_adapter.validate_python(rows)
+
+    def _reserve(self, n: int):
+        required = self._size + n
+        if required <= self._capacity:
+            return
+
+        capacity = max(self._capacity * 2, required)
+        for column_name, column in self._columns.items():
+            new_column = np.empty(capacity, dtype=column.dtype)
+            new_column[:self._size] = column[:self._size]
+            self._columns[column_name] = new_column
+        self._capacity = capacity
+
+
+def iter_merged_row_chunks(stores: List[EventStore], chunk_size: int = 10000) -> Iterator[Tuple[Type[Recordable], List[tuple]]]:
+    """Merge the rows of several stores by timestamp, yielding (record_type, rows) chunks.
+
+    Each store must already be sorted by timestamp. The merge is a lazy heap-based k-way merge, so only about one chunk
+    per store is held in memory at a time. Consecutive rows from the same store are batched together, so each chunk has
+    a single record_type.
+    """
+    def keyed_rows(store_index: int, store: EventStore):
+        timestamp_position = store.column_names.index("timestamp")
+        for rows in store.iter_row_chunks(chunk_size):
+            for row in rows:
+                yield row[timestamp_position], store_index, row
+
+    merged = heapq.merge(*[keyed_rows(store_index, store) for store_index, store in enumerate(stores)])
+
+    current_store_index = None
+    chunk = []
+    for _, store_index, row in merged:
+        if store_index != current_store_index or len(chunk) >= chunk_size:
+            if chunk:
+                yield stores[current_store_index].record_type, chunk
+            current_store_index = store_index
+            chunk = []
+        chunk.append(row)
+
+    if chunk:
+        yield stores[current_store_index].record_type, chunk
@@ -25,7 +25,12 @@ setup(
     author_email="",
     description="",
     install_requires=read_requirements("requirements.txt"),
-    extras_require={},
+    extras_require={
+        "parquet": ["pyarrow"],
+        "pandas": ["pandas"],
+        "polars": ["polars"],
+        "benchmark": ["pytest-benchmark"],
+    },
     classifiers=[],
     entry_points={},
 )
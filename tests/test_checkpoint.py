@@ -0,0 +1,228 @@
+import sqlite3
+from typing import ClassVar, Dict, Optional
+
+import pytest
+
+import dgpinata as dgp
+from dgpinata.checkpoint import iter_frames
+from dgpinata.emitters.base import ParameterBuilder
+from dgpinata.message import AddEvent
+from dgpinata.sinks import CSVSink, SQLiteSink, ThreadedSink
+
+class Visit(dgp.Event):
+    table_name = "visit"
+
+    visitor_name: str
+    timestamp: int
+
+class Reading(dgp.Event):
+    table_name = "reading"
+
+    reading_count: int
+    timestamp: int
+
+class Visitor(dgp.Entity):
+    table_name = "visitor"
+
+    visitor_name: str = "someone"
+    emitters: Dict = {
+        "visit": dgp.PoissonEmitter.from_params(
+            event_type_name="Visit",
+            rate=2,
+            time_interval=3600,
+            visitor_name="parent.visitor_name",
+            timestamp="timestamp",
+        ),
+    }
+
+    default_values = [{"visitor_name": f"visitor-{i}"} for i in range(5)]
+
+class Door(dgp.Entity):
+    emitters: Dict = {
+        "new_visitor": dgp.PoissonEmitter.from_params(
+            entity_type_name="Visitor",
+            rate=1,
+            time_interval=3600,
+            visitor_name="'newcomer'",
+        ),
+    }
+
+class Meter(dgp.Entity):
+    reading_count: int = 0
+    fail_at: ClassVar[Optional[int]] = None  # Timestamp to crash at, to test resuming
+
+    def _update(self, prev_timestamp, timestamp):
+        if timestamp == Meter.fail_at:
+            raise RuntimeError("Crashed")
+
+        self.reading_count += 1
+        return [AddEvent(
+            event_type_name="Reading",
+            parameter_builders={
+                "reading_count": ParameterBuilder(name="reading_count", value=self.reading_count),
+                "timestamp": ParameterBuilder(name="timestamp", value=timestamp),
+            },
+            parent=self,
+            timestamp=timestamp,
+        )]
+
+def _make_simulation(event_driven=False):
+    return dgp.Simulation(
+        event_types=[Visit, Reading],
+        entity_types=[Door, Visitor, Meter],
+        rand_seed=5,
+        event_driven=event_driven,
+    )
+
+def _get_state(sim):
+    rows = {name: [event.get_row() for event in events] for name, events in sim.events.items()}
+    entities = {name: [entity.get_row() for entity in entities] for name, entities in sim.entities.items()}
+    return rows, entities
+
+@pytest.mark.parametrize("event_driven", [False, True])
+def test__resume__continues_like_an_uninterrupted_run(tmp_path, event_driven):
+    sim = _make_simulation(event_driven)
+    sim.run(steps=10)
+
+    path = str(tmp_path / "sim.ckpt")
+    first_half = _make_simulation(event_driven)
+    first_half.run(steps=4)
+    first_half.checkpoint(path)
+
+    resumed = dgp.Simulation.resume(path)
+    resumed.run(steps=6)
+
+    assert resumed.timestamp == sim.timestamp
+    assert _get_state(resumed) == _get_state(sim)
+    assert len(sim.entities["Visitor"]) > 5
+
+def test__checkpoint__appends_only_changes(tmp_path):
+    path = str(tmp_path / "sim.ckpt")
+    sim = _make_simulation()
+    sim.run(steps=2)
+    sim.checkpoint(path)
+    sim.run(steps=1)
+    sim.checkpoint(path)
+
+    full, delta = iter_frames(path)
+    assert full["full"] and not delta["full"]
+    visitor_count, visitor_records = full["entities"]["Visitor"]
+    assert len(visitor_records) == visitor_count
+
+    # Visitors only change when their random streams move, but the meter always does
+    assert set(delta["entities"]["Meter"][1]) == {0}
+    assert delta["stores"]["Reading"][0] == "append"
+    assert len(delta["stores"]["Reading"][2]["reading_count"]) == 1
+
+    resumed = dgp.Simulation.resume(path)
+    assert _get_state(resumed) == _get_state(sim)
+
+    # A partly written frame, e.g. after a crash, is ignored
+    with open(path, "ab") as f:
+        f.write(b"\x10\x00\x00\x00\x00\x00\x00\x00abc")
+    assert _get_state(dgp.Simulation.resume(path)) == _get_state(sim)
+
+def test__run__checkpoints_by_time_unless_told_otherwise(tmp_path):
+    path = str(tmp_path / "sim.ckpt")
+    _make_simulation().run(steps=10, checkpoint_path=path)
+    assert len(list(iter_frames(path))) == 1
+
+    _make_simulation().run(steps=10, checkpoint_path=path, checkpoint_every=4)
+    assert len(list(iter_frames(path))) == 3
+
+    _make_simulation().run(steps=3, checkpoint_path=path, checkpoint_seconds=0)
+    assert len(list(iter_frames(path))) == 3
+
+def _run_with_crash(make_sink, tmp_path, fail_at):
+    path = str(tmp_path / "sim.ckpt")
+    sim = _make_simulation()
+
+    Meter.fail_at = fail_at
+    try:
+        with pytest.raises(RuntimeError):
+            sim.run(steps=10, sink=make_sink(), flush_threshold=3, checkpoint_path=path, checkpoint_every=1)
+    finally:
+        Meter.fail_at = None
+
+    resumed = dgp.Simulation.resume(path)
+    resumed.run(steps=10 - resumed.timestamp // resumed.interval, sink=make_sink(), flush_threshold=3, checkpoint_path=path, checkpoint_every=1)
+
+def test__run__resumes_csv_output_after_a_crash(tmp_path):
+    _make_simulation().run(steps=10, sink=CSVSink(str(tmp_path / "expected")), flush_threshold=3)
+    _run_with_crash(lambda: CSVSink(str(tmp_path / "resumed")), tmp_path, fail_at=6 * 3600)
+
+    for table_name in ["visit", "reading", "visitor"]:
+        expected = (tmp_path / "expected" / f"{table_name}.csv").read_text()
+        assert (tmp_path / "resumed" / f"{table_name}.csv").read_text() == expected
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test__run__resumes_sqlite_output_after_a_crash(tmp_path, threaded):
+    def make_sink():
+        sink = SQLiteSink(str(tmp_path / "resumed.db"))
+        return ThreadedSink(sink) if threaded else sink
+
+    _make_simulation().run(steps=10, sink=SQLiteSink(str(tmp_path / "expected.db")), flush_threshold=3)
+    _run_with_crash(make_sink, tmp_path, fail_at=6 * 3600)
+
+    for table_name in ["visit", "reading", "visitor"]:
+        query = f"SELECT * FROM {table_name} ORDER BY rowid"
+        with sqlite3.connect(str(tmp_path / "expected.db")) as connection:
+            expected = connection.execute(query).fetchall()
+        with sqlite3.connect(str(tmp_path / "resumed.db")) as connection:
+            assert connection.execute(query).fetchall() == expected
+        assert len(expected) > 0
+
+def test__run__resumes_parquet_output_after_a_crash(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    from dgpinata.sinks import ParquetSink
+
+    _make_simulation().run(steps=10, sink=ParquetSink(str(tmp_path / "expected")), checkpoint_path=str(tmp_path / "expected.ckpt"))
+    _run_with_crash(lambda: ParquetSink(str(tmp_path / "resumed")), tmp_path, fail_at=6 * 3600)
+
+    for table_name in ["visit", "reading", "visitor"]:
+        expected = pq.read_table(str(tmp_path / "expected" / table_name))
+        resumed = pq.read_table(str(tmp_path / "resumed" / table_name))
+        assert resumed.equals(expected)
+
+def test__resume__extends_a_sqlite_export(tmp_path):
+    filename = str(tmp_path / "expected.db")
+    _make_simulation().run(steps=10, sink=SQLiteSink(filename))
+
+    # One run streamed to the database, then one in memory that is exported at the end
+    extended_filename = str(tmp_path / "extended.db")
+    _make_simulation().run(steps=4, sink=SQLiteSink(extended_filename, save_state=True))
+    resumed = dgp.Simulation.resume(extended_filename)
+    resumed.run(steps=3, sink=SQLiteSink(extended_filename, save_state=True))
+    resumed = dgp.Simulation.resume(extended_filename)
+    resumed.run(steps=3)
+    resumed.export(extended_filename)
+
+    for table_name in ["visit", "reading", "visitor"]:
+        query = f"SELECT * FROM {table_name} ORDER BY rowid"
+        with sqlite3.connect(filename) as connection:
+            expected = connection.execute(query).fetchall()
+        with sqlite3.connect(extended_filename) as connection:
+            assert connection.execute(query).fetchall() == expected
+
+    with pytest.raises(ValueError):
+        dgp.Simulation.resume(filename)
+
+def test__resume__refuses_a_sqlite_export_extended_without_its_state(tmp_path):
+    filename = str(tmp_path / "expected.db")
+    _make_simulation().run(steps=7, sink=SQLiteSink(filename))
+
+    extended_filename = str(tmp_path / "extended.db")
+    _make_simulation().run(steps=4, sink=SQLiteSink(extended_filename, save_state=True))
+    resumed = dgp.Simulation.resume(extended_filename)
+    resumed.run(steps=3, sink=SQLiteSink(extended_filename))
+
+    # The saved state predates the second run, so resuming from it would delete that run's rows
+    with pytest.raises(ValueError):
+        dgp.Simulation.resume(extended_filename)
+
+    for table_name in ["visit", "reading", "visitor"]:
+        query = f"SELECT * FROM {table_name} ORDER BY rowid"
+        with sqlite3.connect(filename) as connection:
+            expected = connection.execute(query).fetchall()
+        with sqlite3.connect(extended_filename) as connection:
+            assert connection.execute(query).fetchall() == expected
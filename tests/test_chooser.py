@@ -0,0 +1,227 @@
+import pickle
+from collections import Counter
+from typing import Dict
+
+import numpy as np
+
+import dgpinata as dgp
+from dgpinata.faker_pool import FakerPool
+
+class Product(dgp.Entity):
+    product_name: str
+    popularity: float
+
+    default_values = [
+        {"product_name": "Lemonade", "popularity": 8.0},
+        {"product_name": "Iced Tea", "popularity": 2.0},
+    ]
+
+class Sale(dgp.Event):
+    product_name: str
+    timestamp: int
+
+class Stand(dgp.Entity):
+    emitters: Dict = {
+        "new_sale": dgp.IntervalEmitter.from_params(
+            event_type_name="Sale",
+            interval=1,
+            product_name=dgp.RandomObjectAttributeChooser(
+                object_eval_str='sim.entities["Product"]',
+                attribute="product_name",
+                weight_attribute="popularity",
+            ),
+            timestamp="timestamp",
+        ),
+    }
+
+def test__random_object_attribute_chooser__uses_a_maintained_index():
+    sim = dgp.Simulation(
+        event_types=[Sale],
+        entity_types=[Product, Stand],
+        rand_seed=5,
+    )
+    sim.run(steps=1)
+
+    index = sim.get_attribute_index("Product", "product_name", "popularity")
+    assert len(index) == 2
+
+    # Products are weighted by popularity
+    counts = Counter(sim.events["Sale"].column("product_name").tolist())
+    assert 0.75 < counts["Lemonade"] / 3600 < 0.85
+
+    # New entities are added to the index as they are created
+    sim._add_entity(Product(simulation=sim, product_name="Water", popularity=10.0))
+    assert len(index) == 3
+    sim.run(steps=1)
+    assert "Water" in sim.events["Sale"].column("product_name")[3600:].tolist()
+
+def test__random_object_attribute_chooser__falls_back_to_eval():
+    sim = dgp.Simulation(
+        event_types=[],
+        entity_types=[Product],
+    )
+    lemonade = sim.entities["Product"][0]
+
+    chooser = dgp.RandomObjectAttributeChooser(
+        object_eval_str='[p for p in sim.entities["Product"] if p.popularity > 5]',
+        attribute="product_name",
+    )
+
+    assert chooser._entity_type_name is None
+    assert chooser.invoke(sim=sim, parent=lemonade, timestamp=0) == "Lemonade"
+    assert chooser.invoke_batch(sim=sim, parent=lemonade, timestamps=np.array([0, 1])) == ["Lemonade", "Lemonade"]
+
+class Drink(dgp.Entity):
+    drink_name: str
+    price: int
+    popularity: float
+
+    default_values = [
+        {"drink_name": "Cola", "price": 1, "popularity": 1.0},
+        {"drink_name": "Lemonade", "price": 1, "popularity": 0.0},
+    ]
+
+    def _update(self, prev_timestamp, timestamp):
+        # Prices rise every step, and after the first step everyone switches to lemonade
+        self.price += 1
+        if prev_timestamp > 0:
+            self.popularity = 1.0 - self.popularity
+        return []
+
+class Order(dgp.Event):
+    drink_name: str
+    price: int
+    timestamp: int
+
+def _get_order_emitters(snapshot):
+    return {
+        "new_order": dgp.IntervalEmitter.from_params(
+            event_type_name="Order",
+            interval=600,
+            drink_name=dgp.RandomObjectAttributeChooser(
+                object_eval_str='sim.entities["Drink"]',
+                attribute="drink_name",
+                weight_attribute="popularity",
+                snapshot=snapshot,
+            ),
+            price=dgp.RandomObjectAttributeChooser(
+                object_eval_str='sim.entities["Drink"]',
+                attribute="price",
+                snapshot=snapshot,
+            ),
+            timestamp="timestamp",
+        ),
+    }
+
+class Bar(dgp.Entity):
+    emitters: Dict = _get_order_emitters(snapshot=False)
+
+class SnapshotBar(dgp.Entity):
+    emitters: Dict = _get_order_emitters(snapshot=True)
+
+def _make_bar(snapshot):
+    return dgp.Simulation(
+        event_types=[Order],
+        entity_types=[Drink, SnapshotBar if snapshot else Bar],
+        rand_seed=5,
+    )
+
+def test__random_object_attribute_chooser__sees_attribute_changes():
+    sim = _make_bar(snapshot=False)
+    sim.run(steps=2)
+
+    orders = sim.events["Order"]
+    assert orders.column("drink_name").tolist() == ["Cola"] * 6 + ["Lemonade"] * 6
+    assert orders.column("price").tolist() == [2] * 6 + [3] * 6
+
+def test__random_object_attribute_chooser__sees_attribute_changes_after_resuming(tmp_path):
+    path = str(tmp_path / "bar.ckpt")
+    sim = _make_bar(snapshot=False)
+    sim.run(steps=1)
+    sim.checkpoint(path)
+
+    resumed = dgp.Simulation.resume(path)
+    resumed.run(steps=1)
+
+    orders = resumed.events["Order"]
+    assert orders.column("drink_name").tolist() == ["Cola"] * 6 + ["Lemonade"] * 6
+    assert orders.column("price").tolist() == [2] * 6 + [3] * 6
+
+def test__random_object_attribute_chooser__can_snapshot_attributes():
+    sim = _make_bar(snapshot=True)
+    sim.run(steps=2)
+
+    # Values are read when the index is built, at the first order, and never again
+    orders = sim.events["Order"]
+    assert orders.column("drink_name").tolist() == ["Cola"] * 12
+    assert orders.column("price").tolist() == [2] * 12
+
+class Customer(dgp.Entity):
+    first_name: str
+    created_at: int
+
+    default_values = []
+
+def _run_customers(**faker_kwargs):
+    class Door(dgp.Entity):
+        emitters: Dict = {
+            "new_customer": dgp.IntervalEmitter.from_params(
+                entity_type_name="Customer",
+                interval=60,
+                first_name=dgp.FakerChooser(provider="first_name", **faker_kwargs),
+                created_at="timestamp",
+            ),
+        }
+
+    sim = dgp.Simulation(
+        event_types=[],
+        entity_types=[Door, Customer],
+        rand_seed=9,
+    )
+    sim.run(steps=2)
+    return [customer.first_name for customer in sim.entities["Customer"]]
+
+def test__faker_chooser__draws_reproducibly_from_a_pool():
+    names = _run_customers(pool_size=50)
+
+    assert len(names) > 0
+    assert all(isinstance(name, str) and name for name in names)
+    assert len(set(names)) <= 50
+    assert _run_customers(pool_size=50) == names
+
+def test__faker_chooser__can_use_each_value_once():
+    names = _run_customers(pool_size=40, reuse=False, background=True)
+
+    assert len(names) > 40
+    assert _run_customers(pool_size=40, reuse=False, background=True) == names
+    assert _run_customers(pool_size=40, reuse=False) == names
+
+def test__faker_pool__stops_its_background_thread_when_closed():
+    pool = FakerPool(provider="first_name", seed=3, pool_size=20, reuse=False, background=True)
+    expected = FakerPool(provider="first_name", seed=3, pool_size=20, reuse=False).take(np.random.default_rng(), 100)
+
+    values = pool.take(np.random.default_rng(), 30)
+    thread = pool._thread
+    pool.close()
+    assert not thread.is_alive()
+    pickle.dumps(pool)
+
+    values += pool.take(np.random.default_rng(), 70)
+    assert values == expected
+    pool.close()
+
+def test__run__stops_faker_pool_threads_when_it_ends():
+    class Door(dgp.Entity):
+        emitters: Dict = {
+            "new_customer": dgp.IntervalEmitter.from_params(
+                entity_type_name="Customer",
+                interval=60,
+                first_name=dgp.FakerChooser(provider="first_name", pool_size=40, reuse=False, background=True),
+                created_at="timestamp",
+            ),
+        }
+
+    sim = dgp.Simulation(event_types=[], entity_types=[Door, Customer], rand_seed=9)
+    sim.run(steps=1)
+    assert all(pool._thread is None for pool in sim._faker_pools.values())
+    assert len(sim._faker_pools) == 1
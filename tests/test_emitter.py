@@ -1,5 +1,3 @@
-import random
-
 from dgpinata.emitters.interval import IntervalEmitter
 from dgpinata.emitters.poisson import PoissonEmitter
 from dgpinata.emitters.gamma import GammaEmitter
@@ -7,6 +5,9 @@ from dgpinata.emitters.gamma import GammaEmitter
 def _extract_event_timestamps(events):
     return [event.timestamp for event in events]
 
+def _count_emitted_events(actions):
+    return sum(len(action.timestamps) for action in actions)
+
 def test__interval_emitter__from_params():
 
     emitter = IntervalEmitter.from_params(
@@ -43,56 +44,55 @@ def test__interval_emitter__interval_ranges():
     )
 
     # If no time has elapsed, no events are emitted
-    assert len(emitter.emit(
+    assert _count_emitted_events(emitter.emit(
         parent=None,
         prev_timestamp=0,
         timestamp=0
     )) == 0
 
     # If a partial interval has elapsed, one event is emitted
-    assert len(emitter.emit(
+    assert _count_emitted_events(emitter.emit(
         parent=None,
         prev_timestamp=0,
         timestamp=30
     )) == 1
 
     # If exactly one full interval has elapsed, then exactly one event is emitted
-    assert len(emitter.emit(
+    assert _count_emitted_events(emitter.emit(
         parent=None,
         prev_timestamp=0,
         timestamp=60
     )) == 1
 
     # If more than one full interval has elapsed, then two events are emitted
-    assert len(emitter.emit(
+    assert _count_emitted_events(emitter.emit(
         parent=None,
         prev_timestamp=0,
         timestamp=61
     )) == 2
 
     # If multiple intervals have elapsed, multiple events are emitted
-    assert len(emitter.emit(
+    assert _count_emitted_events(emitter.emit(
         parent=None,
         prev_timestamp=0,
         timestamp=200
     )) == 4
 
     # If multiple intervals have elapsed, multiple events are emitted
-    assert len(emitter.emit(
+    assert _count_emitted_events(emitter.emit(
         parent=None,
         prev_timestamp=0,
         timestamp=3600
     )) == 60
 
     # Intervals are inclusive of `prev_timestamp` and exclusive of `timestamp`
-    assert len(emitter.emit(
+    assert _count_emitted_events(emitter.emit(
         parent=None,
         prev_timestamp=60,
         timestamp=120
     )) == 1
 
 def test__interval_emitter__skip_probability():
-    random.seed(1)
     
     # If `skip_probability` is 0, all events are emitted
     emitter = IntervalEmitter.from_params(
@@ -100,7 +100,7 @@ def test__interval_emitter__skip_probability():
         interval=60,
         skip_probability=0.0,
     )
-    assert len(emitter.emit(
+    assert _count_emitted_events(emitter.emit(
         parent=None,
         prev_timestamp=0,
         timestamp=3600
@@ -112,7 +112,7 @@ def test__interval_emitter__skip_probability():
         interval=60,
         skip_probability=1.0,
     )
-    assert len(emitter.emit(
+    assert _count_emitted_events(emitter.emit(
         parent=None,
         prev_timestamp=0,
         timestamp=3600
@@ -124,8 +124,103 @@ def test__interval_emitter__skip_probability():
         interval=60,
         skip_probability=0.5,
     )
-    assert len(emitter.emit(
+    emitter.seed(1)
+    assert _count_emitted_events(emitter.emit(
+        parent=None,
+        prev_timestamp=0,
+        timestamp=3600
+    )) == 34
+
+def test__interval_emitter__emits_a_single_batch():
+
+    emitter = IntervalEmitter.from_params(
+        event_type_name="SomeEvent",
+        interval=60,
+    )
+    actions = emitter.emit(
         parent=None,
         prev_timestamp=0,
         timestamp=3600
-    )) == 37
\ No newline at end of file
+    )
+
+    assert len(actions) == 1
+    assert actions[0].timestamps.tolist() == list(range(0, 3600, 60))
+
+def test__interval_emitter__offsets_and_spacing():
+
+    emitter = IntervalEmitter.from_params(
+        event_type_name="SomeEvent",
+        interval=60,
+        constant_offset=5,
+    )
+    actions = emitter.emit(parent=None, prev_timestamp=0, timestamp=300)
+    assert actions[0].timestamps.tolist() == [5, 65, 125, 185, 245]
+
+    emitter = IntervalEmitter.from_params(
+        event_type_name="SomeEvent",
+        interval=60,
+        spacing="uniform",
+        uniform_offset={"min": -10, "max": 10},
+    )
+    emitter.seed(2)
+    timestamps = emitter.emit(parent=None, prev_timestamp=0, timestamp=3600)[0].timestamps
+    assert len(timestamps) == 60
+    assert timestamps.min() >= 0
+    assert timestamps.max() <= 3599
+    assert timestamps.tolist() == sorted(timestamps.tolist())
+
+    # Events offset out of their step are emitted in the step they fall in, rather than piling up on its edges
+    emitter = IntervalEmitter.from_params(
+        event_type_name="SomeEvent",
+        interval=3600,
+        normal_offset={"mean": 0, "standard_deviation": 600},
+    )
+    emitter.seed(1)
+    step_timestamps = []
+    for step in range(1, 201):
+        actions = emitter.emit(parent=None, prev_timestamp=step * 3600, timestamp=(step + 1) * 3600)
+        step_timestamps.append(actions[0].timestamps.tolist() if actions else [])
+
+    for step, timestamps in enumerate(step_timestamps, start=1):
+        assert all(step * 3600 <= t < (step + 1) * 3600 for t in timestamps)
+        assert timestamps == sorted(timestamps)
+
+    at_step_start = sum(t % 3600 == 0 for timestamps in step_timestamps for t in timestamps)
+    assert at_step_start <= 2
+    assert abs(sum(len(timestamps) for timestamps in step_timestamps) - 200) <= 1
+
+def test__renewal_emitters__carry_arrivals_across_steps():
+
+    def emit_steps(emitter, step_boundaries):
+        emitter.seed(3)
+        timestamps = []
+        for prev_timestamp, timestamp in zip(step_boundaries[:-1], step_boundaries[1:]):
+            for action in emitter.emit(parent=None, prev_timestamp=prev_timestamp, timestamp=timestamp):
+                assert all(prev_timestamp <= t < timestamp for t in action.timestamps.tolist())
+                timestamps.extend(action.timestamps.tolist())
+        return timestamps
+
+    for emitter in [
+        PoissonEmitter.from_params(event_type_name="MyEvent", rate=2, time_interval=60),
+        GammaEmitter.from_params(event_type_name="MyEvent", shape=2, scale=15),
+    ]:
+        # The same process is generated no matter how time is split into steps
+        one_step = emit_steps(emitter, [0, 36000])
+        many_steps = emit_steps(emitter, list(range(0, 36001, 3600)))
+        assert one_step == many_steps
+
+        # Both average one event every 30 seconds
+        assert 1000 < len(one_step) < 1400
+
+def test__renewal_emitters__stop_at_a_zero_rate():
+
+    for emitter in [
+        PoissonEmitter.from_params(event_type_name="MyEvent", rate=0, time_interval=60),
+        GammaEmitter.from_params(event_type_name="MyEvent", shape=2, scale=0),
+    ]:
+        emitter.seed(3)
+        for prev_timestamp in range(0, 7200, 3600):
+            actions = emitter.emit(parent=None, prev_timestamp=prev_timestamp, timestamp=prev_timestamp + 3600)
+            assert _count_emitted_events(actions) == 0
+
+        assert emitter.get_next_emission_time(parent=None, timestamp=7200) == float("inf")
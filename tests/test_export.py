@@ -0,0 +1,288 @@
+import sqlite3
+from typing import Dict
+
+import numpy as np
+import pytest
+
+import dgpinata as dgp
+from dgpinata.sinks import CallbackSink, ParquetSink, SQLiteSink, ThreadedSink
+
+class Greeting(dgp.Event):
+    table_name = "greetings"
+    message: str
+    timestamp: int
+
+class Greeter(dgp.Entity):
+    emitters: Dict = {
+        "greet": dgp.IntervalEmitter.from_params(
+            event_type_name="Greeting",
+            interval=600,
+            message="\"it's a 'quoted' value\"",
+            timestamp="timestamp",
+        ),
+    }
+
+def test__export__writes_parameterized_rows(tmp_path):
+    filename = str(tmp_path / "export.db")
+
+    sim = dgp.Simulation(
+        event_types=[Greeting],
+        entity_types=[Greeter],
+    )
+    sim.run(steps=3)
+    sim.export(filename, chunk_size=4)
+
+    rows = sqlite3.connect(filename).execute("SELECT message, timestamp FROM greetings").fetchall()
+    assert len(rows) == 18
+    assert rows[0] == ("it's a 'quoted' value", 0)
+    assert [row[1] for row in rows] == list(range(0, 10800, 600))
+
+def test__run__streams_events_to_a_sink(tmp_path):
+    batches = []
+
+    sim = dgp.Simulation(
+        event_types=[Greeting],
+        entity_types=[Greeter],
+    )
+    report = sim.run(
+        steps=5,
+        sink=CallbackSink(lambda record_type, columns: batches.append((record_type, columns))),
+        flush_threshold=10,
+    )
+
+    # Events are flushed every other step, and whatever is left over at the end
+    assert [len(columns["timestamp"]) for _, columns in batches] == [12, 12, 6]
+    assert batches[0][1]["timestamp"].tolist() == list(range(0, 7200, 600))
+    assert len(sim.events["Greeting"]) == 0
+    assert "Greeting: 30" in report.summary
+
+def test__run__streams_events_to_sqlite(tmp_path):
+    filename = str(tmp_path / "stream.db")
+
+    sim = dgp.Simulation(
+        event_types=[Greeting],
+        entity_types=[Greeter],
+    )
+    sim.run(steps=5, sink=SQLiteSink(filename), flush_threshold=10)
+
+    count, = sqlite3.connect(filename).execute("SELECT COUNT(*) FROM greetings").fetchone()
+    assert count == 30
+
+def test__threaded_sink__writes_from_a_background_thread(tmp_path):
+    filename = str(tmp_path / "threaded.db")
+    sink = ThreadedSink(SQLiteSink(filename), max_pending=1)
+
+    sim = dgp.Simulation(
+        event_types=[Greeting],
+        entity_types=[Greeter],
+    )
+    sim.run(steps=5, sink=sink, flush_threshold=1)
+
+    timestamps = sqlite3.connect(filename).execute("SELECT timestamp FROM greetings ORDER BY rowid").fetchall()
+    assert [timestamp for timestamp, in timestamps] == list(range(0, 18000, 600))
+    assert sink._thread is None
+
+class FailingSink(CallbackSink):
+    def __init__(self):
+        super().__init__(callback=self.fail)
+        self.aborted = False
+
+    def fail(self, record_type, columns):
+        raise OSError("Disk full")
+
+    def abort(self):
+        self.aborted = True
+
+def test__threaded_sink__raises_write_errors_in_run():
+    failing_sink = FailingSink()
+    sim = dgp.Simulation(
+        event_types=[Greeting],
+        entity_types=[Greeter],
+    )
+
+    with pytest.raises(OSError, match="Disk full"):
+        sim.run(steps=5, sink=ThreadedSink(failing_sink), flush_threshold=1)
+    assert failing_sink.aborted
+
+class Fuse(dgp.Entity):
+    def _update(self, prev_timestamp, timestamp):
+        if timestamp >= 3 * 3600:
+            raise RuntimeError("Blown")
+        return []
+
+class Crowd(dgp.Entity):
+    emitters: Dict = {
+        "greet": dgp.IntervalEmitter.from_params(
+            event_type_name="Greeting",
+            interval=12,
+            message="'hi'",
+            timestamp="timestamp",
+        ),
+    }
+
+    default_values = [{} for _ in range(500)]
+
+def _fail_run(filename, **kwargs):
+    sim = dgp.Simulation(event_types=[Greeting], entity_types=[Crowd, Fuse])
+    with pytest.raises(RuntimeError, match="Blown"):
+        sim.run(steps=5, flush_threshold=50000, **kwargs)
+
+@pytest.mark.parametrize("checkpoint", [False, True])
+def test__sqlite_sink__rolls_back_a_failed_run(tmp_path, checkpoint):
+    filename = str(tmp_path / "failed.db")
+    checkpoint_path = str(tmp_path / "sim.ckpt") if checkpoint else None
+    _fail_run(filename, sink=SQLiteSink(filename), checkpoint_path=checkpoint_path, checkpoint_every=1)
+
+    connection = sqlite3.connect(filename)
+    assert connection.execute("PRAGMA integrity_check").fetchall() == [("ok",)]
+    if checkpoint:
+        count, = connection.execute("SELECT COUNT(*) FROM greetings").fetchone()
+        assert count == 2 * 500 * 300
+    else:
+        assert connection.execute("SELECT name FROM sqlite_master").fetchall() == []
+
+def test__sqlite_sink__without_a_journal_deletes_a_failed_database(tmp_path):
+    filename = str(tmp_path / "failed.db")
+    _fail_run(filename, sink=SQLiteSink(filename, journal_mode="OFF"))
+    assert not (tmp_path / "failed.db").exists()
+
+    sim = dgp.Simulation(event_types=[Greeting], entity_types=[Greeter])
+    with pytest.raises(ValueError):
+        sim.run(steps=1, sink=SQLiteSink(filename, journal_mode="OFF"), checkpoint_path=str(tmp_path / "sim.ckpt"))
+
+class Login(dgp.Event):
+    table_name = "activity"
+    kind: str = "login"
+    timestamp: int
+
+class Logout(dgp.Event):
+    table_name = "activity"
+    kind: str = "logout"
+    timestamp: int
+
+class Visitor(dgp.Entity):
+    emitters: Dict = {
+        "login": dgp.IntervalEmitter.from_params(
+            event_type_name="Login",
+            interval=1200,
+            timestamp="timestamp",
+        ),
+        "logout": dgp.IntervalEmitter.from_params(
+            event_type_name="Logout",
+            interval=1200,
+            timestamp="timestamp + 600",
+        ),
+    }
+
+    default_values = [{}, {}]
+
+def test__export__merges_shared_tables_by_timestamp(tmp_path):
+    filename = str(tmp_path / "activity.db")
+
+    sim = dgp.Simulation(
+        event_types=[Login, Logout],
+        entity_types=[Visitor],
+    )
+    sim.run(steps=2)
+    sim.export(filename)
+
+    rows = sqlite3.connect(filename).execute("SELECT kind, timestamp FROM activity").fetchall()
+    assert [row[1] for row in rows] == sorted(row[1] for row in rows)
+    assert rows[:4] == [("login", 0), ("login", 0), ("logout", 600), ("logout", 600)]
+    assert len(rows) == 24
+
+def test__export_parquet__writes_a_dataset_per_table(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    sim = dgp.Simulation(
+        event_types=[Login, Logout],
+        entity_types=[Visitor],
+    )
+    sim.run(steps=2)
+    sim.export_parquet(str(tmp_path / "parquet"), row_group_size=10)
+
+    table = pq.read_table(str(tmp_path / "parquet" / "activity"))
+    assert table.num_rows == 24
+    assert table.column("timestamp").to_pylist() == sorted(table.column("timestamp").to_pylist())
+    assert pq.ParquetFile(str(tmp_path / "parquet" / "activity" / "part-00000.parquet")).num_row_groups == 3
+
+def test__run__streams_events_to_parquet(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    directory = tmp_path / "stream"
+
+    sim = dgp.Simulation(
+        event_types=[Greeting],
+        entity_types=[Greeter],
+    )
+    sim.run(steps=5, sink=ParquetSink(str(directory), row_group_size=8, rows_per_file=16), flush_threshold=10)
+
+    assert sorted(path.name for path in (directory / "greetings").iterdir()) == ["part-00000.parquet", "part-00001.parquet"]
+    table = pq.read_table(str(directory / "greetings"))
+    assert table.schema.field("timestamp").type == "int64"
+    assert table.column("timestamp").to_pylist() == list(range(0, 18000, 600))
+    assert table.column("message")[0].as_py() == "it's a 'quoted' value"
+
+def test__to_arrow__returns_the_events_in_memory():
+    pytest.importorskip("pyarrow")
+
+    sim = dgp.Simulation(
+        event_types=[Greeting],
+        entity_types=[Greeter],
+    )
+    sim.run(steps=1)
+
+    table = sim.to_arrow("Greeting")
+    assert table.column_names == ["message", "timestamp"]
+    assert table.num_rows == 6
+
+def test__to_numpy__returns_views_of_the_event_columns():
+    sim = dgp.Simulation(
+        event_types=[Greeting],
+        entity_types=[Greeter],
+    )
+    sim.run(steps=1)
+
+    columns = sim.to_numpy("Greeting")
+    assert list(columns) == ["message", "timestamp"]
+    assert columns["timestamp"].base is not None
+    assert columns["timestamp"].tolist() == list(range(0, 3600, 600))
+
+    records = sim.to_records("Greeting")
+    assert records.dtype.names == ("message", "timestamp")
+    assert records[1]["timestamp"] == 600
+    assert records[1]["message"] == "it's a 'quoted' value"
+
+class Member(dgp.Entity):
+    table_name = "members"
+    member_name: str
+    level: int
+
+    default_values = [{"member_name": "ann", "level": 3}, {"member_name": "bob", "level": 5}]
+
+def test__to_numpy__builds_entity_columns():
+    sim = dgp.Simulation(
+        event_types=[],
+        entity_types=[Member],
+    )
+
+    columns = sim.to_numpy("Member")
+    assert columns["level"].dtype == np.int64
+    assert columns["member_name"].tolist() == ["ann", "bob"]
+    assert sim.to_records("Member")["level"].tolist() == [3, 5]
+
+def test__dataframe_adapters():
+    sim = dgp.Simulation(
+        event_types=[Greeting],
+        entity_types=[Greeter],
+    )
+    sim.run(steps=1)
+
+    pandas = pytest.importorskip("pandas")
+    frame = sim.to_pandas("Greeting")
+    assert isinstance(frame, pandas.DataFrame)
+    assert frame["timestamp"].tolist() == list(range(0, 3600, 600))
+
+    polars = pytest.importorskip("polars")
+    frame = sim.to_polars("Greeting")
+    assert isinstance(frame, polars.DataFrame)
+    assert frame["message"].to_list() == ["it's a 'quoted' value"] * 6
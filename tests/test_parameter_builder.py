@@ -0,0 +1,25 @@
+from dgpinata.emitters.base import Emitter, ParameterBuilder
+
+def test__parameter_builder__eval_str_is_compiled_once():
+
+    parameter_builders = Emitter._define_parameter_builders(
+        amount=1,
+        timestamp="timestamp + sim",
+    )
+
+    timestamp_builder = parameter_builders["timestamp"]
+    compiled = timestamp_builder._compiled_eval_str
+    assert compiled is not None
+
+    assert timestamp_builder.build(sim=10, parent=None, timestamp=5) == 15
+    assert timestamp_builder.build(sim=20, parent=None, timestamp=5) == 25
+    assert timestamp_builder._compiled_eval_str is compiled
+
+    assert parameter_builders["amount"].build(sim=None, parent=None, timestamp=5) == 1
+
+def test__parameter_builder__compiled_eval_str_survives_copy():
+
+    parameter_builder = ParameterBuilder(name="x", eval_str="parent * 2")
+    copied = parameter_builder.model_copy(deep=True)
+
+    assert copied.build(sim=None, parent=3, timestamp=0) == 6
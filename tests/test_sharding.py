@@ -0,0 +1,67 @@
+import sqlite3
+from typing import Dict
+
+from pydantic import Field
+
+import dgpinata as dgp
+from dgpinata.sharding import run_sharded
+
+class Order(dgp.Event):
+    table_name = "orders"
+    customer_name: str
+    item_name: str
+    timestamp: int
+
+class Item(dgp.Entity):
+    table_name = "items"
+    replicated = True
+    item_name: str
+
+    default_values = [{"item_name": "Lemonade"}, {"item_name": "Iced Tea"}]
+
+class Buyer(dgp.Entity):
+    table_name = "buyers"
+    customer_name: str
+
+    emitters: Dict = {
+        "order": dgp.IntervalEmitter.from_params(
+            event_type_name="Order",
+            interval=1800,
+            customer_name="parent.customer_name",
+            item_name=dgp.RandomObjectAttributeChooser(
+                object_eval_str='sim.entities["Item"]',
+                attribute="item_name",
+            ),
+            timestamp="timestamp",
+        ),
+    }
+
+    default_values = [{"customer_name": name} for name in ["Ann", "Bob", "Cat", "Dan", "Eve"]]
+
+def make_simulation(shard_index, shard_count):
+    return dgp.Simulation(
+        event_types=[Order],
+        entity_types=[Item, Buyer],
+        rand_seed=3,
+        shard_index=shard_index,
+        shard_count=shard_count,
+    )
+
+def test__shards__split_entities_and_replicate_read_only_ones():
+    shards = [make_simulation(shard_index, 2) for shard_index in range(2)]
+
+    assert [buyer.customer_name for buyer in shards[0].entities["Buyer"]] == ["Ann", "Cat", "Eve"]
+    assert [buyer.customer_name for buyer in shards[1].entities["Buyer"]] == ["Bob", "Dan"]
+    assert len(shards[1].entities["Item"]) == 2
+
+def test__run_sharded__merges_shards_in_timestamp_order(tmp_path):
+    filename = run_sharded(make_simulation, shard_count=2, steps=3, output_dir=str(tmp_path))
+
+    db = sqlite3.connect(filename)
+    orders = db.execute("SELECT customer_name, item_name, timestamp FROM orders").fetchall()
+    assert len(orders) == 5 * 2 * 3
+    assert [order[2] for order in orders] == sorted(order[2] for order in orders)
+    assert [order[0] for order in orders[:5]] == ["Ann", "Cat", "Eve", "Bob", "Dan"]
+
+    assert db.execute("SELECT COUNT(*) FROM items").fetchone() == (2,)
+    assert db.execute("SELECT COUNT(*) FROM buyers").fetchone() == (5,)
@@ -0,0 +1,458 @@
+import sqlite3
+from typing import Dict
+
+import pytest
+from pydantic import Field
+
+import dgpinata as dgp
+from dgpinata.emitters.base import ParameterBuilder
+from dgpinata.message import AddEvent
+from dgpinata.sinks import SQLiteSink
+
+class Ping(dgp.Event):
+    timestamp: int
+
+class Pong(dgp.Event):
+    timestamp: int
+
+class Player(dgp.Entity):
+    emitters: Dict = {
+        "ping": dgp.IntervalEmitter.from_params(
+            event_type_name="Ping",
+            interval=1200,
+            timestamp="timestamp",
+        ),
+        "pong": dgp.IntervalEmitter.from_params(
+            event_type_name="Pong",
+            interval=1800,
+            timestamp="timestamp + 600",
+        ),
+    }
+
+def _make_simulation():
+    return dgp.Simulation(
+        event_types=[Ping, Pong],
+        entity_types=[Player],
+    )
+
+def test__iter_steps__yields_each_steps_events_in_timestamp_order():
+    sim = _make_simulation()
+
+    steps = list(sim.iter_steps(steps=2))
+
+    assert len(steps) == 2
+    assert [(type(event).__name__, event.timestamp) for event in steps[0]] == [
+        ("Ping", 0),
+        ("Pong", 600),
+        ("Ping", 1200),
+        ("Ping", 2400),
+        ("Pong", 2400),
+    ]
+    assert [event.timestamp for event in steps[1]] == [3600, 4200, 4800, 6000, 6000]
+    assert len(sim.events["Ping"]) == 6
+
+def test__iter_events__is_lazy_and_can_drop_events():
+    sim = _make_simulation()
+
+    events = sim.iter_events(retain=False)
+    first_events = [next(events) for _ in range(7)]
+
+    assert [event.timestamp for event in first_events] == [0, 600, 1200, 2400, 2400, 3600, 4200]
+    assert sim.timestamp == 7200
+    assert len(sim.events["Ping"]) == 3
+    assert sim.events["Ping"].total_count == 6
+
+class Shopper(dgp.Entity):
+    emitters: Dict = {
+        "browse": dgp.IntervalEmitter.from_params(
+            event_type_name="Ping",
+            interval=600,
+            skip_probability=0.5,
+            timestamp="timestamp",
+        ),
+    }
+
+    default_values = [{} for _ in range(8)]
+
+def _run_shoppers(workers=None, rand_seed=7):
+    sim = dgp.Simulation(
+        event_types=[Ping, Pong],
+        entity_types=[Player, Shopper],
+        rand_seed=rand_seed,
+        workers=workers,
+    )
+    sim.run(steps=3)
+    return sim.events["Ping"].column("timestamp").tolist()
+
+def test__rand_seed__makes_runs_reproducible():
+    assert _run_shoppers() == _run_shoppers()
+    assert _run_shoppers(rand_seed=7) != _run_shoppers(rand_seed=8)
+
+def test__parallel_stepping__matches_serial_stepping():
+    serial = _run_shoppers()
+
+    assert _run_shoppers(workers=2) == serial
+    assert _run_shoppers(workers=3) == serial
+    assert 9 < len(serial) < 9 + 8 * 18
+
+class Dice(dgp.Event):
+    roll: int
+    timestamp: int
+
+class Gambler(dgp.Entity):
+    emitters: Dict = {
+        "roll": dgp.PoissonEmitter.from_params(
+            event_type_name="Dice",
+            rate=4,
+            time_interval=3600,
+            roll="random.randint(1, 6)",
+            timestamp="timestamp",
+        ),
+    }
+
+    default_values = [{} for _ in range(7)]
+
+def _run_gamblers(workers=None, steps=(3,)):
+    sim = dgp.Simulation(event_types=[Dice], entity_types=[Gambler], rand_seed=5, workers=workers)
+    for run_steps in steps:
+        sim.run(steps=run_steps)
+    states = [
+        (gambler.rng.bit_generator.state["state"], gambler.get_next_update_time(sim.timestamp))
+        for gambler in sim.entities["Gambler"]
+    ]
+    return sim.events["Dice"].column("roll").tolist(), states
+
+def test__parallel_stepping__does_not_depend_on_the_number_of_workers():
+    rolls, states = _run_gamblers(workers=2)
+
+    assert _run_gamblers(workers=3) == (rolls, states)
+    assert _run_gamblers(workers=2, steps=(1, 2)) == (rolls, states)
+    assert len(rolls) > 20
+
+def test__parallel_stepping__hands_entity_state_back_when_the_run_ends():
+    _, serial_states = _run_gamblers()
+    _, parallel_states = _run_gamblers(workers=2)
+
+    assert parallel_states == serial_states
+
+class Recruit(dgp.Entity):
+    emitters: Dict = {
+        "ping": dgp.PoissonEmitter.from_params(
+            event_type_name="Ping",
+            rate=3,
+            time_interval=3600,
+            timestamp="timestamp",
+        ),
+    }
+
+    default_values = []
+
+class Recruiter(dgp.Entity):
+    emitters: Dict = {
+        "recruit": dgp.PoissonEmitter.from_params(
+            entity_type_name="Recruit",
+            rate=2,
+            time_interval=3600,
+        ),
+    }
+
+def _run_recruiters(workers=None, event_driven=False, entity_types=(Recruiter, Recruit)):
+    sim = dgp.Simulation(
+        event_types=[Ping],
+        entity_types=list(entity_types),
+        rand_seed=3,
+        workers=workers,
+        event_driven=event_driven,
+    )
+    sim.run(steps=6)
+    return sim.events["Ping"].column("timestamp").tolist(), len(sim.entities["Recruit"])
+
+def test__parallel_stepping__updates_new_entities_in_the_same_step():
+    serial = _run_recruiters()
+
+    assert _run_recruiters(workers=2) == serial
+    assert _run_recruiters(workers=3) == serial
+    assert serial[1] > 0
+
+@pytest.mark.parametrize("entity_types", [(Recruiter, Recruit), (Recruit, Recruiter)])
+def test__event_driven__updates_new_entities_when_a_serial_step_would(entity_types):
+    serial = _run_recruiters(entity_types=entity_types)
+
+    assert _run_recruiters(event_driven=True, entity_types=entity_types) == serial
+
+class Subscriber(dgp.Entity):
+    rate: float = 1.0
+    emitters: Dict = {
+        "ping": dgp.PoissonEmitter.from_params(
+            event_type_name="Ping",
+            rate="parent.rate",
+            time_interval=3600,
+            timestamp="timestamp",
+        ),
+    }
+
+    default_values = [{"rate": 2.0}, {"rate": 0.0}]
+
+@pytest.mark.parametrize("event_driven", [False, True])
+def test__poisson_emitter__emits_nothing_at_a_zero_rate(event_driven):
+    sim = dgp.Simulation(event_types=[Ping], entity_types=[Subscriber], rand_seed=4, event_driven=event_driven)
+    sim.run(steps=24)
+
+    assert 20 < len(sim.events["Ping"]) < 80
+    # The rate is a parameter, so the stopped subscriber stays due, to check it again
+    assert sim.entities["Subscriber"][1].get_next_update_time(sim.timestamp) == sim.timestamp
+
+    sim.entities["Subscriber"][0].rate = 0.0
+    pings = len(sim.events["Ping"])
+    sim.run(steps=24)
+    assert len(sim.events["Ping"]) <= pings + 2
+
+@pytest.mark.parametrize("event_driven", [False, True])
+def test__poisson_emitter__restarts_when_a_zero_rate_becomes_positive(event_driven):
+    sim = dgp.Simulation(event_types=[Ping], entity_types=[Subscriber], rand_seed=4, event_driven=event_driven)
+    sim.entities["Subscriber"][0].rate = 0.0
+    sim.run(steps=12)
+    assert len(sim.events["Ping"]) == 0
+
+    start = sim.timestamp
+    sim.entities["Subscriber"][1].rate = 2.0
+    sim.run(steps=24)
+
+    timestamps = sim.events["Ping"].column("timestamp")
+    assert 20 < len(timestamps) < 80
+    assert timestamps.min() >= start
+
+class Purchase(dgp.Event):
+    buyer_name: str
+    timestamp: int
+
+class RareBuyer(dgp.Entity):
+    buyer_name: str = "someone"
+    emitters: Dict = {
+        "purchase": dgp.PoissonEmitter.from_params(
+            event_type_name="Purchase",
+            rate=1,
+            time_interval=86400,
+            buyer_name="parent.buyer_name",
+            timestamp="timestamp",
+        ),
+    }
+
+    default_values = [{"buyer_name": f"buyer-{i}"} for i in range(20)]
+
+class Shop(dgp.Entity):
+    emitters: Dict = {
+        "new_buyer": dgp.PoissonEmitter.from_params(
+            entity_type_name="RareBuyer",
+            rate=1,
+            time_interval=86400,
+            buyer_name="'newcomer'",
+        ),
+    }
+
+def _run_buyers(event_driven):
+    sim = dgp.Simulation(
+        event_types=[Purchase],
+        entity_types=[Shop, RareBuyer],
+        rand_seed=11,
+        event_driven=event_driven,
+    )
+    updates = []
+    original_update = RareBuyer.update
+
+    def counting_update(self, prev_timestamp, timestamp):
+        updates.append(self.buyer_name)
+        return original_update(self, prev_timestamp, timestamp)
+
+    RareBuyer.update = counting_update
+    try:
+        sim.run(steps=24 * 7)
+    finally:
+        RareBuyer.update = original_update
+
+    rows = [(event.buyer_name, event.timestamp) for event in sim.events["Purchase"]]
+    return rows, len(sim.entities["RareBuyer"]), len(updates)
+
+def test__event_driven__matches_stepping_with_fewer_updates():
+    stepped_rows, stepped_buyers, stepped_updates = _run_buyers(event_driven=False)
+    scheduled_rows, scheduled_buyers, scheduled_updates = _run_buyers(event_driven=True)
+
+    assert scheduled_rows == stepped_rows
+    assert scheduled_buyers == stepped_buyers > 20
+    assert len(stepped_rows) > 50
+    assert scheduled_updates < stepped_updates / 5
+
+def test__type_lookups__are_cached_until_the_type_list_changes():
+    sim = _make_simulation()
+
+    lookup = sim.event_type_lookup
+    assert sim.event_type_lookup is lookup
+    assert set(lookup) == {"Ping", "Pong"}
+
+    sim.event_types.append(Purchase)
+    assert sim.event_type_lookup is not lookup
+    assert "Purchase" in sim.event_type_lookup
+
+    sim.event_types[0] = Tick
+    assert "Ping" not in sim.event_type_lookup
+    assert sim.event_type_lookup["Tick"] is Tick
+
+def test__emitters__are_bound_to_their_targets():
+    sim = _make_simulation()
+    player = sim.entities["Player"][0]
+
+    action, = player.emitters["ping"].emit(parent=player, prev_timestamp=0, timestamp=3600)
+    assert action.event_store is sim.events["Ping"]
+
+class Gamer(dgp.Entity):
+    gamer_name: str
+    level: int = 1
+
+    default_values = []
+    emitters: Dict = {
+        "ping": dgp.IntervalEmitter.from_params(
+            event_type_name="Ping",
+            interval=1800,
+            timestamp="timestamp",
+        ),
+    }
+
+def test__spawn_entities__validates_columns_and_shares_emitters():
+    sim = dgp.Simulation(event_types=[Ping], entity_types=[Gamer], rand_seed=2)
+    gamers = sim.spawn_entities("Gamer", 3, {"gamer_name": ["ann", "bob", "cat"], "level": ["2", 3, 4]})
+
+    assert sim.entities["Gamer"] == gamers
+    assert [gamer.level for gamer in gamers] == [2, 3, 4]
+    assert gamers[0].emitters["ping"] is gamers[2].emitters["ping"]
+    assert gamers[0].rng is not gamers[1].rng
+
+    other_sim = dgp.Simulation(event_types=[Ping], entity_types=[Gamer], rand_seed=2)
+    other_gamer, = other_sim.spawn_entities(Gamer, 1, {"gamer_name": ["dan"]})
+    assert other_gamer.level == 1
+    assert other_gamer.emitters["ping"] is not gamers[0].emitters["ping"]
+
+    sim.run(steps=1)
+    assert len(sim.events["Ping"]) == 6
+
+def test__spawn_entities__keeps_emitters_given_per_entity():
+    sim = dgp.Simulation(event_types=[Ping, Pong], entity_types=[Gamer], rand_seed=2)
+    pong = dgp.IntervalEmitter.from_params(event_type_name="Pong", interval=600, timestamp="timestamp")
+    gamers = sim.spawn_entities(Gamer, 2, {"gamer_name": ["ann", "bob"], "emitters": [{"pong": pong}, {}]})
+
+    assert gamers[0].emitters == {"pong": pong}
+    assert gamers[1].emitters == {}
+
+    sim.run(steps=1)
+    assert len(sim.events["Ping"]) == 0
+    assert len(sim.events["Pong"]) == 6
+
+def test__spawn_entities__requires_fields_without_defaults():
+    sim = dgp.Simulation(event_types=[Ping], entity_types=[Gamer])
+
+    with pytest.raises(ValueError):
+        sim.spawn_entities(Gamer, 2, {"level": [1, 2]})
+
+class Veteran(dgp.Entity):
+    age: int = Field(..., gt=0)
+
+    default_values = []
+
+class Newborn(Veteran):
+    default_values = [{"age": -3}]
+
+class Enlister(dgp.Entity):
+    emitters: Dict = {
+        "new_veteran": dgp.IntervalEmitter.from_params(
+            entity_type_name="Veteran",
+            interval=3600,
+            age="-3",
+        ),
+    }
+
+def test__spawned_entities__are_checked_against_field_constraints():
+    sim = dgp.Simulation(event_types=[], entity_types=[Veteran])
+    assert sim.spawn_entities(Veteran, 1, {"age": [3]})[0].age == 3
+
+    with pytest.raises(ValueError):
+        sim.spawn_entities(Veteran, 2, {"age": [3, -3]})
+
+    with pytest.raises(ValueError):
+        dgp.Simulation(event_types=[], entity_types=[Newborn])
+
+    sim = dgp.Simulation(event_types=[], entity_types=[Enlister, Veteran])
+    with pytest.raises(ValueError):
+        sim.run(steps=1)
+
+class Tick(dgp.Event):
+    table_name = "ticks"
+    compact_records = True
+
+    tick_count: int
+    timestamp: int
+
+class Clock(dgp.Entity):
+    tick_count: int = 0
+
+    def _update(self, prev_timestamp, timestamp):
+        self.tick_count += 1
+        return [AddEvent(
+            event_type_name="Tick",
+            parameter_builders={
+                "tick_count": ParameterBuilder(name="tick_count", value=self.tick_count),
+                "timestamp": ParameterBuilder(name="timestamp", value=timestamp),
+            },
+            parent=self,
+            timestamp=timestamp,
+        )]
+
+def test__compact_records__are_yielded_and_exported(tmp_path):
+    sim = dgp.Simulation(event_types=[Tick], entity_types=[Clock], interval=60)
+
+    ticks = list(sim.iter_events(steps=3))
+    assert ticks == [(1, 60), (2, 120), (3, 180)]
+    assert ticks[-1].tick_count == 3
+
+    sim.export(str(tmp_path / "ticks.db"))
+    with sqlite3.connect(tmp_path / "ticks.db") as connection:
+        assert connection.execute("SELECT tick_count, timestamp FROM ticks").fetchall() == ticks
+
+class RecordingHook(dgp.InstrumentationHook):
+    def __init__(self):
+        self.emits = []
+        self.steps = []
+
+    def on_emit(self, entity_type_name, emitter_name, event_count, seconds):
+        self.emits.append((entity_type_name, emitter_name, event_count))
+
+    def on_step(self, timestamp, seconds):
+        self.steps.append(timestamp)
+
+def test__instrumentation__counts_and_times_each_phase(tmp_path):
+    hook = RecordingHook()
+    sim = dgp.Simulation(
+        event_types=[Ping, Pong],
+        entity_types=[Player],
+        instrumentation=dgp.Instrumentation(hooks=[hook]),
+    )
+    sim.run(steps=2, sink=SQLiteSink(str(tmp_path / "pings.db")))
+
+    instrumentation = sim.instrumentation
+    assert instrumentation.step_count == 2
+    assert dict(instrumentation.emitter_events) == {"Player.ping": 6, "Player.pong": 4}
+    assert instrumentation.entity_type_updates["Player"] == 2
+    assert instrumentation.entity_type_events["Player"] == 10
+    assert all(instrumentation.phase_seconds[phase] > 0 for phase in ["emit", "build_parameters", "store", "export"])
+
+    assert hook.steps == [3600, 7200]
+    assert hook.emits[:2] == [("Player", "ping", 3), ("Player", "pong", 2)]
+
+    summary = sim.get_report().summary
+    assert "=== Phases ===" in summary
+    assert "Player.ping: 6 events" in summary
+
+def test__instrumentation__is_off_by_default():
+    sim = _make_simulation()
+    sim.run(steps=1)
+
+    assert sim.instrumentation is None
+    assert "=== Phases ===" not in sim.get_report().summary
@@ -0,0 +1,90 @@
+import pickle
+
+import numpy as np
+import pytest
+from pydantic import Field
+
+from dgpinata.event import Event
+from dgpinata.store import EventStore
+
+class Purchase(Event):
+    purchase_id: str = Field(default_factory=lambda: "generated")
+    amount: float
+    quantity: int = 1
+    timestamp: int
+
+def test__event_store__typed_columns():
+
+    store = EventStore(Purchase)
+
+    assert store.column_names == ["purchase_id", "amount", "quantity", "timestamp"]
+    assert store.dtypes["amount"] == np.float64
+    assert store.dtypes["quantity"] == np.int64
+    assert store.dtypes["purchase_id"] == object
+
+def test__event_store__extend_columns_grows_and_fills_defaults():
+
+    store = EventStore(Purchase, capacity=2)
+    store.extend_columns({"amount": [1, 2.5, 3], "timestamp": np.array([0, 60, 120])}, 3)
+    store.append(Purchase(purchase_id="manual", amount=4.0, quantity=2, timestamp=180))
+
+    assert len(store) == 4
+    assert store.column("timestamp").tolist() == [0, 60, 120, 180]
+    assert store.column("quantity").tolist() == [1, 1, 1, 2]
+    assert store[0] == Purchase(amount=1.0, timestamp=0)
+    assert store[-1].purchase_id == "manual"
+    assert [purchase.amount for purchase in store] == [1.0, 2.5, 3.0, 4.0]
+    assert len(store[1:3]) == 2
+
+def test__event_store__validates_columns():
+
+    store = EventStore(Purchase)
+
+    with pytest.raises(ValueError):
+        store.extend_columns({"amount": ["not a number"], "timestamp": [0]}, 1)
+
+    with pytest.raises(ValueError):
+        store.extend_columns({"amount": [1.0]}, 1)
+
+    assert len(store) == 0
+
+class Sale(Event):
+    amount: int = Field(..., ge=0)
+    timestamp: int
+
+def test__event_store__checks_field_constraints():
+
+    store = EventStore(Sale)
+
+    with pytest.raises(ValueError):
+        store.extend_columns({"amount": [3, -5], "timestamp": [0, 60]}, 2)
+
+    with pytest.raises(ValueError):
+        store.extend_columns({"amount": np.array([-5]), "timestamp": np.array([0])}, 1)
+
+    store.extend_columns({"amount": np.array([0, 5]), "timestamp": np.array([0, 60])}, 2)
+    assert store.column("amount").tolist() == [0, 5]
+
+class Refund(Event):
+    table_name = "refunds"
+    compact_records = True
+
+    amount: float
+    timestamp: int
+
+def test__event_store__compact_records():
+
+    store = EventStore(Refund)
+    store.extend_columns({"amount": ["1.5", 2], "timestamp": [0, 60]}, 2)
+
+    refund = store[0]
+    assert isinstance(refund, Refund.record_class)
+    assert refund.amount == 1.5
+    assert refund == (1.5, 0)
+    assert refund.to_event() == Refund(amount=1.5, timestamp=0)
+    assert list(store) == [(1.5, 0), (2.0, 60)]
+    assert pickle.loads(pickle.dumps(store[1])) == store[1]
+
+    assert Refund.record_class.table_name == "refunds"
+    assert Refund.record_class.get_create_table_sql() == Refund.get_create_table_sql()
+    assert Purchase.record_class is None